@@ -1,26 +1,44 @@
 # app.py
-from flask import Flask, render_template, jsonify, make_response, send_from_directory, request
-from flask_caching import Cache
-from datetime import datetime, timedelta, timezone
+from flask import Flask, Response, render_template, jsonify, make_response, send_from_directory, request
+from datetime import datetime, timezone
 import os
+import re
+import json
+import hashlib
 import logging
+import atexit
 import traceback
-from utils import complete_bitcoin_data, obstacles_drawdowns_weekly, get_bitcoin_events, get_random_bitcoin_data
+from utils import sample_indices, MA_KINDS
+from refresher import DataRefresher
+from datasets import (create_datasets, lod_level, MA_WINDOW_MIN, MA_WINDOW_MAX, MA_PRESET_WINDOWS,
+                      TERRAIN_LOD_LEVELS, TERRAIN_CHUNK_SIZE)
+from shared_cache import create_shared_cache
+from leaderboard_cache import create_leaderboard_cache
+from score_writer import ScoreWriter, create_score_queue
+from metrics import (registry, timed, count_cache, create_metrics_store, MetricsFlusher, instrument_app,
+                     instrument_sqlalchemy, instrument_limiter, PROMETHEUS_MIMETYPE)
+from static_assets import (load_static_manifest, static_files_app, import_map, asset_urls, is_fingerprinted,
+                           BUILD_DIR as STATIC_BUILD_DIR, IMMUTABLE_MAX_AGE)
+from payloads import (Payload, serve_payload, record_fragments, join_json_object, encode_terrain_binary,
+                      TERRAIN_BINARY_MIMETYPE)
 from dotenv import load_dotenv
 from flask_wtf.csrf import CSRFProtect
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+from werkzeug.exceptions import HTTPException
 import redis
 from config import config
 from flask_migrate import Migrate
 import urllib.parse
 import ssl
 from redis import ConnectionPool
+from redis.exceptions import RedisError
 
 load_dotenv()
 print(f"FLASK_DEBUG environment variable: '{os.environ.get('FLASK_DEBUG')}'")
 
-app = Flask(__name__)
+# Pin the URL path: it would otherwise follow the folder's name when static files come from the build
+app = Flask(__name__, static_url_path='/static')
 
 # Use settings from config.py
 config_name = os.getenv('FLASK_ENV', 'development')
@@ -28,10 +46,12 @@ app.config.from_object(config[config_name])
 
 # Initialize extensions
 csrf = CSRFProtect(app)
-cache = Cache(app, config={'CACHE_TYPE': 'simple'})
 
 # Import db and models
 from models import db, LeaderboardEntry
+from sqlalchemy import insert
+from leaderboard import (keyset_page, order_leaderboard, serialize_entry, decode_cursor, encode_cursor_values,
+                         entry_rank, score_rank, rebuild_leaderboard_cache)
 
 # Initialize the database with the app
 db.init_app(app)
@@ -51,14 +71,21 @@ if redis_url == 'local':
     redis_client = None
 else:
     try:
-        # Create a connection pool with SSL options
-        pool = ConnectionPool.from_url(redis_url, ssl_cert_reqs=None)
+        # Create a connection pool, with SSL options for rediss:// URLs (plain redis:// connections reject them)
+        ssl_options = {'ssl_cert_reqs': None} if redis_url.startswith('rediss://') else {}
+        pool = ConnectionPool.from_url(redis_url, **ssl_options)
         redis_client = redis.StrictRedis(connection_pool=pool)
         logger.info("Connected to Redis successfully.")
     except Exception as e:
         logger.error(f"Error connecting to Redis: {e}")
         redis_client = None
 
+# Share cached values across gunicorn workers through the same Redis pool, or keep them in-process locally
+shared_cache = create_shared_cache(redis_client)
+
+# Score rankings and the top of the leaderboard, in Redis sorted sets (or in-process locally)
+leaderboard_cache = create_leaderboard_cache(redis_client)
+
 # Ensure the limiter uses the same Redis client
 if redis_client:
     limiter = Limiter(
@@ -73,10 +100,38 @@ else:
         key_func=get_remote_address
     )
 
+# Time every request, SQL statement and rate-limit check; each worker pushes its numbers to Redis for /metrics
+metrics_flusher = MetricsFlusher(create_metrics_store(redis_client), interval=app.config['METRICS_FLUSH_INTERVAL'])
+instrument_app(app, metrics_flusher, profile_token=app.config['PROFILE_TOKEN'])
+instrument_sqlalchemy()
+instrument_limiter(limiter)
+
+# Serve static files from the fingerprinted build (see static_assets.py): url_for('static', ...) emits
+# the hashed names, which browsers then cache for good instead of revalidating on every page load
+static_manifest = load_static_manifest() if app.config['STATIC_FINGERPRINT'] else {}
+if static_manifest:
+    app.static_folder = STATIC_BUILD_DIR
+static_import_map = import_map(static_manifest, app.static_url_path)
+static_asset_urls = asset_urls(static_manifest, app.static_url_path)
+
+@app.url_defaults
+def fingerprint_static_urls(endpoint, values):
+    if endpoint == 'static' and 'filename' in values:
+        values['filename'] = static_manifest.get(values['filename'], values['filename'])
+
+@app.after_request
+def cache_fingerprinted_files(response):
+    # WhiteNoise sets these itself in production; this covers Flask serving the build directly
+    if request.endpoint == 'static' and response.status_code == 200 and is_fingerprinted(request.path):
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+        response.cache_control.no_cache = None
+    return response
+
 # Integrate WhiteNoise to serve static files in production
 if config_name == 'production':
-    from whitenoise import WhiteNoise
-    app.wsgi_app = WhiteNoise(app.wsgi_app, root='static/')
+    app.wsgi_app = static_files_app(app.wsgi_app, app.static_folder, app.static_url_path)
 
 def handle_error(error):
     error_message = str(error)
@@ -86,19 +141,119 @@ def handle_error(error):
 
 @app.errorhandler(Exception)
 def handle_exception(e):
+    # Rate limits (429), unknown routes (404) and the like keep their own status
+    if isinstance(e, HTTPException):
+        return e
     return handle_error(e)
 
-@cache.memoize(timeout=3600)  # Cache
-def cached_complete_bitcoin_data(ma=7):
-    return complete_bitcoin_data(ma)
+# Keep the merged price data fresh in the background so requests never wait on CoinGecko
+data_refresher = DataRefresher(
+    interval=app.config['DATA_REFRESH_INTERVAL'],
+    retry_interval=app.config['DATA_REFRESH_RETRY_INTERVAL'],
+    ma=7,
+    shared=shared_cache,
+    full_interval=app.config['DATA_FULL_REFRESH_INTERVAL']
+)
+
+# Weekly resampling, local tops and drawdowns, built once per data version (and shared via Redis)
+derived_datasets = create_datasets(
+    data_refresher.snapshot,
+    shared=shared_cache if redis_client else None,
+    shared_timeout=2 * app.config['DATA_REFRESH_INTERVAL']
+)
+
+# Response bodies for the game data endpoints, serialized and compressed once per data version
+def terrain_series(datasets, snapshot, ma=7, ma_type='sma', points=None):
+    """The full terrain for a moving average, or its level of detail with `points` points."""
+    if points is None:
+        return datasets.get('moving_average', snapshot, window=ma, kind=ma_type)
+    return datasets.get('terrain_lod', snapshot, window=ma, kind=ma_type, points=points)
+
+def terrain_range(start, stop, total):
+    """Payload bounds for points [start, stop) of total, with the whole series as (None, None)."""
+    if start == 0 and stop == total:
+        return None, None
+    return start, stop
+
+def is_terrain_chunk(start, stop, total):
+    """True for bounds from terrain_range() that cover the whole series or one aligned TERRAIN_CHUNK_SIZE chunk."""
+    if start is None:
+        return True
+    return start % TERRAIN_CHUNK_SIZE == 0 and stop == min(start + TERRAIN_CHUNK_SIZE, total)
+
+def build_terrain_payload(datasets, snapshot, terrain_format='records', ma=7, ma_type='sma', points=None,
+                          start=None, stop=None, **compression):
+    # The value column is named after the average, e.g. ma_7 (the default) or ema_30
+    column = f'ma_{ma}' if ma_type == 'sma' else f'{ma_type}_{ma}'
+    # A view of the cached series; only the rounding for JSON copies the values
+    selected = terrain_series(datasets, snapshot, ma, ma_type, points).window(start, stop)
+    if terrain_format == 'binary':
+        body = encode_terrain_binary(selected['date_unix'], selected['value'])
+        return Payload(body, mimetype=TERRAIN_BINARY_MIMETYPE, **compression)
+    selected = selected.rename({'value': column}).round(3)
+    if terrain_format == 'columns':
+        return Payload.from_columns(selected, **compression)
+    return Payload.from_records(selected, **compression)
+
+# Compression for payloads built for a single request, as in /game_bootstrap
+PER_REQUEST_COMPRESSION = {'gzip_level': 6, 'brotli_quality': 4}
+
+def build_obstacles_payload(datasets, snapshot):
+    df = datasets.get('drawdowns', snapshot, drawdown_percentage=0.1)
+    return Payload.from_records(df[['drawdown_date_unix', 'drawdown_price', 'drawdown']])
+
+def build_events_payload(datasets, snapshot):
+    df = datasets.get('events', snapshot)
+    return Payload.from_records(df[['event', 'impact', 'date_unix', 'terrain_index']])
 
-@cache.memoize(timeout=3600)  # Cache
-def cached_obstacles_data(drawdown_percentage=0.1):
-    return obstacles_drawdowns_weekly(drawdown_percentage)
+# Global constant for the number of enemies
+NUM_ENEMIES = 60
 
-@cache.memoize(timeout=3600)  # Cache
-def cached_bitcoin_events():
-    return get_bitcoin_events()
+def build_enemy_rows(datasets, snapshot):
+    # Every row an enemy can stand on, serialized once so a pool is just a join of NUM_ENEMIES strings
+    return record_fragments(snapshot.series.select('ma_7'))
+
+def build_enemy_pool_payload(datasets, snapshot, seed):
+    rows = datasets.get('enemy_rows', snapshot)
+    return Payload.from_fragments(rows, sample_indices(len(rows), NUM_ENEMIES, seed))
+
+def unseeded_enemy_pool(snapshot=None):
+    """A fresh random pool as a JSON array string, joined from the pre-serialized rows."""
+    rows = derived_datasets.get('enemy_rows', snapshot)
+    return '[' + ','.join(rows[i] for i in sample_indices(len(rows), NUM_ENEMIES)) + ']'
+
+# One payload per format, preset moving average, level of detail and aligned chunk; other requests are not cached
+derived_datasets.register('terrain_payload', build_terrain_payload, max_entries=256)
+derived_datasets.register('obstacles_payload', build_obstacles_payload)
+derived_datasets.register('events_payload', build_events_payload)
+derived_datasets.register('enemy_rows', build_enemy_rows)
+# Keyed by client-chosen seeds, so only the most recent ones are kept
+derived_datasets.register('enemy_pool_payload', build_enemy_pool_payload, max_entries=64)
+
+TERRAIN_FORMATS = ('records', 'columns', 'binary')
+
+def warm_derived_datasets(snapshot):
+    for terrain_format in TERRAIN_FORMATS:
+        for points in (None,) + TERRAIN_LOD_LEVELS:
+            derived_datasets.get('terrain_payload', snapshot, terrain_format=terrain_format, ma=7, ma_type='sma',
+                                 points=points, start=None, stop=None)
+    # The chunks DataManager streams the game terrain in
+    total = len(terrain_series(derived_datasets, snapshot))
+    for start in range(0, total, TERRAIN_CHUNK_SIZE):
+        chunk_start, chunk_stop = terrain_range(start, min(start + TERRAIN_CHUNK_SIZE, total), total)
+        derived_datasets.get('terrain_payload', snapshot, terrain_format='binary', ma=7, ma_type='sma',
+                             points=None, start=chunk_start, stop=chunk_stop)
+    # The first chunk in the JSON layout /game_bootstrap embeds
+    chunk_start, chunk_stop = terrain_range(0, min(TERRAIN_CHUNK_SIZE, total), total)
+    derived_datasets.get('terrain_payload', snapshot, terrain_format='columns', ma=7, ma_type='sma',
+                         points=None, start=chunk_start, stop=chunk_stop)
+    # Other windows are serialized on first request, from averages computed here in one pass
+    for kind in MA_KINDS:
+        derived_datasets.get('moving_averages', snapshot, kind=kind)
+    for name in ('obstacles_payload', 'events_payload', 'enemy_rows'):
+        derived_datasets.get(name, snapshot)
+
+data_refresher.add_listener(warm_derived_datasets)
 
 @app.route('/')
 def index():
@@ -106,24 +261,76 @@ def index():
 
 @app.route('/game')
 def game():
-    return render_template('game.html')  # This will serve the Phaser game
+    return render_template('game.html', static_import_map=static_import_map,
+                           static_asset_urls=static_asset_urls)  # This will serve the Phaser game
+
+def is_whole_number(value):
+    """True for a string of ASCII digits; str.isdigit() also accepts e.g. '²', which int() rejects."""
+    return value.isascii() and value.isdecimal()
 
 @app.route('/terrain_data')
-@cache.cached(timeout=3600)  # Cache for 1 hour
+@limiter.limit("120 per minute")
 def terrain_data():
     try:
-        # Use the cached function instead
-        df = cached_complete_bitcoin_data(ma=7)
-
-        # Select relevant columns
-        df_selected = df[['date_unix', 'ma_7']].copy()
-        df_selected.loc[:, 'ma_7'] = df_selected['ma_7'].round(3)
-
-        # Convert the DataFrame to a list of dictionaries
-        data = df_selected.to_dict(orient='records')
-
-        response = jsonify(data)
-        response.headers['Cache-Control'] = 'public, max-age=3600'  # Cache for 1 hour
+        # ?format= wins, otherwise Accept: application/octet-stream selects the binary layout
+        terrain_format = request.args.get('format')
+        if terrain_format is None:
+            best = request.accept_mimetypes.best_match(['application/json', TERRAIN_BINARY_MIMETYPE])
+            terrain_format = 'binary' if best == TERRAIN_BINARY_MIMETYPE else 'records'
+        if terrain_format not in TERRAIN_FORMATS:
+            return jsonify({'error': f"Invalid format, expected one of {', '.join(TERRAIN_FORMATS)}"}), 400
+
+        # ?ma= picks the moving average window in days, ?ma_type= a simple or exponential average
+        ma = request.args.get('ma', '7')
+        if not is_whole_number(ma) or not MA_WINDOW_MIN <= int(ma) <= MA_WINDOW_MAX:
+            return jsonify({'error': f"Invalid ma, expected a whole number of days from {MA_WINDOW_MIN} to {MA_WINDOW_MAX}"}), 400
+        ma_type = request.args.get('ma_type', 'sma')
+        if ma_type not in MA_KINDS:
+            return jsonify({'error': f"Invalid ma_type, expected one of {', '.join(MA_KINDS)}"}), 400
+
+        # Resolve everything against one snapshot, so the ranges match the payload
+        snapshot = data_refresher.snapshot()
+
+        # ?points= is a point budget; the largest precomputed level of detail within it is served
+        points = request.args.get('points')
+        if points is not None:
+            if not is_whole_number(points):
+                return jsonify({'error': 'Invalid points, expected a whole number'}), 400
+            try:
+                available = len(terrain_series(derived_datasets, snapshot, int(ma), ma_type))
+                points = lod_level(int(points), available)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        series = terrain_series(derived_datasets, snapshot, int(ma), ma_type, points)
+        total = len(series)
+
+        # ?from=&to= selects points by index, ?from_date=&to_date= by date_unix (both half-open)
+        bounds = {name: request.args.get(name) for name in ('from', 'to', 'from_date', 'to_date')}
+        if any(value is not None and not is_whole_number(value) for value in bounds.values()):
+            return jsonify({'error': 'Invalid range, expected whole numbers'}), 400
+        bounds = {name: int(value) for name, value in bounds.items() if value is not None}
+        if bounds.keys() & {'from', 'to'} and bounds.keys() & {'from_date', 'to_date'}:
+            return jsonify({'error': 'Use either from/to or from_date/to_date'}), 400
+        if 'from_date' in bounds or 'to_date' in bounds:
+            start, stop = series.date_range(bounds.get('from_date'), bounds.get('to_date'))
+        else:
+            start, stop = min(bounds.get('from', 0), total), min(bounds.get('to', total), total)
+            if stop < start:
+                return jsonify({'error': 'Invalid range, to must not be less than from'}), 400
+        start, stop = terrain_range(start, stop, total)
+
+        # Serve the payload serialized when the current data snapshot was built. A chunk's
+        # ETag only depends on its points, so chunks before newly appended days keep theirs.
+        # Only preset windows and aligned chunks are cached: any other window or range is serialized
+        # for this request at fast compression levels, so clients cannot cycle the cache through costly builds.
+        params = dict(terrain_format=terrain_format, ma=int(ma), ma_type=ma_type, points=points, start=start,
+                      stop=stop)
+        if int(ma) in MA_PRESET_WINDOWS and is_terrain_chunk(start, stop, total):
+            payload = derived_datasets.get('terrain_payload', snapshot, **params)
+        else:
+            payload = build_terrain_payload(derived_datasets, snapshot, **params, **PER_REQUEST_COMPRESSION)
+        response = serve_payload(payload, max_age=3600, vary='Accept')  # Cache for 1 hour
+        response.headers['X-Terrain-Total'] = str(total)
         return response
     except Exception as e:
         return handle_error(e)
@@ -131,88 +338,123 @@ def terrain_data():
 @app.route('/obstacles_data')
 def obstacles_data():
     try:
-        # Use the cached function
-        df = cached_obstacles_data()
-
-        # Select relevant columns
-        df_selected = df[['drawdown_date_unix', 'drawdown_price', 'drawdown']]
-
-        # Convert the DataFrame to a list of dictionaries
-        data = df_selected.to_dict(orient='records')
-
-        return jsonify(data)
+        # Serve the drawdowns serialized when the current data snapshot was built
+        payload = derived_datasets.get('obstacles_payload')
+        return serve_payload(payload)
     except Exception as e:
         return handle_error(e)
 
 @app.route('/bitcoin_events')
 def bitcoin_events():
     try:
-        # Use the cached function instead of calling directly
-        df = cached_bitcoin_events()
-        
-        # Select the required columns
-        df_selected = df[['event', 'impact', 'date_unix']]
-        
-        # Convert the DataFrame to a list of dictionaries
-        data = df_selected.to_dict(orient='records')
-        
-        return jsonify(data)
+        # Serve the events serialized when the current data snapshot was built
+        payload = derived_datasets.get('events_payload')
+        return serve_payload(payload)
     except Exception as e:
         return handle_error(e)
 
-# Global constant for the number of enemies
-NUM_ENEMIES = 60
+ENEMY_SEED_PATTERN = re.compile(r'[A-Za-z0-9_-]{1,64}')
+
+def enemy_seed(seed):
+    """Map a client seed such as '2024-06-01' to the same 64-bit integer in every worker."""
+    return int.from_bytes(hashlib.sha256(seed.encode('utf-8')).digest()[:8], 'little')
 
 @app.route('/enemies_data')
+@limiter.limit("60 per minute")
 def enemies_data():
     try:
-        # Use the cached complete Bitcoin data
-        df = cached_complete_bitcoin_data(ma=7)
-
-        # Get random rows using the new function
-        random_df = get_random_bitcoin_data(df=df, n=NUM_ENEMIES)
-
-        # Select relevant columns
-        df_selected = random_df[['date_unix', 'ma_7']]
-
-        # Convert the DataFrame to a list of dictionaries
-        data = df_selected.to_dict(orient='records')
-
-        return jsonify(data)
+        # ?seed= (e.g. a daily challenge date) gives every player the same enemies, from a cached payload
+        seed = request.args.get('seed')
+        if seed is not None:
+            if not ENEMY_SEED_PATTERN.fullmatch(seed):
+                return jsonify({'error': 'Invalid seed, expected 1-64 letters, digits, - or _'}), 400
+            payload = derived_datasets.get('enemy_pool_payload', seed=enemy_seed(seed))
+            return serve_payload(payload, max_age=3600)
+
+        # Unseeded pools are joined from rows serialized when the current data snapshot was built
+        return Response(unseeded_enemy_pool(), mimetype='application/json')
     except Exception as e:
         return handle_error(e)
 
-def clear_cache_daily():
-    try:
-        cache.delete_memoized(cached_complete_bitcoin_data)
-        cache.delete_memoized(cached_obstacles_data)
-        logger.info("Cache cleared successfully")
-    except Exception as e:
-        logger.error(f"Error clearing cache: {str(e)}")
-
-@app.before_request
-def before_request():
+# Everything the game needs to start, in one response assembled from the precomputed payloads.
+# Members: 'terrain' (the first terrain chunk as columns; the rest streams from /terrain_data),
+# 'terrain_total', 'obstacles', 'events', 'enemies', the data 'version', and 'tokens', the ETag
+# of each part. A client that still holds a part passes its token in ?known=token,token,... and
+# that part is left out and listed in 'unchanged'. ?seed= works as for /enemies_data; unseeded
+# enemies are always sent.
+@app.route('/game_bootstrap')
+def game_bootstrap():
     try:
-        last_update = cache.get('last_update')
-        now = datetime.now(timezone.utc)
-        if last_update is None or now - last_update > timedelta(days=1):
-            clear_cache_daily()
-            cache.set('last_update', now)
+        seed = request.args.get('seed')
+        if seed is not None and not ENEMY_SEED_PATTERN.fullmatch(seed):
+            return jsonify({'error': 'Invalid seed, expected 1-64 letters, digits, - or _'}), 400
+        known = set(request.args.get('known', '').split(','))
+
+        # Resolve every part against one snapshot, so they all come from the same data version
+        snapshot = data_refresher.snapshot()
+        total = len(terrain_series(derived_datasets, snapshot))
+        start, stop = terrain_range(0, min(TERRAIN_CHUNK_SIZE, total), total)
+        parts = {
+            'terrain': derived_datasets.get('terrain_payload', snapshot, terrain_format='columns', ma=7,
+                                            ma_type='sma', points=None, start=start, stop=stop),
+            'obstacles': derived_datasets.get('obstacles_payload', snapshot),
+            'events': derived_datasets.get('events_payload', snapshot),
+        }
+        if seed is not None:
+            parts['enemies'] = derived_datasets.get('enemy_pool_payload', snapshot, seed=enemy_seed(seed))
+
+        members = {}
+        unchanged = []
+        for name, payload in parts.items():
+            if payload.etag in known:
+                unchanged.append(name)
+            else:
+                members[name] = payload.body
+        if seed is None:
+            members['enemies'] = unseeded_enemy_pool(snapshot).encode('utf-8')
+        members['terrain_total'] = str(total).encode('utf-8')
+        members['version'] = str(snapshot.version).encode('utf-8')
+        members['tokens'] = json.dumps({name: payload.etag for name, payload in parts.items()}, sort_keys=True,
+                                       separators=(',', ':')).encode('utf-8')
+        members['unchanged'] = json.dumps(sorted(unchanged), separators=(',', ':')).encode('utf-8')
+
+        # Assembled per request, so compressed at fast levels
+        return serve_payload(Payload(join_json_object(members), **PER_REQUEST_COMPRESSION))
     except Exception as e:
-        logger.error(f"Error in before_request: {str(e)}")
+        return handle_error(e)
 
+# Rebuild the price data from scratch now. The new snapshot version invalidates every derived dataset and
+# payload; the background thread does this every DATA_FULL_REFRESH_INTERVAL on its own, off the request path
 @app.route('/clear_cache', methods=['POST'])
 def manual_clear_cache():
-    clear_cache_daily()
+    data_refresher.trigger()
     return jsonify({'message': 'Cache cleared successfully'}), 200
 
-@app.route('/static/<path:path>')
-def send_static(path):
+@app.route('/data_status')
+def data_status():
+    return jsonify(data_refresher.status())
+
+# Prometheus metrics, added up across gunicorn workers (each pushes every METRICS_FLUSH_INTERVAL seconds).
+# The data version and age come from the worker that answers.
+@app.route('/metrics')
+def metrics():
+    token = app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return jsonify({'error': 'Unauthorized'}), 401
+    if not token and app.config['METRICS_REQUIRE_TOKEN']:
+        return jsonify({'error': 'Metrics are disabled until METRICS_TOKEN is set'}), 403
+    metrics_flusher.flush()
     try:
-        return send_from_directory('static', path)
-    except Exception as e:
-        logger.error(f"Error serving static file: {str(e)}")
-        return make_response(jsonify({"error": "File not found"}), 404)
+        totals = metrics_flusher.store.totals()
+    except RedisError as e:
+        logger.error(f"Error reading metrics: {e}")
+        return jsonify({'error': 'Metrics unavailable'}), 503
+    status = data_refresher.status()
+    gauges = [
+        ('data_version', 'Version of the price data snapshot being served.', status['version']),
+        ('data_age_seconds', 'Seconds since the served price data snapshot was built.', status['age_seconds']),
+    ]
+    return Response(registry.render(totals, gauges), content_type=PROMETHEUS_MIMETYPE)
 
 @app.route('/favicon.ico')
 def favicon():
@@ -220,6 +462,62 @@ def favicon():
                                'favicon.ico', mimetype='image/vnd.microsoft.icon')
 
 # For database integration and leaderboard feature
+def invalidate_leaderboard_cache():
+    try:
+        leaderboard_cache.invalidate()
+    except RedisError as e:
+        logger.error(f"Error invalidating leaderboard cache: {e}")
+
+def read_leaderboard_cache(read):
+    # Run read(cache), loading the rankings from the database first if they are not ready.
+    # Returns None (use SQL instead) when the cache cannot answer or Redis is unavailable.
+    try:
+        if not leaderboard_cache.ready():
+            with shared_cache.lock('leaderboard_rebuild', timeout=60):
+                if not leaderboard_cache.ready():
+                    with timed('leaderboard.rebuild'):
+                        rebuild_leaderboard_cache(leaderboard_cache, LeaderboardEntry.query)
+        result = read(leaderboard_cache)
+    except RedisError as e:
+        logger.error(f"Leaderboard cache unavailable, using the database: {e}")
+        result = None
+    count_cache('leaderboard', 'rankings', 'miss' if result is None else 'hit')
+    return result
+
+def cached_leaderboard_page(page, cursor, per_page):
+    # A page of the score leaderboard (highest first) from the cache, in the /leaderboard response shape
+    def read(cache):
+        if cursor is None:
+            cached = cache.page((page - 1) * per_page, per_page)
+            if cached is None:
+                return None
+            entries, total = cached
+            return {
+                'entries': [entry for _, entry in entries],
+                'total_pages': -(-total // per_page),
+                'current_page': page
+            }
+
+        start = 0
+        if cursor:
+            score, entry_id = decode_cursor(cursor, 'score')
+            start = cache.rank(entry_id, score)
+            if start is None:
+                return None
+        cached = cache.page(start, per_page + 1)
+        if cached is None:
+            return None
+        entries, _ = cached
+        next_cursor = None
+        if len(entries) > per_page:
+            last_id, last = entries[per_page - 1]
+            next_cursor = encode_cursor_values(last['score'], last_id)
+        return {'entries': [entry for _, entry in entries[:per_page]], 'next_cursor': next_cursor}
+
+    if page < 1:
+        return None
+    return read_leaderboard_cache(read)
+
 # Route to submit a score
 @app.route('/submit_score', methods=['POST'])
 @limiter.limit("5 per minute")
@@ -242,16 +540,63 @@ def submit_score():
         if not isinstance(hodl, bool):
             return jsonify({'error': 'Invalid hodl value'}), 400
 
+        # With write-behind on, queue the entry for a batched insert and answer with the rank its score takes now
+        if score_writer is not None:
+            try:
+                score_writer.submit({'player_name': player_name, 'score': score, 'hodl': hodl,
+                                     'timestamp': datetime.now(timezone.utc).isoformat()})
+                ranked = read_leaderboard_cache(lambda cache: cache.score_rank(score))
+                if ranked is None:
+                    ranked = score_rank(LeaderboardEntry.query, score)
+                return jsonify({'message': 'Score submitted successfully', 'rank': ranked[0], 'queued': True}), 202
+            except RedisError as e:
+                logger.error(f"Error queueing score, committing it directly: {e}")
+
         # Create new leaderboard entry
         new_entry = LeaderboardEntry(player_name=player_name, score=score, hodl=hodl)
         db.session.add(new_entry)
         db.session.commit()
 
-        return jsonify({'message': 'Score submitted successfully'}), 201
+        # Keep the cached rankings in step; if that fails they are reloaded from the database on next use
+        rank = None
+        try:
+            leaderboard_cache.add(new_entry.id, new_entry.score, serialize_entry(new_entry))
+            rank = leaderboard_cache.rank(new_entry.id, new_entry.score)
+        except RedisError as e:
+            logger.error(f"Error updating leaderboard cache: {e}")
+            invalidate_leaderboard_cache()
+        if rank is None:
+            rank = entry_rank(LeaderboardEntry.query, new_entry)
+
+        return jsonify({'message': 'Score submitted successfully', 'rank': rank}), 201
     except Exception as e:
         app.logger.error(f"Error submitting score: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+def write_scores(batch):
+    # Insert a batch of queued entries in one transaction, then add them to the cached rankings
+    with app.app_context():
+        rows = [dict(entry, timestamp=datetime.fromisoformat(entry['timestamp'])) for entry in batch]
+        entries = db.session.scalars(insert(LeaderboardEntry).returning(LeaderboardEntry), rows).all()
+        db.session.commit()
+        try:
+            for entry in entries:
+                leaderboard_cache.add(entry.id, entry.score, serialize_entry(entry))
+        except RedisError as e:
+            logger.error(f"Error updating leaderboard cache: {e}")
+            invalidate_leaderboard_cache()
+
+# Optional write-behind for /submit_score: entries wait in a Redis list (or a local journal) and are
+# inserted in batches; whatever is queued is written when the worker exits
+score_writer = None
+if app.config['SCORE_WRITE_BEHIND']:
+    score_writer = ScoreWriter(
+        create_score_queue(redis_client, app.config['SCORE_JOURNAL_PATH']),
+        write_scores,
+        batch_size=app.config['SCORE_BATCH_SIZE'],
+        interval=app.config['SCORE_FLUSH_INTERVAL']
+    )
+
 
 # Route to get the leaderboard
 @app.route('/leaderboard')
@@ -262,23 +607,34 @@ def leaderboard():
     sort_by = request.args.get('sort_by', 'score')
     order = request.args.get('order', 'desc')
 
-    query = LeaderboardEntry.query
+    # ?cursor= switches to keyset pagination: no OFFSET and no COUNT(*), so deep pages stay fast.
+    # An empty cursor asks for the first page; each response carries the next one.
+    cursor = request.args.get('cursor')
 
-    if sort_by == 'date':
-        query = query.order_by(LeaderboardEntry.timestamp.desc() if order == 'desc' else LeaderboardEntry.timestamp.asc())
-    else:
-        query = query.order_by(LeaderboardEntry.score.desc() if order == 'desc' else LeaderboardEntry.score.asc())
+    # The first pages by score come from the cached rankings without touching SQL
+    if sort_by == 'score' and order == 'desc':
+        try:
+            cached = cached_leaderboard_page(page, cursor, per_page)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if cached is not None:
+            return jsonify(cached)
+
+    if cursor is not None:
+        try:
+            entries, next_cursor = keyset_page(LeaderboardEntry.query, sort_by, order, cursor or None, per_page)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({
+            'entries': [serialize_entry(entry) for entry in entries],
+            'next_cursor': next_cursor
+        })
+
+    query = order_leaderboard(LeaderboardEntry.query, sort_by, order)
 
     paginated_entries = query.paginate(page=page, per_page=per_page, error_out=False)
 
-    leaderboard_data = [
-        {
-            'player_name': entry.player_name,
-            'score': entry.score,
-            'hodl': entry.hodl,
-            'timestamp': entry.timestamp.isoformat()
-        } for entry in paginated_entries.items
-    ]
+    leaderboard_data = [serialize_entry(entry) for entry in paginated_entries.items]
 
     return jsonify({
         'entries': leaderboard_data,
@@ -286,6 +642,26 @@ def leaderboard():
         'current_page': page
     })
 
+# Route to look up the rank a score would have on the leaderboard
+@app.route('/leaderboard_rank')
+@limiter.limit("30 per minute")
+def leaderboard_rank():
+    score = request.args.get('score', type=int)
+    if score is None or score < 0:
+        return jsonify({'error': 'Invalid score'}), 400
+
+    ranked = read_leaderboard_cache(lambda cache: cache.score_rank(score))
+    if ranked is None:
+        ranked = score_rank(LeaderboardEntry.query, score)
+    rank, total = ranked
+    return jsonify({'score': score, 'rank': rank, 'total': total})
+
+@app.cli.command('rebuild-leaderboard')
+def rebuild_leaderboard_command():
+    """Reload the cached leaderboard rankings from the database."""
+    count = rebuild_leaderboard_cache(leaderboard_cache, LeaderboardEntry.query)
+    print(f"Leaderboard cache rebuilt with {count} entries")
+
 @app.route('/test_redis')
 def test_redis():
     if redis_client:
@@ -298,5 +674,27 @@ def test_redis():
     else:
         return jsonify({'message': 'Using local development mode without Redis.'})
 
+def set_worker_count(workers):
+    """Tell the app how many gunicorn workers serve it; in-process rankings only work with one."""
+    global leaderboard_cache
+    if redis_client is None and workers > 1:
+        logger.warning("REDIS_URL is 'local' with several workers, reading the leaderboard from the database")
+        leaderboard_cache = create_leaderboard_cache(redis_client, workers=workers)
+
+def start_background_tasks():
+    """Start the price data refresh and score writer threads (under gunicorn --preload, in each worker)."""
+    data_refresher.start()
+    if score_writer is not None:
+        score_writer.start()
+        atexit.register(score_writer.stop)
+
+if app.config['PRELOAD_DATA']:
+    # Build the snapshot with the recent days (or adopt a published one) and every warmed payload now, in the
+    # gunicorn master, so forked workers share them copy-on-write; gunicorn.conf.py starts the threads after
+    # the fork, since threads do not survive it. A slow CoinGecko only delays the boot by the timeout
+    data_refresher.preload(timeout=app.config['PRELOAD_COINGECKO_TIMEOUT'])
+else:
+    start_background_tasks()
+
 if __name__ == '__main__':
     app.run(debug=app.config['DEBUG'])
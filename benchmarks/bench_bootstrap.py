@@ -0,0 +1,52 @@
+# benchmarks/bench_bootstrap.py
+"""
+Compare starting the game with /game_bootstrap against the four separate requests.
+
+Reports bytes on the wire (gzip) and time through the Flask test client for the four
+endpoints the game used to call (with the terrain as its first binary chunk, as
+DataManager streams it), a full /game_bootstrap, and a repeat bootstrap that passes
+the tokens it already holds.
+
+Run from the repository root:
+    python benchmarks/bench_bootstrap.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from harness import isolate_services
+isolate_services()
+
+from app import app, limiter
+from datasets import TERRAIN_CHUNK_SIZE
+
+REPEATS = 200
+HEADERS = {'Accept-Encoding': 'gzip'}
+SEPARATE = [f'/terrain_data?format=binary&from=0&to={TERRAIN_CHUNK_SIZE}', '/obstacles_data',
+            '/bitcoin_events', '/enemies_data']
+
+
+def timed(urls):
+    client = app.test_client()
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        sizes = [len(client.get(url, headers=HEADERS).data) for url in urls]
+    return (time.perf_counter() - started) / REPEATS * 1000, sum(sizes)
+
+
+def main():
+    # /terrain_data is rate limited per IP, and every request here comes from the test client
+    limiter.enabled = False
+    client = app.test_client()
+    tokens = client.get('/game_bootstrap').get_json()['tokens']
+    known = '/game_bootstrap?known=' + ','.join(tokens.values())
+    for label, urls in (('four requests', SEPARATE), ('bootstrap', ['/game_bootstrap']),
+                        ('bootstrap, all known', [known])):
+        ms, size = timed(urls)
+        print(f"{label:>22}: {len(urls)} round trip(s), {size:>6} bytes gzip, {ms:.2f} ms server time")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# benchmarks/bench_daily_normalization.py
+"""
+Measure what normalizing CoinGecko points to one close per UTC day saves.
+
+A stub CoinGecko client answers the days=365 request with three granularities:
+daily points at 00:00 UTC plus a live point (what the API documents for ranges over
+90 days), hourly points for the whole year, and a mix of daily, hourly and 5-minute
+points. For each the script builds complete_bitcoin_data() the old way (raw points
+merged on their exact timestamps) and the new way, checks the new one has exactly one
+row per UTC day, and compares the row count and /terrain_data payload sizes.
+
+Run from the repository root:
+    python benchmarks/bench_daily_normalization.py
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from harness import isolate_services
+isolate_services()
+
+from payloads import Payload
+from utils import (DAY_MS, complete_bitcoin_data, get_historical_bitcoin_data, get_last_year_bitcoin_data,
+                   rolling_mean, start_of_utc_day_ms, to_unix_ms)
+
+HOUR_MS = 3_600_000
+MINUTE_MS = 60_000
+
+
+def price_at(timestamps):
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    return 100000 * np.exp(np.sin(timestamps / 1e9) + 0.01 * np.cos(timestamps / 1e7))
+
+
+def year_timestamps(granularity, now):
+    midnight = now // DAY_MS * DAY_MS
+    daily = np.arange(midnight - 365 * DAY_MS, midnight + 1, DAY_MS)
+    if granularity == 'daily':
+        return np.append(daily, now)
+    if granularity == 'hourly':
+        return np.arange(now - 365 * DAY_MS, now + 1, HOUR_MS)
+    hourly = np.arange(midnight - 90 * DAY_MS + HOUR_MS, midnight - DAY_MS + 1, HOUR_MS)
+    minutes = np.arange(midnight - DAY_MS + 5 * MINUTE_MS, now + 1, 5 * MINUTE_MS)
+    return np.concatenate([daily[:-90], hourly, minutes])
+
+
+class StubCoinGecko:
+    def __init__(self, granularity, now):
+        self.timestamps = year_timestamps(granularity, now)
+
+    def get_coin_market_chart_by_id(self, id, vs_currency, days):
+        return {'prices': [[int(t), float(p)] for t, p in zip(self.timestamps, price_at(self.timestamps))]}
+
+
+def complete_bitcoin_data_unnormalized(cg, ma=7):
+    """complete_bitcoin_data() as it was before daily_closes(): raw points merged on exact dates."""
+    df_historical = get_historical_bitcoin_data()
+    df_historical['date'] = df_historical['Start']
+    df_last_year = get_last_year_bitcoin_data(cg)
+    df = pd.concat([df_historical[['date', 'price']], df_last_year[['date', 'price']]], ignore_index=True)
+    df = df.drop_duplicates(subset='date', keep='last').sort_values('date')
+    df['date_unix'] = to_unix_ms(df['date'])
+    df[f'ma_{ma}'] = rolling_mean(df['price'], ma)
+    return df.dropna(subset=[f'ma_{ma}'])
+
+
+def terrain_sizes(df):
+    terrain = df[['date_unix', 'ma_7']].round(3)
+    records = Payload.from_records(terrain)
+    return records.body, records.gzip
+
+
+def main():
+    now = start_of_utc_day_ms() + 13 * HOUR_MS + 37 * MINUTE_MS
+    print(f"{'granularity':<12}{'rows old':>10}{'rows new':>10}{'json old':>10}{'json new':>10}"
+          f"{'gzip old':>10}{'gzip new':>10}")
+    for granularity in ('daily', 'hourly', 'mixed'):
+        cg = StubCoinGecko(granularity, now)
+        df_old = complete_bitcoin_data_unnormalized(cg)
+        df_new = complete_bitcoin_data(cg=cg)
+
+        days = df_new['date_unix'].to_numpy()
+        assert (days % DAY_MS == 0).all() and (np.diff(days) > 0).all(), "not one point per UTC day"
+        assert days[-1] + DAY_MS <= start_of_utc_day_ms(), "includes an unfinished day"
+
+        old, new = terrain_sizes(df_old), terrain_sizes(df_new)
+        print(f"{granularity:<12}{len(df_old):>10}{len(df_new):>10}"
+              + ''.join(f"{len(o):>10}{len(n):>10}" for o, n in zip(old, new)))
+
+
+if __name__ == '__main__':
+    main()
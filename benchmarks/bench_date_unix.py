@@ -0,0 +1,61 @@
+# benchmarks/bench_date_unix.py
+"""
+Compare the vectorized to_unix_ms() with the old per-row time.mktime() conversion.
+
+Times both on the merged price history and checks, for several TZ settings, that
+to_unix_ms() gives the same result everywhere while mktime() follows the server's
+local timezone.
+
+Run from the repository root:
+    python benchmarks/bench_date_unix.py
+"""
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from harness import isolate_services
+isolate_services()
+
+from utils import complete_bitcoin_data, to_unix_ms
+
+TIMEZONES = ['UTC', 'America/New_York', 'Europe/Stockholm', 'Asia/Tokyo']
+REPEATS = 20
+
+
+def mktime_unix_ms(dates):
+    """The original conversion, which depends on the local timezone."""
+    return dates.apply(lambda x: int(time.mktime(x.timetuple()) * 1000))
+
+
+def best_of(func, *args):
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    dates = complete_bitcoin_data(include_recent=False)['date']
+    print(f"{len(dates)} dates")
+
+    reference = None
+    for tz in TIMEZONES:
+        os.environ['TZ'] = tz
+        time.tzset()
+        old_time, old = best_of(mktime_unix_ms, dates)
+        new_time, new = best_of(to_unix_ms, dates)
+        if reference is None:
+            reference = new
+        pd.testing.assert_series_equal(new, reference)
+        print(f"{tz:>17}: mktime {old_time * 1000:7.2f} ms, to_unix_ms {new_time * 1000:5.2f} ms "
+              f"({old_time / new_time:5.0f}x), mktime matches UTC: {old.equals(reference)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/bench_drawdowns.py
+"""
+Compare the vectorized obstacles_drawdowns_weekly() with the original row-by-row loop.
+
+Run from the repository root:
+    python benchmarks/bench_drawdowns.py
+"""
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from harness import isolate_services
+isolate_services()
+
+from utils import complete_bitcoin_data, obstacles_drawdowns_weekly
+
+DRAWDOWN_PERCENTAGES = [0.05, 0.1, 0.2, 0.3, 0.5]
+REPEATS = 5
+
+
+def obstacles_drawdowns_weekly_loop(drawdown_percentage, df):
+    """The original O(tops x weeks) implementation, kept as the reference."""
+    df_weekly = df.set_index('date').resample('W').last().reset_index()
+    df_weekly = df_weekly.dropna(subset=['ma_7'])
+    df_weekly['local_top'] = (df_weekly['ma_7'] > df_weekly['ma_7'].shift(1)) & (df_weekly['ma_7'] > df_weekly['ma_7'].shift(-1))
+    df_weekly['local_top'] = df_weekly['local_top'].astype(bool)
+
+    drawdowns = []
+    for i in range(len(df_weekly)):
+        if df_weekly.loc[i, 'local_top']:
+            local_top_price = df_weekly.loc[i, 'ma_7']
+            for j in range(i+1, len(df_weekly)):
+                drawdown = (local_top_price - df_weekly.loc[j, 'ma_7']) / local_top_price
+                if drawdown >= drawdown_percentage:
+                    drawdowns.append({
+                        'local_top_date': df_weekly.loc[i, 'date'],
+                        'local_top_price': local_top_price,
+                        'drawdown_date': df_weekly.loc[j, 'date'],
+                        'drawdown_date_unix': df_weekly.loc[j, 'date_unix'],
+                        'drawdown_price': df_weekly.loc[j, 'ma_7'],
+                        'drawdown': drawdown
+                    })
+                    break
+
+    return pd.DataFrame(drawdowns)
+
+
+def best_of(func, *args):
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    df = complete_bitcoin_data(include_recent=False)
+    print(f"{len(df)} daily rows")
+    print(f"{'drawdown':>9} {'obstacles':>9} {'loop ms':>9} {'numpy ms':>9} {'speedup':>8}")
+    for drawdown_percentage in DRAWDOWN_PERCENTAGES:
+        loop_time, expected = best_of(obstacles_drawdowns_weekly_loop, drawdown_percentage, df)
+        fast_time, actual = best_of(obstacles_drawdowns_weekly, drawdown_percentage, df)
+        pd.testing.assert_frame_equal(actual, expected)
+        print(f"{drawdown_percentage:>9.2f} {len(actual):>9} {loop_time * 1000:>9.1f} "
+              f"{fast_time * 1000:>9.1f} {loop_time / fast_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# benchmarks/bench_enemy_pools.py
+"""
+Time enemy placement: the old per-request df.sample() against the precomputed rows.
+
+Measures building the /enemies_data body directly (without Flask) for the old path
+(df.sample, to_dict, json.dumps), an unseeded pool joined from the pre-serialized
+rows, and a cached seeded pool, then the whole request through the Flask test client.
+Also checks that a seed always gives the same pool and that pools hold real rows.
+
+Run from the repository root:
+    python benchmarks/bench_enemy_pools.py
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from harness import isolate_services
+isolate_services()
+
+from app import app, limiter, data_refresher, derived_datasets, build_enemy_pool_payload, enemy_seed, NUM_ENEMIES
+from utils import sample_indices
+
+REPEATS = 1000
+
+
+def timed(func):
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        func()
+    return (time.perf_counter() - started) / REPEATS * 1000
+
+
+def main():
+    df = data_refresher.get_data()
+    rows = derived_datasets.get('enemy_rows')
+
+    def old_body():
+        selected = df.sample(n=NUM_ENEMIES)[['date_unix', 'ma_7']]
+        return json.dumps(selected.to_dict(orient='records'), sort_keys=True, separators=(',', ':'))
+
+    def unseeded_body():
+        return '[' + ','.join(rows[i] for i in sample_indices(len(rows), NUM_ENEMIES)) + ']'
+
+    def seeded_body():
+        return derived_datasets.get('enemy_pool_payload', seed=enemy_seed('2024-06-01')).body
+
+    valid = set(map(tuple, df[['date_unix', 'ma_7']].to_numpy().tolist()))
+    pool = json.loads(seeded_body())
+    assert len(pool) == NUM_ENEMIES and all((row['date_unix'], row['ma_7']) in valid for row in pool)
+    fresh = build_enemy_pool_payload(derived_datasets, data_refresher.snapshot(), enemy_seed('2024-06-01'))
+    assert fresh.body == seeded_body()
+    assert json.loads(unseeded_body()) != json.loads(unseeded_body())
+
+    # /enemies_data is rate limited per IP, and every request here comes from the test client
+    limiter.enabled = False
+    client = app.test_client()
+    print(f"{len(df)} rows, {NUM_ENEMIES} enemies")
+    print(f"body     old df.sample: {timed(old_body):.3f} ms  unseeded: {timed(unseeded_body):.3f} ms  "
+          f"seeded (cached): {timed(seeded_body):.3f} ms")
+    print(f"request  unseeded: {timed(lambda: client.get('/enemies_data')):.3f} ms  "
+          f"seeded: {timed(lambda: client.get('/enemies_data?seed=2024-06-01')):.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
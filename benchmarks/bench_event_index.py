@@ -0,0 +1,86 @@
+# benchmarks/bench_event_index.py
+"""
+Check the event-to-terrain join and time it against a linear scan.
+
+nearest_indices() is checked against a brute-force nearest search on synthetic
+terrain with events on points, between points (including exact midpoints, which go
+to the earlier point), and before or after the terrain. Then the /bitcoin_events join
+on the real data is checked the same way, and the binary search is timed against
+the per-event findIndex scan Terrain.draw used to run every frame.
+
+Run from the repository root:
+    python benchmarks/bench_event_index.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from harness import isolate_services
+isolate_services()
+
+from app import data_refresher, derived_datasets
+from utils import DAY_MS, nearest_indices
+
+REPEATS = 200
+
+
+def brute_force(sorted_values, values):
+    indices = []
+    for value in values:
+        if value < sorted_values[0] or value > sorted_values[-1]:
+            indices.append(-1)
+        else:
+            # argmin returns the first of equal distances, i.e. the earlier point
+            indices.append(int(np.argmin(np.abs(sorted_values - value))))
+    return np.array(indices, dtype=np.int64)
+
+
+def check_synthetic():
+    rng = np.random.default_rng(14)
+    for _ in range(200):
+        n = int(rng.integers(1, 50))
+        terrain = np.sort(rng.choice(np.arange(0, 200 * DAY_MS, DAY_MS // 2), size=n, replace=False))
+        midpoints = (terrain[:-1] + terrain[1:]) // 2
+        events = np.concatenate([
+            terrain,                                      # on a point
+            midpoints,                                    # exactly between two points
+            terrain + rng.integers(1, DAY_MS, size=n),    # somewhere after a point
+            [terrain[0] - 1, terrain[-1] + 1],            # just outside the terrain
+        ])
+        rng.shuffle(events)
+        np.testing.assert_array_equal(nearest_indices(terrain, events), brute_force(terrain, events))
+    print("nearest_indices matches a brute-force search on 200 synthetic terrains")
+
+
+def main():
+    check_synthetic()
+
+    snapshot = data_refresher.snapshot()
+    terrain = derived_datasets.get('moving_average', snapshot, window=7, kind='sma')['date_unix']
+    events = derived_datasets.get('events', snapshot)
+    expected = [None if index < 0 else int(index) for index in brute_force(terrain, events['date_unix'].to_numpy())]
+    assert events['terrain_index'].tolist() == expected
+    on_point = sum(index is not None and terrain[index] == date
+                   for index, date in zip(expected, events['date_unix']))
+    print(f"{len(events)} events joined to {len(terrain)} terrain points "
+          f"({on_point} on a point, {sum(index is None for index in expected)} outside the terrain)")
+
+    event_dates = events['date_unix'].tolist()
+    terrain_dates = terrain.tolist()
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        nearest_indices(terrain, events['date_unix'].to_numpy())
+    search_ms = (time.perf_counter() - started) / REPEATS * 1000
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        [next((i for i, d in enumerate(terrain_dates) if d == date), -1) for date in event_dates]
+    scan_ms = (time.perf_counter() - started) / REPEATS * 1000
+    print(f"binary search once per refresh: {search_ms:.3f} ms, linear scan per frame: {scan_ms:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# benchmarks/bench_incremental.py
+"""
+Check that incremental updates equal a full rebuild, and time both.
+
+A stub CoinGecko client serves deterministic hourly prices. The script first catches
+a scratch copy of the price store up to STEP_START, then advances one day at a time:
+each step appends the new day with update_bitcoin_data() and update_weekly(). At the
+end the complete data, the weekly data and the drawdowns are compared with a full
+rebuild from the store.
+
+Run from the repository root:
+    python benchmarks/bench_incremental.py
+"""
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from harness import isolate_services, StubCoinGecko
+isolate_services()
+from utils import (DAY_MS, complete_bitcoin_data, update_bitcoin_data, resample_weekly, update_weekly,
+                   local_top_indices, drawdowns_from_weekly)
+
+STEP_START = pd.Timestamp('2026-06-01')
+STEPS = 60
+
+
+def to_ms(timestamp):
+    return int(timestamp.value // 1_000_000)
+
+
+def main():
+    cg = StubCoinGecko()
+    df = complete_bitcoin_data(include_recent=False)
+    df, appended = update_bitcoin_data(df, cg=cg, until_unix_ms=to_ms(STEP_START))
+    df_weekly = resample_weekly(df)
+    print(f"caught up {appended} days to {STEP_START.date()}, {len(df)} rows")
+
+    incremental_time = 0.0
+    until = to_ms(STEP_START)
+    for _ in range(STEPS):
+        until += DAY_MS
+        started = time.perf_counter()
+        df, appended = update_bitcoin_data(df, cg=cg, until_unix_ms=until)
+        df_weekly = update_weekly(df_weekly, df, appended)
+        incremental_time += time.perf_counter() - started
+
+    started = time.perf_counter()
+    df_full = complete_bitcoin_data(include_recent=False)
+    df_weekly_full = resample_weekly(df_full)
+    full_time = time.perf_counter() - started
+
+    pd.testing.assert_frame_equal(df, df_full)
+    pd.testing.assert_frame_equal(df_weekly, df_weekly_full)
+    tops = local_top_indices(df_weekly['ma_7'].to_numpy())
+    pd.testing.assert_frame_equal(drawdowns_from_weekly(df_weekly, tops, 0.1),
+                                  drawdowns_from_weekly(df_weekly_full, tops, 0.1))
+    print(f"{STEPS} daily updates match a full rebuild ({len(df)} rows, {len(df_weekly)} weeks)")
+    print(f"incremental: {incremental_time / STEPS * 1000:.2f} ms per day "
+          f"(store append included), full rebuild: {full_time * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# benchmarks/bench_invalidation.py
+"""
+Check versioned invalidation and measure what the old before_request hook cost.
+
+Times a cheap route with no request hooks, as the app now runs, and with the old daily
+check reinstalled: a cache get of 'last_update' on every request, here against
+fakeredis. A real Redis adds a network round trip. Then checks that only one of two
+workers sharing a cache runs the daily full rebuild, and that a forced refresh moves
+every warmed artifact to the new data version so nothing stale is served, and that an
+append finding no new days keeps the version.
+
+Run from the repository root:
+    python benchmarks/bench_invalidation.py
+"""
+import os
+import pickle
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import fakeredis
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Refreshes below append stub prices to the price store, so keep them off the real one
+from harness import isolate_services, StubCoinGecko
+isolate_services()
+
+from app import app, data_refresher, derived_datasets
+from refresher import DataRefresher
+from shared_cache import LocalSharedCache
+
+REPEATS = 2000
+
+
+def timed(func):
+    func()
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        func()
+    return (time.perf_counter() - started) / REPEATS * 1000
+
+
+def check_full_refresh_schedule():
+    shared = LocalSharedCache()
+    workers = [DataRefresher(shared=shared, client_factory=StubCoinGecko, full_interval=86400) for _ in range(2)]
+    for worker in workers:
+        worker.seed()
+    assert workers[0]._full_refresh_due()
+    assert workers[0].refresh(force=True)
+    assert not workers[0]._full_refresh_due() and not workers[1]._full_refresh_due()
+    shared.set('full_refreshed_at', datetime.now(timezone.utc) - timedelta(days=1, seconds=1))
+    assert workers[1]._full_refresh_due()
+    print("full rebuild is due once per interval across workers sharing a cache")
+
+
+def main():
+    # Take refreshes over from the background thread, which may still be trying CoinGecko
+    data_refresher.stop()
+    client = app.test_client()
+    # Only the CSRF and rate-limit checks remain; nothing from app.py runs before every request
+    assert not [f for f in app.before_request_funcs[None] if getattr(f, '__module__', None) == 'app']
+    without_hook = timed(lambda: client.get('/data_status'))
+
+    redis_client = fakeredis.FakeStrictRedis()
+    redis_client.set('bpr:flask:last_update', pickle.dumps(datetime.now(timezone.utc)))
+
+    def old_hook():
+        last_update = pickle.loads(redis_client.get('bpr:flask:last_update'))
+        if datetime.now(timezone.utc) - last_update > timedelta(days=1):
+            raise AssertionError('not expected during the benchmark')
+
+    app.before_request_funcs.setdefault(None, []).append(old_hook)
+    with_hook = timed(lambda: client.get('/data_status'))
+    app.before_request_funcs[None].remove(old_hook)
+    print(f"/data_status: {without_hook:.3f} ms without request hooks, {with_hook:.3f} ms with the old "
+          f"last_update check (+{with_hook - without_hook:.3f} ms per request on fakeredis)")
+
+    check_full_refresh_schedule()
+
+    data_refresher.client_factory = StubCoinGecko
+    before = data_refresher.snapshot().version
+    etag = client.get('/bitcoin_events').headers['ETag']
+    assert data_refresher.refresh(force=True)
+    after = data_refresher.snapshot().version
+    warmed = ['obstacles_payload', 'events_payload', 'enemy_rows', 'weekly', 'local_tops', 'events']
+    stale = [name for name in warmed if derived_datasets.version_of(name) != after]
+    assert after > before and not stale, stale
+    assert client.get('/bitcoin_events', headers={'If-None-Match': etag}).status_code in (200, 304)
+    print(f"forced refresh v{before} -> v{after}: every warmed artifact rebuilt for v{after}")
+
+    # The data now runs up to yesterday, so an append finds nothing and must not invalidate anything
+    checked = data_refresher._build(include_recent=True)
+    assert checked.version == after and checked.series is data_refresher.snapshot().series
+    print(f"append with no new days keeps v{after}")
+
+
+if __name__ == '__main__':
+    main()
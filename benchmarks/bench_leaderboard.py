@@ -0,0 +1,107 @@
+# benchmarks/bench_leaderboard.py
+"""
+Compare OFFSET/COUNT pagination with keyset pagination on a large leaderboard.
+
+Fills a scratch SQLite database with 1M entries (ties included: scores repeat),
+then times the first page and a deep page for query.paginate() (LIMIT/OFFSET plus
+COUNT(*)) and for keyset_page(), first without and then with the composite indexes
+from the add_leaderboard_indexes migration. Also checks that walking the keyset
+cursors visits exactly the rows offset pagination returns, in the same order.
+
+Run from the repository root:
+    python benchmarks/bench_leaderboard.py [rows]
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from harness import isolate_services
+isolate_services()
+
+from models import db, LeaderboardEntry
+from leaderboard import encode_cursor, keyset_page, order_leaderboard
+
+PER_PAGE = 10
+REPEATS = 5
+
+
+def fill(n_rows):
+    rng = random.Random(17)
+    started = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rows = [{'player_name': f'player{i % 5000}', 'score': rng.randint(0, 200000), 'hodl': i % 3 == 0,
+             'timestamp': started + timedelta(seconds=i * 30)} for i in range(n_rows)]
+    for start in range(0, n_rows, 50000):
+        db.session.execute(LeaderboardEntry.__table__.insert(), rows[start:start + 50000])
+    db.session.commit()
+
+
+def timed(func):
+    func()
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        func()
+    return (time.perf_counter() - started) / REPEATS * 1000
+
+
+def cursor_at(page, sort_by, order):
+    # The cursor a client holds after walking to page: the last entry of the page before it
+    last = order_leaderboard(LeaderboardEntry.query, sort_by, order).offset((page - 1) * PER_PAGE - 1).first()
+    return encode_cursor(last, sort_by)
+
+
+def report(label, deep_page):
+    for sort_by in ('score', 'date'):
+        deep_cursor = cursor_at(deep_page, sort_by, 'desc')
+        offset_first = timed(lambda: order_leaderboard(LeaderboardEntry.query, sort_by, 'desc')
+                             .paginate(page=1, per_page=PER_PAGE, error_out=False).items)
+        offset_deep = timed(lambda: order_leaderboard(LeaderboardEntry.query, sort_by, 'desc')
+                            .paginate(page=deep_page, per_page=PER_PAGE, error_out=False).items)
+        keyset_first = timed(lambda: keyset_page(LeaderboardEntry.query, sort_by, 'desc', None, PER_PAGE))
+        keyset_deep = timed(lambda: keyset_page(LeaderboardEntry.query, sort_by, 'desc', deep_cursor, PER_PAGE))
+        print(f"{label:<16} {sort_by:<5}  offset+count page 1: {offset_first:8.2f} ms  page {deep_page}: "
+              f"{offset_deep:8.2f} ms   keyset page 1: {keyset_first:6.2f} ms  page {deep_page}: {keyset_deep:6.2f} ms")
+
+
+def check_walk(pages):
+    for sort_by in ('score', 'date'):
+        for order in ('desc', 'asc'):
+            cursor = None
+            for page in range(1, pages + 1):
+                entries, cursor = keyset_page(LeaderboardEntry.query, sort_by, order, cursor, PER_PAGE)
+                expected = order_leaderboard(LeaderboardEntry.query, sort_by, order) \
+                    .paginate(page=page, per_page=PER_PAGE, error_out=False).items
+                assert [e.id for e in entries] == [e.id for e in expected], (sort_by, order, page)
+    print(f"keyset walk matches offset pagination for the first {pages} pages of every sort")
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    deep_page = n_rows // PER_PAGE // 2
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
+    db.init_app(app)
+    with app.app_context():
+        indexes = list(LeaderboardEntry.__table__.indexes)
+        db.create_all()
+        for index in indexes:
+            index.drop(db.engine)
+
+        started = time.perf_counter()
+        fill(n_rows)
+        print(f"{n_rows} entries inserted in {time.perf_counter() - started:.1f} s")
+
+        report('without indexes', deep_page)
+        for index in indexes:
+            index.create(db.engine)
+        report('with indexes', deep_page)
+        check_walk(30)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+# benchmarks/bench_leaderboard_cache.py
+"""
+Check the cached leaderboard against SQL and time it.
+
+For the in-process cache and the Redis cache (on fakeredis), with a small top_n so page
+boundaries are exercised: fills a temporary SQLite database with tied scores, rebuilds
+the cache, submits more entries through add() as /submit_score does, and checks every
+cached page, entry rank and score rank against the same query in SQL, then again after
+a rebuild. Then walks /leaderboard through the Flask test client with the cache and
+checks it against the SQL keyset pages, and times cached pages and ranks against SQL
+on a larger board.
+
+Run from the repository root:
+    python benchmarks/bench_leaderboard_cache.py [rows]
+"""
+import os
+import random
+import sys
+import time
+
+import fakeredis
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from harness import isolate_services
+isolate_services()
+
+from app import app, db, LeaderboardEntry, leaderboard_cache, limiter
+from leaderboard import keyset_page, order_leaderboard, serialize_entry, entry_rank, score_rank, rebuild_leaderboard_cache
+from leaderboard_cache import LocalLeaderboardCache, RedisLeaderboardCache
+
+REPEATS = 200
+rng = random.Random(18)
+
+
+def insert(n_rows, max_score):
+    db.session.execute(LeaderboardEntry.__table__.insert(), [
+        {'player_name': f'player{rng.randrange(100)}', 'score': rng.randint(0, max_score), 'hodl': rng.random() < 0.3}
+        for _ in range(n_rows)])
+    db.session.commit()
+
+
+def submit(cache, max_score):
+    entry = LeaderboardEntry(player_name='late', score=rng.randint(0, max_score), hodl=False)
+    db.session.add(entry)
+    db.session.commit()
+    cache.add(entry.id, entry.score, serialize_entry(entry))
+    return entry
+
+
+def check(cache, label):
+    query = LeaderboardEntry.query
+    expected = [(entry.id, serialize_entry(entry)) for entry in order_leaderboard(query, 'score', 'desc')]
+    for start in range(0, cache.top_n):
+        for count in (1, 10, 11):
+            cached = cache.page(start, count)
+            if start + count > cache.top_n:
+                assert cached is None, (label, start, count)
+                continue
+            assert cached == (expected[start:start + count], len(expected)), (label, start, count)
+    for position, (entry_id, entry) in enumerate(expected):
+        assert cache.rank(entry_id, entry['score']) == position + 1, (label, entry_id)
+    assert cache.rank(expected[0][0], expected[0][1]['score'] + 1) is None
+    for score in sorted({entry['score'] for _, entry in expected}) + [-1, 10 ** 9]:
+        assert cache.score_rank(score) == score_rank(query, score), (label, score)
+    for entry in query.order_by(db.func.random()).limit(20):
+        assert cache.rank(entry.id, entry.score) == entry_rank(query, entry)
+
+
+def check_backend(cache, label):
+    LeaderboardEntry.query.delete()
+    db.session.commit()
+    insert(300, 40)
+    assert cache.page(0, 10) is None and cache.rank(1, 0) is None
+    rebuild_leaderboard_cache(cache, LeaderboardEntry.query)
+    check(cache, label + ' after rebuild')
+    for _ in range(100):
+        submit(cache, 60)
+    check(cache, label + ' after submits')
+    rebuild_leaderboard_cache(cache, LeaderboardEntry.query)
+    check(cache, label + ' after second rebuild')
+    print(f"{label}: pages, entry ranks and score ranks match SQL")
+
+
+def check_routes(client):
+    LeaderboardEntry.query.delete()
+    db.session.commit()
+    insert(2500, 500)
+    leaderboard_cache.invalidate()
+    cursor, sql_cursor, pages = '', None, 0
+    while cursor is not None:
+        response = client.get(f'/leaderboard?cursor={cursor}').get_json()
+        entries, sql_cursor = keyset_page(LeaderboardEntry.query, 'score', 'desc', sql_cursor, 10)
+        assert response['entries'] == [serialize_entry(entry) for entry in entries]
+        assert response['next_cursor'] == sql_cursor
+        cursor, pages = response['next_cursor'], pages + 1
+    for page in (1, 50, 100, 101, 250, 251):
+        response = client.get(f'/leaderboard?page={page}').get_json()
+        expected = order_leaderboard(LeaderboardEntry.query, 'score', 'desc').paginate(page=page, per_page=10, error_out=False)
+        assert response['entries'] == [serialize_entry(entry) for entry in expected.items]
+        assert response['total_pages'] == expected.pages
+    response = client.post('/submit_score', json={'player_name': 'new', 'score': 250, 'hodl': True})
+    entry = LeaderboardEntry.query.order_by(LeaderboardEntry.id.desc()).first()
+    assert response.get_json()['rank'] == entry_rank(LeaderboardEntry.query, entry)
+    assert client.get('/leaderboard_rank?score=250').get_json()['rank'] == score_rank(LeaderboardEntry.query, 250)[0]
+    print(f"/leaderboard walked {pages} cursor pages and matched SQL; /submit_score and /leaderboard_rank ranks match")
+
+
+def timed(func):
+    func()
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        func()
+    return (time.perf_counter() - started) / REPEATS * 1000
+
+
+def report(n_rows):
+    LeaderboardEntry.query.delete()
+    db.session.commit()
+    insert(n_rows, 200000)
+    query = LeaderboardEntry.query
+    middle = order_leaderboard(query, 'score', 'desc').offset(n_rows // 2).first()
+    for cache, label in ((LocalLeaderboardCache(), 'in-process'),
+                         (RedisLeaderboardCache(fakeredis.FakeStrictRedis()), 'fakeredis')):
+        started = time.perf_counter()
+        rebuild_leaderboard_cache(cache, query)
+        rebuild_s = time.perf_counter() - started
+        print(f"{label:<10} rebuild {n_rows} entries: {rebuild_s:.2f} s  page 1: {timed(lambda: cache.page(0, 11)):.3f} ms  "
+              f"page 90: {timed(lambda: cache.page(890, 11)):.3f} ms  rank: {timed(lambda: cache.rank(middle.id, middle.score)):.3f} ms")
+    print(f"sql        keyset page 1: {timed(lambda: keyset_page(query, 'score', 'desc')):.3f} ms  "
+          f"paginate page 90: {timed(lambda: order_leaderboard(query, 'score', 'desc').paginate(page=90, per_page=10).items):.3f} ms  "
+          f"rank: {timed(lambda: entry_rank(query, middle)):.3f} ms")
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    app.config['WTF_CSRF_ENABLED'] = False
+    limiter.enabled = False
+    with app.app_context():
+        db.create_all()
+        check_backend(LocalLeaderboardCache(top_n=50), 'in-process')
+        check_backend(RedisLeaderboardCache(fakeredis.FakeStrictRedis(), top_n=50), 'redis (fakeredis)')
+        check_routes(app.test_client())
+        report(n_rows)
+        db.session.remove()
+
+
+if __name__ == '__main__':
+    main()
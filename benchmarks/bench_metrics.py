@@ -0,0 +1,99 @@
+# benchmarks/bench_metrics.py
+"""
+Measure what the metrics instrumentation costs and check that /metrics adds up workers.
+
+Times timed() and a counter increment on their own, then a cheap and a data route with
+the request hooks from metrics.instrument_app() and with them taken out. Then checks
+that two registries pushing to one fakeredis hash, as two gunicorn workers do, add up,
+and prints the Server-Timing breakdown an X-Profile request gets.
+
+Run from the repository root:
+    python benchmarks/bench_metrics.py
+"""
+import os
+import sys
+import time
+
+import fakeredis
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from harness import isolate_services
+isolate_services()
+
+from metrics import Metrics, RedisMetricsStore, timed, count_cache
+from app import app, data_refresher
+
+REPEATS = 2000
+
+
+def per_call(func, repeats=REPEATS):
+    func()
+    started = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - started) / repeats * 1000
+
+
+def empty_block():
+    with timed('bench.empty'):
+        pass
+
+
+def check_aggregation():
+    # Two processes' registries, flushed into the same hash
+    client = fakeredis.FakeStrictRedis()
+    store = RedisMetricsStore(client)
+    workers = [Metrics() for _ in range(2)]
+    for worker, hits in zip(workers, (3, 5)):
+        for _ in range(hits):
+            worker.inc('cache_requests_total', cache='derived', name='weekly', result='hit')
+        worker.observe('stage_duration_seconds', 0.002, stage='csv.parse')
+        store.add(worker.drain())
+    workers[0].observe('stage_duration_seconds', 0.2, stage='csv.parse')
+    store.add(workers[0].drain())
+
+    totals = store.totals()
+    assert totals['bpr_cache_requests_total{cache="derived",name="weekly",result="hit"}'] == 8
+    assert totals['bpr_stage_duration_seconds_count{stage="csv.parse"}'] == 3
+    assert totals['bpr_stage_duration_seconds_bucket{stage="csv.parse",le="0.0025"}'] == 2
+    assert totals['bpr_stage_duration_seconds_bucket{stage="csv.parse",le="+Inf"}'] == 3
+    print("two workers' counters and histogram buckets add up in the shared hash")
+
+
+def main():
+    data_refresher.stop()
+    client = app.test_client()
+    print(f"timed() around an empty block: {per_call(empty_block) * 1000:.2f} us")
+    print(f"cache counter increment: "
+          f"{per_call(lambda: count_cache('derived', 'bench', 'hit')) * 1000:.2f} us")
+
+    hooks = [f for f in app.before_request_funcs[None] if getattr(f, '__module__', None) == 'metrics']
+    after = [f for f in app.after_request_funcs[None] if getattr(f, '__module__', None) == 'metrics']
+    assert len(hooks) == 1 and len(after) == 1
+    for path in ('/data_status', '/bitcoin_events'):
+        with_hooks = per_call(lambda: client.get(path, headers={'Accept-Encoding': 'gzip'}))
+        app.before_request_funcs[None].remove(hooks[0])
+        app.after_request_funcs[None].remove(after[0])
+        without_hooks = per_call(lambda: client.get(path, headers={'Accept-Encoding': 'gzip'}))
+        app.before_request_funcs[None].insert(0, hooks[0])
+        app.after_request_funcs[None].append(after[0])
+        print(f"{path}: {without_hooks:.3f} ms without the metrics hooks, {with_hooks:.3f} ms with them "
+              f"(+{(with_hooks - without_hooks) * 1000:.1f} us per request)")
+
+    check_aggregation()
+
+    app.debug = True
+    response = client.get('/terrain_data?ma=45', headers={'X-Profile': '1'})
+    assert response.status_code == 200 and response.headers['Server-Timing'].startswith('total;dur=')
+    print(f"X-Profile /terrain_data?ma=45 (cold): Server-Timing: {response.headers['Server-Timing']}")
+    assert 'Server-Timing' not in client.get('/terrain_data?ma=45').headers
+
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'bpr_request_duration_seconds_count{endpoint="terrain_data",method="GET",status="200"}' in body
+    assert '# TYPE bpr_stage_duration_seconds histogram' in body
+    print(f"/metrics: {len(body.splitlines())} lines")
+
+
+if __name__ == '__main__':
+    main()
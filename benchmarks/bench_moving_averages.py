@@ -0,0 +1,62 @@
+# benchmarks/bench_moving_averages.py
+"""
+Time moving_averages() against computing each window separately.
+
+Computes every window from MA_WINDOW_MIN to MA_WINDOW_MAX (and the presets) over the
+price store, with one cumulative sum, with rolling_mean() per window and with pandas
+rolling().mean() per window, and reports the largest relative difference.
+
+Run from the repository root:
+    python benchmarks/bench_moving_averages.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from harness import isolate_services
+isolate_services()
+
+from datasets import MA_WINDOW_MIN, MA_WINDOW_MAX, MA_PRESET_WINDOWS
+from price_store import load_price_store
+from utils import moving_averages, rolling_mean
+
+REPEATS = 5
+
+
+def timed(func):
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        result = func()
+    return (time.perf_counter() - started) / REPEATS * 1000, result
+
+
+def max_relative_difference(a, b):
+    a, b = np.asarray(a), np.asarray(b)
+    valid = ~np.isnan(b)
+    assert (np.isnan(a) == ~valid).all()
+    return float(np.max(np.abs(a[valid] - b[valid]) / b[valid]))
+
+
+def main():
+    prices = np.asarray(load_price_store()['price'])
+    print(f"{len(prices)} prices")
+    for label, windows in (('presets', MA_PRESET_WINDOWS),
+                           ('all', range(MA_WINDOW_MIN, MA_WINDOW_MAX + 1))):
+        windows = list(windows)
+        engine_ms, engine = timed(lambda: moving_averages(prices, windows))
+        per_window_ms, per_window = timed(lambda: {w: rolling_mean(prices, w) for w in windows})
+        pandas_ms, _ = timed(lambda: {w: pd.Series(prices).rolling(w).mean().to_numpy() for w in windows})
+        ema_ms, _ = timed(lambda: moving_averages(prices, windows, kind='ema'))
+        difference = max(max_relative_difference(engine[w], per_window[w]) for w in windows)
+        print(f"{label:>8}: {len(windows)} windows  cumsum sma {engine_ms:.2f} ms  "
+              f"rolling_mean {per_window_ms:.2f} ms  pandas rolling {pandas_ms:.2f} ms  "
+              f"ema {ema_ms:.2f} ms  max rel diff {difference:.1e}")
+
+
+if __name__ == '__main__':
+    main()
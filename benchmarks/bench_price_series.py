@@ -0,0 +1,162 @@
+# benchmarks/bench_price_series.py
+"""
+Compare the DataFrame serving path with PriceSeries: memory, pickled size and per-request CPU.
+
+For the real history and a synthetic one 100 times longer:
+- memory held by a snapshot, and by the moving averages and levels of detail the app
+  warms on refresh (measured with tracemalloc while they are alive), for the old
+  DataFrame artifacts and the PriceSeries ones,
+- size and load time of the pickled snapshot, which workers read from the shared cache,
+- the work a terrain request does before compression when its payload is not cached
+  (select a range, rename, round, serialize), old and new, checking the bodies match.
+
+Run from the repository root:
+    python benchmarks/bench_price_series.py
+"""
+import gc
+import os
+import pickle
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from harness import isolate_services
+isolate_services()
+
+import numpy as np
+import pandas as pd
+
+from datasets import MA_PRESET_WINDOWS, TERRAIN_LOD_LEVELS, TERRAIN_CHUNK_SIZE
+from payloads import _dumps, encode_terrain_binary
+from price_series import PriceSeries
+from utils import complete_bitcoin_data, moving_averages, rolling_mean, lttb_indices, DAY_MS
+
+REPEATS = 200
+
+
+def per_call(func, repeats=REPEATS):
+    func()
+    started = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - started) / repeats * 1000
+
+
+def held_bytes(build):
+    """Bytes allocated by build() that are still alive while its result is."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return held
+
+
+def longer_history(df, scale, seed=24):
+    """A random-walk history scale times longer than df, ending on the same day, daily as far as 1678 allows."""
+    n = len(df) * scale
+    spacing = DAY_MS
+    while spacing * n > int(df['date_unix'].iloc[-1]) - pd.Timestamp('1678-01-01').value // 1_000_000:
+        spacing //= 2
+    date_unix = int(df['date_unix'].iloc[-1]) - spacing * np.arange(n - 1, -1, -1, dtype=np.int64)
+    price = 100 * np.exp(np.cumsum(np.random.default_rng(seed).normal(0.0, 0.01, n)))
+    df_long = pd.DataFrame({'date': pd.to_datetime(date_unix, unit='ms'), 'price': price, 'date_unix': date_unix})
+    df_long['ma_7'] = rolling_mean(price, 7)
+    return df_long.dropna(subset=['ma_7'])
+
+
+def old_artifacts(df):
+    """The moving averages and levels of detail as DataFrames, the way datasets.py built them before."""
+    artifacts = []
+    for kind in ('sma', 'ema'):
+        averages = moving_averages(df['price'], MA_PRESET_WINDOWS, kind)
+        presets = pd.DataFrame({'date_unix': df['date_unix'].to_numpy(),
+                                **{f'{kind}_{window}': values for window, values in averages.items()}})
+        artifacts.append(presets)
+        for window in MA_PRESET_WINDOWS:
+            series = presets[['date_unix', f'{kind}_{window}']].rename(columns={f'{kind}_{window}': 'value'})
+            artifacts.append(series.dropna(subset=['value']).reset_index(drop=True))
+    base = df[['date_unix', 'ma_7']].rename(columns={'ma_7': 'value'}).dropna(subset=['value']).reset_index(drop=True)
+    artifacts.append(base)
+    for points in TERRAIN_LOD_LEVELS:
+        indices = lttb_indices(base['date_unix'].to_numpy(), base['value'].to_numpy(), points)
+        artifacts.append(base.iloc[indices].reset_index(drop=True))
+    return artifacts
+
+
+def new_artifacts(series):
+    """The same artifacts as datasets.py now builds them."""
+    artifacts = []
+    for kind in ('sma', 'ema'):
+        presets = series.moving_averages('price', MA_PRESET_WINDOWS, kind)
+        artifacts.append(presets)
+        for window in MA_PRESET_WINDOWS:
+            artifacts.append(presets.select(f'{kind}_{window}').rename({f'{kind}_{window}': 'value'}).dropna('value'))
+    base = series.select('ma_7').rename({'ma_7': 'value'})
+    artifacts.append(base)
+    for points in TERRAIN_LOD_LEVELS:
+        artifacts.append(base.take(lttb_indices(base['date_unix'], base['value'], points)))
+    return artifacts
+
+
+def old_body(df, terrain_format, start, stop):
+    """build_terrain_payload() before PriceSeries, without the compression."""
+    df_selected = df.iloc[start:stop].rename(columns={'value': 'ma_7'})
+    if terrain_format == 'binary':
+        return encode_terrain_binary(df_selected['date_unix'], df_selected['ma_7'])
+    df_selected.loc[:, 'ma_7'] = df_selected['ma_7'].round(3)
+    return _dumps(df_selected.to_dict(orient='list' if terrain_format == 'columns' else 'records'))
+
+
+def new_body(series, terrain_format, start, stop):
+    selected = series.window(start, stop)
+    if terrain_format == 'binary':
+        return encode_terrain_binary(selected['date_unix'], selected['value'])
+    selected = selected.rename({'value': 'ma_7'}).round(3)
+    return _dumps(selected.to_dict(orient='list' if terrain_format == 'columns' else 'records'))
+
+
+def main():
+    df_real = complete_bitcoin_data(include_recent=False)
+    for name, df in (('real', df_real), ('x100', longer_history(df_real, 100))):
+        df = df[['date', 'price', 'date_unix', 'ma_7']].copy()
+        series = PriceSeries.from_frame(df, ['price', 'ma_7'])
+        print(f"== {name}: {len(df)} days")
+
+        frame_bytes = held_bytes(lambda: df.copy())
+        # from_frame() keeps views of the frame's columns, so give it a copy that only it holds on to
+        series_bytes = held_bytes(lambda: PriceSeries.from_frame(df.copy(), ['price', 'ma_7']))
+        print(f"snapshot data       DataFrame {frame_bytes / 1024:9.1f} KiB   PriceSeries {series_bytes / 1024:9.1f} KiB")
+        old_held = held_bytes(lambda: old_artifacts(df))
+        new_held = held_bytes(lambda: new_artifacts(series))
+        print(f"warmed averages/LOD DataFrame {old_held / 1024:9.1f} KiB   PriceSeries {new_held / 1024:9.1f} KiB")
+
+        frame_pickle, series_pickle = pickle.dumps(df), pickle.dumps(series)
+        print(f"pickled snapshot    DataFrame {len(frame_pickle) / 1024:9.1f} KiB "
+              f"{per_call(lambda: pickle.loads(frame_pickle), 50):7.3f} ms   "
+              f"PriceSeries {len(series_pickle) / 1024:9.1f} KiB {per_call(lambda: pickle.loads(series_pickle), 50):7.3f} ms")
+
+        old_terrain = df[['date_unix', 'ma_7']].rename(columns={'ma_7': 'value'}).reset_index(drop=True)
+        new_terrain = series.select('ma_7').rename({'ma_7': 'value'})
+        total = len(df)
+        for label, start, stop in (('chunk', total // 2, total // 2 + TERRAIN_CHUNK_SIZE), ('whole', None, None)):
+            for terrain_format in ('records', 'columns', 'binary'):
+                assert old_body(old_terrain, terrain_format, start, stop) == new_body(new_terrain, terrain_format, start, stop)
+                repeats = REPEATS if label == 'chunk' else 5
+                old_ms = per_call(lambda: old_body(old_terrain, terrain_format, start, stop), repeats)
+                new_ms = per_call(lambda: new_body(new_terrain, terrain_format, start, stop), repeats)
+                print(f"uncached {label} {terrain_format:<8}  DataFrame {old_ms:9.3f} ms       "
+                      f"PriceSeries {new_ms:9.3f} ms")
+
+        dates = df['date_unix'].to_numpy()
+        bounds = (int(dates[len(dates) // 3]), int(dates[2 * len(dates) // 3]))
+        old_ms = per_call(lambda: np.searchsorted(old_terrain['date_unix'].to_numpy(), bounds), 2000)
+        new_ms = per_call(lambda: new_terrain.date_range(*bounds), 2000)
+        print(f"date range lookup   DataFrame {old_ms * 1000:9.2f} us       PriceSeries {new_ms * 1000:9.2f} us")
+
+
+if __name__ == '__main__':
+    main()
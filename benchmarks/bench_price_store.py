@@ -0,0 +1,50 @@
+# benchmarks/bench_price_store.py
+"""
+Compare loading the historical prices from CSV with mapping the compiled price store.
+
+Run from the repository root:
+    python benchmarks/bench_price_store.py
+"""
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from harness import isolate_services
+isolate_services()
+
+from price_store import compile_price_store, load_price_store, STORE_PATH
+from utils import get_historical_bitcoin_data
+
+REPEATS = 50
+
+
+def csv_historical_bitcoin_data():
+    """The original CSV loader."""
+    df = pd.read_csv('bitcoin_historical_merged.csv', delimiter=",")
+    df['Start'] = pd.to_datetime(df['Start'])
+    df = df.sort_values('Start')
+    df.rename(columns={'Close': 'price'}, inplace=True)
+    return df
+
+
+def mean_ms(func):
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        func()
+    return (time.perf_counter() - started) / REPEATS * 1000
+
+
+def main():
+    compile_ms = mean_ms(compile_price_store)
+    print(f"compile store:                 {compile_ms:7.2f} ms ({os.path.getsize(STORE_PATH)} bytes)")
+    print(f"CSV read + parse + sort:       {mean_ms(csv_historical_bitcoin_data):7.2f} ms")
+    print(f"map store (incl. hash check):  {mean_ms(load_price_store):7.2f} ms")
+    print(f"get_historical_bitcoin_data(): {mean_ms(get_historical_bitcoin_data):7.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
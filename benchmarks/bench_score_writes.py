@@ -0,0 +1,140 @@
+# benchmarks/bench_score_writes.py
+"""
+Compare /submit_score throughput with one commit per request against write-behind batching.
+
+Submits scores from several threads through the Flask test client into a temporary
+SQLite database, first with the per-request commit, then through ScoreWriter with the
+local journal and with a Redis list (on fakeredis). For write-behind it reports both the
+request rate and the time until every entry is in the database. Then checks that every
+entry arrived exactly once with its submitted fields, that the cached rankings still
+match SQL, that a journal left by a crashed process and a Redis batch taken by a worker
+that died are recovered, and that a failed batch is retried rather than lost.
+
+Run from the repository root:
+    python benchmarks/bench_score_writes.py [threads] [scores per thread]
+"""
+import os
+import sys
+import threading
+import time
+
+import fakeredis
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from harness import isolate_services
+SCRATCH = isolate_services()['scratch']
+os.environ['SCORE_WRITE_BEHIND'] = 'false'
+
+import app as app_module
+from app import app, db, LeaderboardEntry, leaderboard_cache, limiter, write_scores
+from leaderboard import entry_rank
+from score_writer import ScoreWriter, JournalScoreQueue, RedisScoreQueue
+
+
+def run_clients(threads, per_thread):
+    def client_loop(worker):
+        client = app.test_client()
+        for i in range(per_thread):
+            response = client.post('/submit_score', json={'player_name': f'w{worker}-{i}', 'score': worker * 1000 + i,
+                                                          'hodl': i % 2 == 0})
+            assert response.status_code in (201, 202), response.get_json()
+
+    workers = [threading.Thread(target=client_loop, args=(worker,)) for worker in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - started
+
+
+def check_entries(threads, per_thread):
+    entries = LeaderboardEntry.query.all()
+    assert len(entries) == threads * per_thread, len(entries)
+    assert {(e.player_name, e.score, e.hodl) for e in entries} == {
+        (f'w{w}-{i}', w * 1000 + i, i % 2 == 0) for w in range(threads) for i in range(per_thread)}
+    for entry in LeaderboardEntry.query.order_by(db.func.random()).limit(20):
+        assert leaderboard_cache.rank(entry.id, entry.score) == entry_rank(LeaderboardEntry.query, entry)
+
+
+def reset():
+    LeaderboardEntry.query.delete()
+    db.session.commit()
+    leaderboard_cache.invalidate()
+    app.test_client().get('/leaderboard')
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+    total = threads * per_thread
+    app.config['WTF_CSRF_ENABLED'] = False
+    limiter.enabled = False
+    with app.app_context():
+        db.create_all()
+        print(f"{threads} threads x {per_thread} scores into SQLite at {SCRATCH}")
+
+        journal = os.path.join(SCRATCH, 'scores.journal')
+        modes = [
+            ('per-request commit', lambda: None),
+            ('write-behind, journal', lambda: ScoreWriter(JournalScoreQueue(journal), write_scores, 100, 1.0)),
+            ('write-behind, redis list', lambda: ScoreWriter(RedisScoreQueue(fakeredis.FakeStrictRedis()),
+                                                            write_scores, 100, 1.0)),
+        ]
+        for label, make_writer in modes:
+            reset()
+            writer = make_writer()
+            app_module.score_writer = writer.start() if writer else None
+            started = time.perf_counter()
+            submit_s = run_clients(threads, per_thread)
+            if writer:
+                writer.stop()
+            durable_s = time.perf_counter() - started
+            app_module.score_writer = None
+            check_entries(threads, per_thread)
+            print(f"{label:<26} {total / submit_s:8.0f} submits/s   all {total} in the database after {durable_s:.2f} s")
+        assert os.path.getsize(f'{journal}.{os.getpid()}') == 0
+
+        # A process that dies with scores queued leaves them in the journal for the next start
+        crash_journal = os.path.join(SCRATCH, 'crash.journal')
+        crashed = JournalScoreQueue(crash_journal)
+        for i in range(5):
+            crashed.push({'player_name': f'crash{i}', 'score': i, 'hodl': False, 'timestamp': '2026-01-01T00:00:00+00:00'})
+        # As if written by a process now gone: its lock is released and its pid is not this one
+        crashed._journal.close()
+        os.rename(f'{crash_journal}.{os.getpid()}', f'{crash_journal}.1')
+        recovered = JournalScoreQueue(crash_journal)
+        assert [entry['player_name'] for entry in recovered.take(10)] == [f'crash{i}' for i in range(5)]
+
+        # A worker that dies between take() and ack() leaves its batch for the others to requeue
+        client = fakeredis.FakeStrictRedis()
+        dead, alive = RedisScoreQueue(client), RedisScoreQueue(client)
+        for i in range(5):
+            dead.push({'player_name': f'lost{i}', 'score': i, 'hodl': False, 'timestamp': '2026-01-01T00:00:00+00:00'})
+        assert len(dead.take(3)) == 3 and len(alive) == 2 and alive.recover() == 0
+        client.delete(dead._processing_key() + ':lease')
+        assert alive.recover() == 3
+        assert [entry['player_name'] for entry in alive.take(10)] == [f'lost{i}' for i in range(5)]
+
+        # A failing write puts the batch back; the next flush writes it
+        reset()
+        failures = [1]
+
+        def flaky_write(batch):
+            if failures[0]:
+                failures[0] -= 1
+                raise RuntimeError('database unavailable')
+            write_scores(batch)
+
+        writer = ScoreWriter(JournalScoreQueue(os.path.join(SCRATCH, 'flaky.journal')), flaky_write, 10, 60)
+        for i in range(25):
+            writer.submit({'player_name': f'flaky{i}', 'score': i, 'hodl': False, 'timestamp': '2026-01-01T00:00:00+00:00'})
+        assert writer.flush() == 0 and len(writer.queue) == 25
+        assert writer.flush() == 25 and LeaderboardEntry.query.count() == 25
+        print("crash recovery (journal and redis) and retry after a failed write all keep every score")
+        db.session.remove()
+
+
+if __name__ == '__main__':
+    main()
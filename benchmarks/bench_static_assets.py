@@ -0,0 +1,180 @@
+# benchmarks/bench_static_assets.py
+"""
+Compare a first and a repeat visit to / and /game before and after fingerprinting static files.
+
+A small browser model loads each page and everything it pulls from /static: the
+stylesheets, scripts and images in the HTML, the url(...) images in the CSS, the game's
+ES modules through their imports (and the import map, when the page has one) and the
+images and sounds GameScene.js loads. It keeps an HTTP cache and asks for br/gzip, and
+the repeat visit happens a day later: a cached file is reused without a request only
+while its max-age lasts (or for good if it is immutable), otherwise it is revalidated
+with If-None-Match / If-Modified-Since.
+
+"Before" is the production stack as it was: WhiteNoise over static/ without a URL prefix,
+so /static/ fell through to Flask's send_from_directory (no-cache, uncompressed). "After"
+is static_assets.static_files_app() over the fingerprinted build. Bytes count response
+headers and bodies as received.
+
+Run from the repository root:
+    python benchmarks/bench_static_assets.py
+"""
+import gzip
+import json
+import os
+import re
+import sys
+import time
+from urllib.parse import urljoin, urlsplit
+
+import brotli
+from werkzeug.datastructures import ResponseCacheControl
+from werkzeug.http import parse_cache_control_header
+from werkzeug.test import Client
+from whitenoise import WhiteNoise
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from harness import isolate_services
+isolate_services()
+os.environ['STATIC_FINGERPRINT'] = 'true'
+
+import app as app_module
+from app import app, data_refresher
+from static_assets import STATIC_DIR, BUILD_DIR, build_static_assets, read_static_manifest
+
+DAY = 24 * 3600
+PAGES = ('/', '/game')
+
+_HTML_URL = re.compile(r'''(?:src|href|content)="(/static/[^"]+)"''')
+_CSS_URL = re.compile(r'''url\(\s*['"]?([^'")]+?)['"]?\s*\)''')
+_JS_IMPORT = re.compile(r'''^\s*import\s+(?:[^'"]*?\s+from\s+)?['"]([^'"]+)['"]''', re.M)
+_ASSET_URL = re.compile(r'''assetUrl\('([^']+)'\)''')
+_IMPORT_MAP = re.compile(r'<script type="importmap">(.*?)</script>', re.S)
+_ASSET_MAP = re.compile(r'window\.STATIC_ASSET_URLS = (\{.*?\});', re.S)
+
+
+class Browser:
+    """Fetches pages and their static files through an HTTP cache, counting requests and bytes."""
+
+    def __init__(self, wsgi_app):
+        self.client = Client(wsgi_app)
+        self.cache = {}
+        self.now = time.time()
+        self.reset()
+
+    def reset(self):
+        self.requests = self.revalidated = self.from_cache = self.bytes = 0
+
+    def fetch(self, url):
+        entry = self.cache.get(url)
+        if entry and (entry['immutable'] or self.now < entry['expires']):
+            self.from_cache += 1
+            return entry['body']
+        headers = {'Accept-Encoding': 'br, gzip'}
+        if entry and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        response = self.client.get(url, headers=headers)
+        data = response.get_data()
+        self.requests += 1
+        self.bytes += len(data) + sum(len(f"{k}: {v}\r\n") for k, v in response.headers.items())
+        if response.status_code == 304:
+            self.revalidated += 1
+            body = entry['body']
+        else:
+            assert response.status_code == 200, (url, response.status_code)
+            encoding = response.headers.get('Content-Encoding')
+            body = brotli.decompress(data) if encoding == 'br' else gzip.decompress(data) if encoding == 'gzip' else data
+        cache_control = parse_cache_control_header(response.headers.get('Cache-Control'), cls=ResponseCacheControl)
+        max_age = 0 if cache_control.no_cache or cache_control.max_age is None else cache_control.max_age
+        self.cache[url] = {'body': body, 'etag': response.headers.get('ETag'),
+                           'last_modified': response.headers.get('Last-Modified'),
+                           'immutable': bool(cache_control.immutable), 'expires': self.now + max_age}
+        return body
+
+    def visit(self, page):
+        """Load page and every static file it pulls in, returning the static URLs fetched."""
+        html = self.client.get(page).get_data(as_text=True)
+        import_map = json.loads(_IMPORT_MAP.search(html).group(1))['imports'] if _IMPORT_MAP.search(html) else {}
+        asset_map = json.loads(_ASSET_MAP.search(html).group(1)) if _ASSET_MAP.search(html) else {}
+        pending = [urlsplit(url).path for url in _HTML_URL.findall(html)]
+        seen = []
+        while pending:
+            url = pending.pop(0)
+            if url in seen:
+                continue
+            seen.append(url)
+            body = self.fetch(url)
+            if url.endswith('.css'):
+                pending += [urljoin(url, ref) for ref in _CSS_URL.findall(body.decode('utf-8'))]
+            elif url.endswith('.js'):
+                source = body.decode('utf-8')
+                for specifier in _JS_IMPORT.findall(source):
+                    resolved = urljoin(url, specifier)
+                    pending.append(import_map.get(resolved, resolved))
+                # GameScene.js resolves asset paths against the page, /game, when there is no map
+                pending += [asset_map.get(path, urljoin(page, f'static/{path}')) for path in _ASSET_URL.findall(source)]
+        return seen
+
+
+def run_visits(label, wsgi_app):
+    browser = Browser(wsgi_app)
+    results = []
+    for visit in ('first', 'repeat'):
+        browser.reset()
+        files = set()
+        for page in PAGES:
+            files.update(browser.visit(page))
+        print(f"{label:<7} {visit:<7} visit: {len(files):3d} static files, {browser.requests:3d} requests "
+              f"({browser.revalidated:3d} answered 304), {browser.from_cache:3d} from cache without a request, "
+              f"{browser.bytes / 1024:8.1f} KiB received")
+        results.append((browser.requests, browser.bytes))
+        browser.now += DAY
+    return results
+
+
+def check_build(manifest):
+    """Every hashed file is served immutable, precompressed when worth it, and decodes to the build's content."""
+    client = Client(app_module.static_files_app(app.wsgi_app, BUILD_DIR, app.static_url_path))
+    for name, hashed in manifest.items():
+        response = client.get(f'/static/{hashed}', headers={'Accept-Encoding': 'br, gzip'})
+        assert response.status_code == 200 and 'immutable' in response.headers['Cache-Control'], name
+        data = response.get_data()
+        if response.headers.get('Content-Encoding') == 'br':
+            data = brotli.decompress(data)
+        with open(os.path.join(BUILD_DIR, hashed), 'rb') as f:
+            assert data == f.read(), name
+        if not name.endswith('.css'):
+            with open(os.path.join(STATIC_DIR, name), 'rb') as f:
+                assert data == f.read(), name
+    response = client.get('/static/js/main.js')
+    assert 'immutable' not in response.headers['Cache-Control']
+    print(f"{len(manifest)} hashed files served immutable and match their sources; unhashed names revalidate")
+
+
+def main():
+    data_refresher.stop()
+    started = time.perf_counter()
+    build_static_assets(STATIC_DIR, BUILD_DIR)
+    print(f"build_static_assets(): {(time.perf_counter() - started) * 1000:.0f} ms")
+    manifest = read_static_manifest(BUILD_DIR)['files']
+    assert app_module.static_manifest == manifest
+    check_build(manifest)
+
+    after = run_visits('after', app_module.static_files_app(app.wsgi_app, BUILD_DIR, app.static_url_path))
+
+    # The app as it was: no manifest, Flask serving static/, WhiteNoise mounted at / instead of /static/
+    app_module.static_manifest = {}
+    app_module.static_import_map = {'imports': {}}
+    app_module.static_asset_urls = {}
+    app.static_folder = STATIC_DIR
+    before = run_visits('before', WhiteNoise(app.wsgi_app, root=STATIC_DIR))
+
+    for (visit, (old_requests, old_bytes), (new_requests, new_bytes)) in zip(('first', 'repeat'), before, after):
+        print(f"{visit} visit saves {old_requests - new_requests} requests and "
+              f"{(old_bytes - new_bytes) / 1024:.1f} KiB ({1 - new_bytes / old_bytes:.1%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# benchmarks/bench_terrain_chunks.py
+"""
+Compare loading the game terrain in chunks with loading it in one response.
+
+Reports the bytes the client must download before the first frame (the first chunk
+vs the whole series), the time to serve each through the Flask test client, and how
+many chunk ETags survive a data refresh that appends one day.
+
+Run from the repository root:
+    python benchmarks/bench_terrain_chunks.py
+"""
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from harness import isolate_services
+isolate_services()
+
+from app import app, data_refresher, derived_datasets, build_terrain_payload
+from datasets import TERRAIN_CHUNK_SIZE
+from refresher import DataSnapshot
+from price_series import PriceSeries
+from utils import DAY_MS, append_bitcoin_data
+
+REPEATS = 50
+HEADERS = {'Accept-Encoding': 'gzip'}
+
+
+def timed(func):
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        result = func()
+    return (time.perf_counter() - started) / REPEATS * 1000, result
+
+
+def chunk_etags(snapshot):
+    total = len(snapshot.series)
+    return [build_terrain_payload(derived_datasets, snapshot, terrain_format='binary', start=start,
+                                  stop=min(start + TERRAIN_CHUNK_SIZE, total)).etag
+            for start in range(0, total, TERRAIN_CHUNK_SIZE)]
+
+
+def main():
+    client = app.test_client()
+    snapshot = data_refresher.snapshot()
+    print(f"{len(snapshot.series)} terrain points, chunks of {TERRAIN_CHUNK_SIZE}")
+
+    full_ms, full = timed(lambda: client.get('/terrain_data?format=binary', headers=HEADERS))
+    first_ms, first = timed(lambda: client.get(f'/terrain_data?format=binary&from=0&to={TERRAIN_CHUNK_SIZE}',
+                                               headers=HEADERS))
+    print(f"whole series: {len(full.data):>6} bytes gzip, served in {full_ms:.2f} ms")
+    print(f"first chunk:  {len(first.data):>6} bytes gzip, served in {first_ms:.2f} ms")
+
+    last_day = int(snapshot.series['date_unix'][-1])
+    df_new = pd.DataFrame({'date_unix': [last_day + DAY_MS], 'price': [float(snapshot.series['price'][-1])]})
+    df_new['date'] = pd.to_datetime(df_new['date_unix'], unit='ms')
+    df = append_bitcoin_data(snapshot.series.to_frame(), df_new)
+    appended = DataSnapshot(PriceSeries.from_frame(df, ['price', 'ma_7']), snapshot.version + 1,
+                            datetime.now(timezone.utc), 0.0, True, snapshot.version, 1)
+    before, after = chunk_etags(snapshot), chunk_etags(appended)
+    unchanged = sum(a == b for a, b in zip(before, after))
+    print(f"after appending a day: {unchanged} of {len(after)} chunk ETags unchanged")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# benchmarks/bench_terrain_formats.py
+"""
+Compare the records, columns and binary representations of /terrain_data.
+
+Reports payload size per Content-Encoding, the one-off build time per data version,
+the time to serve a warm request through the Flask test client, and the time to decode
+each body back into arrays (a stand-in for client-side parsing).
+
+Run from the repository root:
+    python benchmarks/bench_terrain_formats.py
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from harness import isolate_services
+isolate_services()
+
+from app import app, limiter, data_refresher, derived_datasets, build_terrain_payload, TERRAIN_FORMATS
+from payloads import decode_terrain_binary
+
+REPEATS = 50
+
+
+def timed(func, repeats=REPEATS):
+    started = time.perf_counter()
+    for _ in range(repeats):
+        result = func()
+    return (time.perf_counter() - started) / repeats * 1000, result
+
+
+def decode(terrain_format, body):
+    if terrain_format == 'binary':
+        return decode_terrain_binary(body)
+    data = json.loads(body)
+    if terrain_format == 'columns':
+        return data['date_unix'], data['ma_7']
+    return [d['date_unix'] for d in data], [d['ma_7'] for d in data]
+
+
+def main():
+    # /terrain_data is rate limited per IP, and every request here comes from the test client
+    limiter.enabled = False
+    snapshot = data_refresher.snapshot()
+    client = app.test_client()
+    print(f"{len(snapshot.series)} terrain points")
+    print(f"{'format':>8} {'identity':>9} {'gzip':>8} {'br':>8} {'build ms':>9} {'serve ms':>9} {'decode ms':>10}")
+    for terrain_format in TERRAIN_FORMATS:
+        build_ms, payload = timed(lambda: build_terrain_payload(derived_datasets, snapshot, terrain_format=terrain_format), repeats=3)
+        serve_ms, _ = timed(lambda: client.get(f'/terrain_data?format={terrain_format}',
+                                              headers={'Accept-Encoding': 'br, gzip'}))
+        decode_ms, _ = timed(lambda: decode(terrain_format, payload.body))
+        sizes = payload.sizes()
+        print(f"{terrain_format:>8} {sizes['identity']:>9} {sizes['gzip']:>8} {sizes['br'] or '-':>8} "
+              f"{build_ms:>9.1f} {serve_ms:>9.2f} {decode_ms:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# benchmarks/bench_terrain_lod.py
+"""
+Compare downsampled terrain levels with the full series.
+
+For each level in TERRAIN_LOD_LEVELS reports the LTTB time, the payload size per
+format and Content-Encoding, and how far the downsampled line strays from the full
+one (largest vertical gap after linear interpolation, as a share of the price range
+of the surrounding year, since prices span five orders of magnitude). Min/max
+bucketing, which keeps the extremes of each bucket, is shown for comparison.
+
+Run from the repository root:
+    python benchmarks/bench_terrain_lod.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from harness import isolate_services
+isolate_services()
+
+from app import data_refresher, derived_datasets, build_terrain_payload, TERRAIN_FORMATS
+from datasets import TERRAIN_LOD_LEVELS
+from utils import lttb_indices
+
+YEAR = 365
+
+
+def minmax_indices(y, threshold):
+    edges = np.linspace(0, len(y), threshold // 2 + 1).astype(np.int64)
+    indices = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        bucket = y[start:end]
+        indices.extend(sorted({start + int(np.argmin(bucket)), start + int(np.argmax(bucket))}))
+    return np.array(indices)
+
+
+def shape_error(x, y, indices):
+    approximation = np.interp(x, x[indices], y[indices])
+    windows = np.lib.stride_tricks.sliding_window_view(np.pad(y, YEAR // 2, mode='edge'), YEAR)
+    local_range = windows.max(axis=1) - windows.min(axis=1)
+    return float(np.max(np.abs(approximation - y) / np.where(local_range > 0, local_range, 1)))
+
+
+def main():
+    snapshot = data_refresher.snapshot()
+    series = derived_datasets.get('moving_average', snapshot, window=7, kind='sma')
+    x = series['date_unix'].astype(np.float64)
+    y = series['value']
+
+    print(f"{len(series)} terrain points")
+    header = f"{'points':>7} {'lttb ms':>8} {'lttb err':>9} {'minmax err':>11}"
+    for terrain_format in TERRAIN_FORMATS:
+        header += f" {terrain_format + ' id/gz/br':>26}"
+    print(header)
+    for points in (None,) + TERRAIN_LOD_LEVELS:
+        row = f"{points or 'all':>7}"
+        if points is None:
+            row += f" {'-':>8} {'-':>9} {'-':>11}"
+        else:
+            started = time.perf_counter()
+            indices = lttb_indices(x, y, points)
+            lttb_ms = (time.perf_counter() - started) * 1000
+            row += (f" {lttb_ms:>8.2f} {shape_error(x, y, indices):>9.3f}"
+                    f" {shape_error(x, y, minmax_indices(y, points)):>11.3f}")
+        for terrain_format in TERRAIN_FORMATS:
+            sizes = build_terrain_payload(derived_datasets, snapshot, terrain_format=terrain_format,
+                                          points=points).sizes()
+            row += f" {sizes['identity']:>10}/{sizes['gzip']:>6}/{sizes['br'] or '-':>6}"
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
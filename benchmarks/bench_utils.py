@@ -0,0 +1,146 @@
+# benchmarks/bench_utils.py
+"""
+Micro-benchmarks for every data function in utils.py, on real and synthetic histories.
+
+'real' is the merged CSV history as the app builds it. 'x10' and 'x100' are synthetic
+random-walk histories 10 and 100 times longer, ending on the same day. A datetime64[ns]
+cannot go back past 1677, so histories that would start earlier are sampled more
+often than daily, and each result records the spacing. Functions that read files or
+call CoinGecko (stubbed) run on the real data only, as does building a compressed
+Payload. The serialization cases compare the old DataFrame.to_dict() + json.dumps
+path with the pre-serialized payloads.
+
+Writes a JSON report (see harness.py) to stdout or --output.
+
+Run from the repository root:
+    python benchmarks/bench_utils.py [--scales 10,100] [--min-time 0.3] [--output utils.json]
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from harness import isolate_services, time_call, peak_rss_kb, environment, write_report, StubCoinGecko
+isolate_services()
+
+import numpy as np
+import pandas as pd
+
+import utils
+from utils import DAY_MS
+from datasets import MA_PRESET_WINDOWS
+from payloads import Payload, record_fragments
+
+EARLIEST_MS = pd.Timestamp('1678-01-01').value // 1_000_000
+EVENTS = 30
+HOUR_SPAN = 365 * DAY_MS
+
+
+def synthetic_history(df_real, scale, seed=21):
+    """A random-walk history scale times longer than df_real, shaped like complete_bitcoin_data()."""
+    n = len(df_real) * scale
+    end = int(df_real['date_unix'].iloc[-1])
+    spacing = DAY_MS
+    while spacing * n > end - EARLIEST_MS:
+        spacing //= 2
+    date_unix = end - spacing * np.arange(n - 1, -1, -1, dtype=np.int64)
+    rng = np.random.default_rng(seed)
+    price = 100 * np.exp(np.cumsum(rng.normal(0.0005, 0.03, n)))
+    df = pd.DataFrame({'date': pd.to_datetime(date_unix, unit='ms'), 'price': price, 'date_unix': date_unix})
+    df['ma_7'] = utils.rolling_mean(df['price'], 7)
+    return df.dropna(subset=['ma_7']).reset_index(drop=True), spacing
+
+
+def cases(df, real=False):
+    """(name, callable) pairs for one history; df has the columns complete_bitcoin_data() returns."""
+    values = df['price'].to_numpy()
+    x = df['date_unix'].to_numpy(dtype=np.float64)
+    y = df['ma_7'].to_numpy()
+    df_weekly = utils.resample_weekly(df)
+    weekly_ma = df_weekly['ma_7'].to_numpy()
+    tops = utils.local_top_indices(weekly_ma)
+    last = int(df['date_unix'].iloc[-1])
+    df_new = pd.DataFrame({'date_unix': [last + DAY_MS], 'price': [float(values[-1])]})
+    df_new['date'] = pd.to_datetime(df_new['date_unix'], unit='ms')
+    events = np.random.default_rng(3).choice(df['date_unix'].to_numpy(), EVENTS)
+    hourly = pd.DataFrame({'date_unix': last - HOUR_SPAN + np.arange(0, HOUR_SPAN, 3_600_000)})
+    hourly['price'] = 1.0
+    terrain = df[['date_unix', 'ma_7']]
+
+    return [
+        ('to_unix_ms', lambda: utils.to_unix_ms(df['date'])),
+        ('rolling_mean', lambda: utils.rolling_mean(df['price'], 7)),
+        ('moving_averages[sma]', lambda: utils.moving_averages(values, MA_PRESET_WINDOWS, 'sma')),
+        ('moving_averages[ema]', lambda: utils.moving_averages(values, MA_PRESET_WINDOWS, 'ema')),
+        ('lttb_indices[1000]', lambda: utils.lttb_indices(x, y, 1000)),
+        ('daily_closes[365d hourly]', lambda: utils.daily_closes(hourly, until_unix_ms=last)),
+        ('append_bitcoin_data[1 day]', lambda: utils.append_bitcoin_data(df, df_new)),
+        ('resample_weekly', lambda: utils.resample_weekly(df)),
+        ('update_weekly[1 day]', lambda: utils.update_weekly(df_weekly, df, 1)),
+        ('local_top_indices', lambda: utils.local_top_indices(weekly_ma)),
+        ('first_drawdown_indices', lambda: utils.first_drawdown_indices(weekly_ma, tops, 0.1)),
+        ('drawdowns_from_weekly', lambda: utils.drawdowns_from_weekly(df_weekly, tops, 0.1)),
+        ('obstacles_drawdowns_weekly', lambda: utils.obstacles_drawdowns_weekly(0.1, df)),
+        ('nearest_indices[events]', lambda: utils.nearest_indices(df['date_unix'].to_numpy(), events)),
+        ('sample_indices[60]', lambda: utils.sample_indices(len(df), 60)),
+        ('get_random_bitcoin_data[60]', lambda: utils.get_random_bitcoin_data(df, 60)),
+        ('serialize terrain to_dict+json', lambda: json.dumps(terrain.to_dict(orient='records'))),
+        ('serialize terrain record_fragments', lambda: record_fragments(terrain)),
+    ] + ([
+        # Built once per data version; brotli at quality 11 takes over a minute per call on x100
+        ('serialize terrain Payload[gzip 9, brotli 11]', lambda: Payload.from_records(terrain)),
+    ] if real else [])
+
+
+def io_cases():
+    """Functions that read the price store, the CSVs or (stubbed) CoinGecko; real data only."""
+    cg = StubCoinGecko()
+    df = utils.complete_bitcoin_data(include_recent=False)
+    since = int(df['date_unix'].iloc[-1]) + DAY_MS
+    return [
+        ('get_historical_bitcoin_data', utils.get_historical_bitcoin_data),
+        ('complete_bitcoin_data[csv only]', lambda: utils.complete_bitcoin_data(include_recent=False)),
+        ('complete_bitcoin_data[stub coingecko]', lambda: utils.complete_bitcoin_data(cg=cg)),
+        ('get_last_year_bitcoin_data[stub]', lambda: utils.get_last_year_bitcoin_data(cg)),
+        ('get_bitcoin_data_since[stub]', lambda: utils.get_bitcoin_data_since(since, cg=cg)),
+        ('get_bitcoin_events', utils.get_bitcoin_events),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scales', default='10,100', help='Synthetic history lengths, as multiples of the real one')
+    parser.add_argument('--min-time', type=float, default=0.3, help='Seconds to spend timing each case')
+    parser.add_argument('--output', default=None, help='Report path (default: stdout)')
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    df_real = utils.complete_bitcoin_data(include_recent=False)
+    histories = [('real', df_real, DAY_MS)]
+    for scale in (int(s) for s in args.scales.split(',') if s):
+        df, spacing = synthetic_history(df_real, scale)
+        histories.append((f'x{scale}', df, spacing))
+
+    results = []
+    for name, func in io_cases():
+        results.append(dict(name=name, dataset='real', rows=len(df_real), spacing_hours=24.0,
+                            **time_call(func, args.min_time)))
+        print(f"{name:<40} real  {results[-1]['p50_ms']:10.3f} ms", file=sys.stderr)
+    for dataset, df, spacing in histories:
+        for name, func in cases(df, real=dataset == 'real'):
+            results.append(dict(name=name, dataset=dataset, rows=len(df), spacing_hours=spacing / 3_600_000,
+                                **time_call(func, args.min_time)))
+            print(f"{name:<40} {dataset:<5} {results[-1]['p50_ms']:10.3f} ms", file=sys.stderr)
+
+    write_report({
+        'suite': 'utils',
+        'environment': environment(),
+        'peak_rss_kb': peak_rss_kb(),
+        'results': results,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
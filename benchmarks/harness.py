@@ -0,0 +1,205 @@
+# benchmarks/harness.py
+"""
+Shared setup for the benchmark suite: isolated services, timing statistics and reports.
+
+isolate_services() must run before app (or utils) is imported. It points the price
+store, the database, the static build and Redis at scratch copies and replaces CoinGecko with a
+deterministic stub, so a benchmark never touches the network, the repository's price
+store or a real database.
+
+Reports are JSON documents with an 'environment' block (commit, Python, library
+versions, CPU count) and a list of 'results', so runs can be stored and compared.
+"""
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOUR_MS = 3_600_000
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+class StubCoinGecko:
+    """Hourly prices from a deterministic random walk, like CoinGecko's 1-90 day granularity."""
+
+    def __init__(self, api_key='', retries=5):
+        self.request_timeout = 120
+
+    def get_coin_market_chart_range_by_id(self, id, vs_currency, from_timestamp, to_timestamp):
+        start = -(-from_timestamp * 1000 // HOUR_MS) * HOUR_MS
+        timestamps = np.arange(start, to_timestamp * 1000 + 1, HOUR_MS)
+        prices = 100000 * np.exp(np.sin(timestamps / 1e9) + 0.01 * np.cos(timestamps / 1e7))
+        return {'prices': [[int(t), float(p)] for t, p in zip(timestamps, prices)]}
+
+    def get_coin_market_chart_by_id(self, id, vs_currency, days):
+        to_timestamp = int(time.time())
+        return self.get_coin_market_chart_range_by_id(id, vs_currency, to_timestamp - int(days) * 86400, to_timestamp)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_fake_redis():
+    """Serve fakeredis on a local TCP port, so redis-py, the limiter and gunicorn workers all connect to it."""
+    from fakeredis import TcpFakeServer
+    from redis.exceptions import ResponseError
+    server = TcpFakeServer(('127.0.0.1', free_port()))
+    handler = server.RequestHandlerClass
+
+    class Handler(handler):
+        def setup(self):
+            super().setup()
+            # Replies go out in several small writes; without TCP_NODELAY, Nagle's algorithm and delayed
+            # ACKs hold each multi-part reply for 40 ms, which would swamp every Redis-backed timing
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            # The stock handler drops the connection after any error reply. redis-py's Lock runs its
+            # release script with EVALSHA and expects a NOSCRIPT reply on a connection it can reuse,
+            # so without this every first lock release fails and the lock stays held until it expires.
+            read_response = self.current_client.read_response
+
+            def read_response_or_error():
+                try:
+                    return read_response()
+                except ResponseError as e:
+                    return e
+
+            self.current_client.read_response = read_response_or_error
+
+    server.RequestHandlerClass = Handler
+    # Connection threads must not keep the benchmark process alive after it finishes
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='fake-redis', daemon=True).start()
+    return server, f'redis://127.0.0.1:{server.server_address[1]}/0'
+
+
+def isolate_services(redis='local'):
+    """
+    Point the app at scratch services. Call before importing app or utils.
+
+    Parameters:
+    redis (str): 'local' for the in-process fallbacks, or 'fakeredis' for a fakeredis TCP server.
+
+    Returns:
+    dict: The scratch directory and the environment variables that were set, which a
+        gunicorn started by the caller must inherit.
+    """
+    scratch = tempfile.mkdtemp(prefix='bpr-bench-')
+    env = {
+        'PRICE_STORE_PATH': os.path.join(scratch, 'bitcoin_prices.bin'),
+        'DATABASE_URL': f"sqlite:///{os.path.join(scratch, 'app.db')}",
+        'SCORE_JOURNAL_PATH': os.path.join(scratch, 'scores.journal'),
+        'STATIC_BUILD_DIR': os.path.join(scratch, 'static_build'),
+        'REDIS_URL': 'local',
+    }
+    if redis == 'fakeredis':
+        _, env['REDIS_URL'] = start_fake_redis()
+    os.environ.update(env)
+
+    import utils
+    utils.CoinGeckoAPI = StubCoinGecko
+    return {'scratch': scratch, 'env': env}
+
+
+def summarize(samples_ms):
+    """Count, mean and percentiles of a list of durations in milliseconds."""
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    if len(samples) == 0:
+        return {'count': 0}
+    return {
+        'count': int(len(samples)),
+        'mean_ms': round(float(samples.mean()), 4),
+        'min_ms': round(float(samples.min()), 4),
+        'p50_ms': round(float(np.percentile(samples, 50)), 4),
+        'p90_ms': round(float(np.percentile(samples, 90)), 4),
+        'p99_ms': round(float(np.percentile(samples, 99)), 4),
+        'max_ms': round(float(samples.max()), 4),
+    }
+
+
+def time_call(func, min_time=0.3, min_repeats=3, max_repeats=1000):
+    """
+    Time func() repeatedly after one warm-up call, for about min_time seconds.
+
+    Returns:
+    dict: summarize() of the individual call durations.
+    """
+    func()
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_repeats and (len(samples) < min_repeats or time.perf_counter() - started < min_time):
+        call_started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - call_started) * 1000)
+    return summarize(samples)
+
+
+def peak_rss_kb(pid=None):
+    """Peak resident set size in KiB of this process, or of pid (Linux /proc)."""
+    if pid is None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1])
+    return None
+
+
+def memory_kb(pid='self'):
+    """
+    Current memory of pid in KiB (Linux /proc/<pid>/smaps_rollup).
+
+    Returns:
+    dict: rss, pss (shared pages divided among the processes sharing them) and private
+        (pages only this process maps), so copy-on-write sharing between forked
+        gunicorn workers shows up as pss and private well below rss.
+    """
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if value.strip().endswith('kB'):
+                fields[key] = int(value.split()[0])
+    return {'rss': fields['Rss'], 'pss': fields['Pss'], 'private': fields['Private_Clean'] + fields['Private_Dirty']}
+
+
+def environment():
+    import pandas as pd
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'commit': commit,
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+    }
+
+
+def write_report(report, output=None):
+    """Write report as JSON to output, or to stdout when output is None or '-'."""
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if output in (None, '-'):
+        print(text)
+    else:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
@@ -0,0 +1,16 @@
+# benchmarks/load_app.py
+"""
+The app as load_test.py serves it through gunicorn: CoinGecko stubbed, rate limits off.
+
+The services themselves (price store, database, Redis) come from the environment that
+load_test.py sets up with harness.isolate_services() and passes on to gunicorn.
+"""
+import utils
+from harness import StubCoinGecko
+
+utils.CoinGeckoAPI = StubCoinGecko
+
+from app import app, limiter
+
+# Every load-test client comes from 127.0.0.1, so the per-IP limits would turn the run into 429s
+limiter.enabled = False
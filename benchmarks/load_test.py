@@ -0,0 +1,330 @@
+# benchmarks/load_test.py
+"""
+Load harness: drive the game-data and leaderboard routes concurrently and report latency.
+
+Runs each scenario for --duration seconds with --concurrency client threads, then writes
+a JSON report (see harness.py) with p50/p90/p99 latency, throughput, status counts and
+peak RSS per scenario, so runs can be compared across commits.
+
+Two targets:
+    test-client  The app in this process through Flask's test client. No network or
+                 WSGI server, so it isolates the app's own cost (threads share the GIL).
+    gunicorn     A local gunicorn with --workers workers (benchmarks/load_app.py),
+                 driven over HTTP, configured by --config (gunicorn.conf.py by
+                 default; /dev/null for gunicorn's own defaults). Startup time, the
+                 latency of the first request to each route, and peak and current
+                 RSS, PSS and private memory of the master and each worker are
+                 reported.
+
+CoinGecko is stubbed and SQLite stands in for the database in both cases. Redis is
+fakeredis served over TCP (--redis fakeredis, the default) or the in-process fallbacks
+(--redis local). The leaderboard is seeded with --entries random scores. Rate limits
+are switched off, since every client comes from one address. POSTs go through the real
+CSRF check, with a token taken from the index page.
+
+Run from the repository root:
+    python benchmarks/load_test.py [--target gunicorn] [--duration 10] [--concurrency 8] [--output load.json]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.cookiejar import CookieJar
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from harness import ROOT, isolate_services, free_port, summarize, peak_rss_kb, memory_kb, environment, write_report
+
+GZIP = {'Accept-Encoding': 'gzip'}
+
+# (name, method, path, extra headers); {score} and {seed} are filled in per request
+SCENARIOS = [
+    ('terrain records', 'GET', '/terrain_data', GZIP),
+    ('terrain binary first chunk', 'GET', '/terrain_data?format=binary&from=0&to=500', GZIP),
+    ('terrain lod 500', 'GET', '/terrain_data?points=500', GZIP),
+    ('obstacles', 'GET', '/obstacles_data', GZIP),
+    ('events', 'GET', '/bitcoin_events', GZIP),
+    ('enemies unseeded', 'GET', '/enemies_data', GZIP),
+    ('enemies seeded', 'GET', '/enemies_data?seed={seed}', GZIP),
+    ('game bootstrap', 'GET', '/game_bootstrap', GZIP),
+    ('leaderboard page 1', 'GET', '/leaderboard', {}),
+    ('leaderboard cursor page 1', 'GET', '/leaderboard?cursor=', {}),
+    ('leaderboard by date page 50', 'GET', '/leaderboard?page=50&sort_by=date', {}),
+    ('leaderboard rank', 'GET', '/leaderboard_rank?score={score}', {}),
+    ('submit score', 'POST', '/submit_score', {}),
+    ('data status', 'GET', '/data_status', {}),
+]
+CSRF_PATTERN = re.compile(r'name="csrf-token" content="([^"]+)"')
+
+
+class TestClientSession:
+    """One client thread's session against the in-process app."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, headers, json_body=None):
+        response = self.client.open(path, method=method, headers=headers, json=json_body)
+        return response.status_code, response.get_data()
+
+
+class HttpSession:
+    """One client thread's session against a server, keeping its cookies."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+
+    def request(self, method, path, headers, json_body=None):
+        data = None
+        headers = dict(headers)
+        if json_body is not None:
+            data = json.dumps(json_body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with self.opener.open(req, timeout=30) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+def csrf_token(session):
+    status, body = session.request('GET', '/', {})
+    match = CSRF_PATTERN.search(body.decode('utf-8'))
+    if status != 200 or not match:
+        raise RuntimeError(f"No CSRF token on the index page (status {status})")
+    return match.group(1)
+
+
+def cold_requests(session, scenarios):
+    """Time the first GET of each scenario on a server that just became ready, before any warm-up."""
+    results = []
+    for name, method, path, headers in scenarios:
+        if method == 'GET':
+            started = time.perf_counter()
+            status, _ = session.request(method, path.format(score=0, seed=0), headers)
+            results.append({'name': name, 'status': status, 'ms': round((time.perf_counter() - started) * 1000, 3)})
+    return results
+
+
+def warm_up(session, scenarios, rounds):
+    """Wait for the startup CoinGecko refresh, then build each scenario's payloads before timing it."""
+    started = time.perf_counter()
+    while time.perf_counter() - started < 60:
+        status, body = session.request('GET', '/data_status', {})
+        if status == 200 and json.loads(body).get('includes_recent'):
+            break
+        time.sleep(0.2)
+    for _ in range(rounds):
+        for _, method, path, headers in scenarios:
+            if method == 'GET':
+                session.request(method, path.format(score=0, seed=0), headers)
+
+
+def run_scenario(make_session, scenario, concurrency, duration):
+    name, method, path, headers = scenario
+    latencies = [[] for _ in range(concurrency)]
+    statuses = [{} for _ in range(concurrency)]
+    start_barrier = threading.Barrier(concurrency + 1)
+    deadline = [0.0]
+
+    def client(worker):
+        session = make_session()
+        rng = random.Random(worker)
+        request_headers = dict(headers)
+        if method == 'POST':
+            request_headers['X-CSRFToken'] = csrf_token(session)
+        start_barrier.wait()
+        while time.perf_counter() < deadline[0]:
+            body = None
+            if method == 'POST':
+                body = {'player_name': f'load{worker}', 'score': rng.randrange(1_000_000), 'hodl': rng.random() < 0.5}
+            request_path = path.format(score=rng.randrange(1_000_000), seed=rng.randrange(100))
+            started = time.perf_counter()
+            try:
+                status, _ = session.request(method, request_path, request_headers, body)
+            except OSError as e:
+                # Timeouts and refused or reset connections count against the scenario, by exception name
+                status = type(e).__name__
+            latencies[worker].append((time.perf_counter() - started) * 1000)
+            statuses[worker][status] = statuses[worker].get(status, 0) + 1
+
+    threads = [threading.Thread(target=client, args=(worker,), daemon=True) for worker in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    deadline[0] = time.perf_counter() + duration
+    start_barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    samples = [latency for worker in latencies for latency in worker]
+    status_counts = {}
+    for worker in statuses:
+        for status, count in worker.items():
+            status_counts[str(status)] = status_counts.get(str(status), 0) + count
+    return dict(name=name, method=method, path=path, concurrency=concurrency, duration_s=round(elapsed, 3),
+                throughput_rps=round(len(samples) / elapsed, 2), status_counts=status_counts, **summarize(samples))
+
+
+def seed_leaderboard(database_url, entries):
+    from sqlalchemy import create_engine
+    from models import db, LeaderboardEntry
+    engine = create_engine(database_url)
+    db.metadata.create_all(engine)
+    rng = random.Random(21)
+    with engine.begin() as connection:
+        connection.execute(LeaderboardEntry.__table__.insert(), [
+            {'player_name': f'seed{i % 1000}', 'score': rng.randrange(1_000_000), 'hodl': rng.random() < 0.5}
+            for i in range(entries)])
+    engine.dispose()
+
+
+def worker_pids(master_pid):
+    pids = []
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    if int(f.read().rsplit(')', 1)[1].split()[1]) == master_pid:
+                        pids.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+    return sorted(pids)
+
+
+def cpu_seconds(pid):
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def wait_until_idle(master_pid, interval=0.5, quiet=0.02, limit=120):
+    """
+    Wait until gunicorn's processes stop using CPU, i.e. every worker finished its startup
+    refresh and warm-up. Returns the CPU seconds each process had used by then.
+    """
+    pids = [master_pid] + worker_pids(master_pid)
+    used = sum(cpu_seconds(pid) for pid in pids)
+    started = time.perf_counter()
+    while time.perf_counter() - started < limit:
+        time.sleep(interval)
+        pids = [master_pid] + worker_pids(master_pid)
+        now = sum(cpu_seconds(pid) for pid in pids)
+        if now - used <= quiet:
+            break
+        used = now
+    return {'master': cpu_seconds(master_pid), 'workers': [cpu_seconds(pid) for pid in pids[1:]]}
+
+
+def gunicorn_memory(master_pid):
+    return {'master': memory_kb(master_pid), 'workers': [memory_kb(pid) for pid in worker_pids(master_pid)]}
+
+
+def start_gunicorn(env, workers, threads, log_path, config='gunicorn.conf.py'):
+    port = free_port()
+    # Workers log every dataset build, so their output goes to a file rather than a pipe nobody drains
+    log = open(log_path, 'wb')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', config, '--workers', str(workers), '--threads', str(threads),
+         '--bind', f'127.0.0.1:{port}', '--pythonpath', f"{ROOT},{os.path.join(ROOT, 'benchmarks')}",
+         'load_app:app'],
+        cwd=ROOT, env=dict(os.environ, **env), stdout=log, stderr=subprocess.STDOUT)
+    log.close()
+    base_url = f'http://127.0.0.1:{port}'
+    started = time.perf_counter()
+    while time.perf_counter() - started < 120:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited, see {log_path}")
+        try:
+            with urllib.request.urlopen(base_url + '/data_status', timeout=5) as response:
+                if response.status == 200 and len(worker_pids(process.pid)) == workers:
+                    return process, base_url, time.perf_counter() - started
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"gunicorn did not become ready within 120 s, see {log_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--target', choices=('test-client', 'gunicorn'), default='test-client')
+    parser.add_argument('--redis', choices=('fakeredis', 'local'), default='fakeredis')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per scenario')
+    parser.add_argument('--concurrency', type=int, default=8, help='Client threads')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=1, help='gunicorn threads per worker')
+    parser.add_argument('--config', default='gunicorn.conf.py', help='gunicorn config file (/dev/null for none)')
+    parser.add_argument('--entries', type=int, default=10000, help='Leaderboard entries to seed')
+    parser.add_argument('--scenarios', default=None, help='Comma-separated scenario names (default: all)')
+    parser.add_argument('--output', default=None, help='Report path (default: stdout)')
+    args = parser.parse_args()
+
+    services = isolate_services(redis=args.redis)
+    seed_leaderboard(services['env']['DATABASE_URL'], args.entries)
+    scenarios = SCENARIOS
+    if args.scenarios:
+        wanted = set(args.scenarios.split(','))
+        scenarios = [scenario for scenario in SCENARIOS if scenario[0] in wanted]
+
+    report = {'suite': 'load', 'environment': environment(), 'config': vars(args), 'results': []}
+    if args.target == 'gunicorn':
+        launched = time.perf_counter()
+        process, base_url, ready_s = start_gunicorn(services['env'], args.workers, args.threads,
+                                                    os.path.join(services['scratch'], 'gunicorn.log'), args.config)
+        report['startup_s'] = round(ready_s, 3)
+        report['startup_memory_kb'] = gunicorn_memory(process.pid)
+        make_session = lambda: HttpSession(base_url)
+    else:
+        started = time.perf_counter()
+        import load_app
+        load_app.app.config['TESTING'] = True
+        report['startup_s'] = round(time.perf_counter() - started, 3)
+        make_session = lambda: TestClientSession(load_app.app)
+
+    try:
+        report['cold_requests'] = cold_requests(make_session(), scenarios)
+        for cold in report['cold_requests']:
+            print(f"cold {cold['name']:<25} {cold['ms']:9.2f} ms  {cold['status']}", file=sys.stderr)
+        if args.target == 'gunicorn':
+            report['startup_cpu_s'] = wait_until_idle(process.pid)
+            report['settled_s'] = round(time.perf_counter() - launched, 3)
+            report['settled_memory_kb'] = gunicorn_memory(process.pid)
+            print(f"ready after {report['startup_s']:.2f} s, idle after {report['settled_s']:.2f} s; CPU seconds "
+                  f"{json.dumps(report['startup_cpu_s'])}; memory (KiB) {json.dumps(report['settled_memory_kb'])}",
+                  file=sys.stderr)
+        # Each gunicorn worker builds its own payloads, and requests land on workers at random
+        warm_up(make_session(), scenarios, 3 * args.workers if args.target == 'gunicorn' else 1)
+        for scenario in scenarios:
+            result = run_scenario(make_session, scenario, args.concurrency, args.duration)
+            if args.target == 'gunicorn':
+                result['peak_rss_kb'] = {'master': peak_rss_kb(process.pid),
+                                         'workers': [peak_rss_kb(pid) for pid in worker_pids(process.pid)]}
+                result['memory_kb'] = gunicorn_memory(process.pid)
+            else:
+                result['peak_rss_kb'] = peak_rss_kb()
+            report['results'].append(result)
+            print(f"{result['name']:<30} {result['throughput_rps']:9.1f} req/s  p50 {result['p50_ms']:8.2f} ms  "
+                  f"p99 {result['p99_ms']:8.2f} ms  {result['status_counts']}", file=sys.stderr)
+        if args.target == 'gunicorn':
+            memory = report['results'][-1]['memory_kb'] if report['results'] else gunicorn_memory(process.pid)
+            print(f"memory after the run (KiB): "
+                  f"{json.dumps(memory)}", file=sys.stderr)
+    finally:
+        if args.target == 'gunicorn':
+            process.terminate()
+            process.wait(30)
+    write_report(report, args.output)
+
+
+if __name__ == '__main__':
+    main()
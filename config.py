@@ -12,6 +12,32 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
     DEBUG = False
+    # Seconds between background rebuilds of the Bitcoin price data (see refresher.py)
+    DATA_REFRESH_INTERVAL = int(os.environ.get('DATA_REFRESH_INTERVAL', 3600))
+    DATA_REFRESH_RETRY_INTERVAL = int(os.environ.get('DATA_REFRESH_RETRY_INTERVAL', 60))
+    # Seconds between full rebuilds from the price store; the refreshes in between only append new days
+    DATA_FULL_REFRESH_INTERVAL = int(os.environ.get('DATA_FULL_REFRESH_INTERVAL', 86400))
+    # Build the price data and warm the payloads at import, and leave the refresh and score writer threads to
+    # start_background_tasks(); gunicorn.conf.py sets this to load once in the master before forking workers
+    PRELOAD_DATA = os.environ.get('PRELOAD_DATA', 'false').lower() in ('1', 'true', 'yes')
+    # Seconds each CoinGecko request may take while preloading, before the master falls back to the price store
+    PRELOAD_COINGECKO_TIMEOUT = float(os.environ.get('PRELOAD_COINGECKO_TIMEOUT', 10))
+    # Queue submitted scores and insert them in batches instead of one commit per request (see score_writer.py)
+    SCORE_WRITE_BEHIND = os.environ.get('SCORE_WRITE_BEHIND', 'false').lower() in ('1', 'true', 'yes')
+    SCORE_BATCH_SIZE = int(os.environ.get('SCORE_BATCH_SIZE', 100))
+    SCORE_FLUSH_INTERVAL = float(os.environ.get('SCORE_FLUSH_INTERVAL', 1.0))
+    # Local journals for queued scores when REDIS_URL == 'local', one per process named <path>.<pid>
+    SCORE_JOURNAL_PATH = os.environ.get('SCORE_JOURNAL_PATH', os.path.join(basedir, 'scores.journal'))
+    # Seconds between pushes of each worker's metrics to Redis, where /metrics adds them up (see metrics.py)
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 10.0))
+    # Serve static files under content-hashed names, cached by browsers for a year (see static_assets.py)
+    STATIC_FINGERPRINT = os.environ.get('STATIC_FINGERPRINT', 'false').lower() in ('1', 'true', 'yes')
+    # If set, /metrics requires 'Authorization: Bearer <token>'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    # Refuse /metrics while METRICS_TOKEN is unset
+    METRICS_REQUIRE_TOKEN = os.environ.get('METRICS_REQUIRE_TOKEN', 'false').lower() in ('1', 'true', 'yes')
+    # If set, a request with 'X-Profile: <token>' gets a Server-Timing stage breakdown (always allowed in debug)
+    PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -28,6 +54,12 @@ class ProductionConfig(Config):
     # Use REDIS_URL for Redis connection in production
     REDIS_URL = os.environ.get('REDIS_URL')
 
+    # Fingerprint static files unless turned off explicitly
+    STATIC_FINGERPRINT = os.environ.get('STATIC_FINGERPRINT', 'true').lower() in ('1', 'true', 'yes')
+
+    # Keep /metrics closed until a METRICS_TOKEN is configured, unless opened explicitly
+    METRICS_REQUIRE_TOKEN = os.environ.get('METRICS_REQUIRE_TOKEN', 'true').lower() in ('1', 'true', 'yes')
+
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
@@ -0,0 +1,231 @@
+# datasets.py
+import threading
+import logging
+
+import numpy as np
+import pandas as pd
+
+from shared_cache import get_or_build
+from metrics import timed, count_cache
+from utils import (resample_weekly, update_weekly, local_top_indices, drawdowns_from_weekly, get_bitcoin_events,
+                   lttb_indices, nearest_indices)
+
+logger = logging.getLogger(__name__)
+
+# Moving average windows (in days) clients may ask for, and the ones computed together on refresh
+MA_WINDOW_MIN = 1
+MA_WINDOW_MAX = 365
+MA_PRESET_WINDOWS = (7, 14, 30, 50, 100, 200)
+
+# Point budgets terrain can be downsampled to for small screens
+TERRAIN_LOD_LEVELS = (250, 500, 1000, 2000)
+
+# Points per chunk when terrain is streamed with ?from=&to=; aligned chunks are warmed on refresh
+TERRAIN_CHUNK_SIZE = 500
+
+
+class DerivedDatasets:
+    """
+    Artifacts derived from the canonical price series of a DataSnapshot.
+
+    Each artifact is built at most once per snapshot version and shared by every
+    endpoint. An entry is stale as soon as the base data version moves on, so
+    artifacts are invalidated individually and never outlive the data they came from.
+
+    With a shared cache, built artifacts are also stored there under a key that
+    includes the data version, and builds are single-flighted across workers.
+
+    Parameters:
+    snapshot_source (callable): Returns the current DataSnapshot, e.g. DataRefresher.snapshot.
+    shared (LocalSharedCache | RedisSharedCache): Optional cross-worker store.
+    shared_timeout (int): Seconds a shared artifact is kept.
+    """
+
+    def __init__(self, snapshot_source, shared=None, shared_timeout=None):
+        self._snapshot_source = snapshot_source
+        self.shared = shared
+        self.shared_timeout = shared_timeout
+        self._builders = {}
+        self._max_entries = {}
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def register(self, name, builder, max_entries=None):
+        """
+        Register builder(datasets, snapshot, **params) under name.
+
+        max_entries bounds how many parameter combinations of name are kept; the least
+        recently built one is dropped first. Use it for artifacts keyed by client input.
+        """
+        self._builders[name] = builder
+        self._max_entries[name] = max_entries
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = value
+            max_entries = self._max_entries.get(key[0])
+            if max_entries is not None:
+                keys = [k for k in self._entries if k[0] == key[0]]
+                for old_key in keys[:max(0, len(keys) - max_entries)]:
+                    del self._entries[old_key]
+                    # Keys can come from clients (e.g. enemy seeds), so their locks must go with them
+                    self._key_locks.pop(old_key, None)
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get(self, name, snapshot=None, **params):
+        """
+        Return artifact `name` for snapshot (default: the current one), building it if needed.
+
+        Concurrent callers asking for the same stale artifact wait for a single build.
+        """
+        if snapshot is None:
+            snapshot = self._snapshot_source()
+        key = (name, tuple(sorted(params.items())))
+
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == snapshot.version:
+            count_cache('derived', name, 'hit')
+            return entry[1]
+
+        with self._key_lock(key):
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == snapshot.version:
+                # Another caller built it while this one waited
+                count_cache('derived', name, 'hit')
+                return entry[1]
+            count_cache('derived', name, 'miss')
+            with timed(f'dataset.{name}'):
+                value = self._build(name, snapshot, params)
+            # Never let a build for an older snapshot replace a newer entry
+            if entry is None or entry[0] < snapshot.version:
+                self._store(key, (snapshot.version, value))
+            logger.info(f"Built derived dataset '{name}' {dict(params)} for data v{snapshot.version}")
+            return value
+
+    def _build(self, name, snapshot, params):
+        def build():
+            return self._builders[name](self, snapshot, **params)
+
+        if self.shared is None:
+            return build()
+        params_key = ','.join(f'{k}={v}' for k, v in sorted(params.items()))
+        shared_key = f'derived:{name}:{params_key}:v{snapshot.version}'
+        return get_or_build(self.shared, shared_key, build, timeout=self.shared_timeout, name=name)
+
+    def previous(self, name, snapshot, **params):
+        """
+        Return the cached artifact built from snapshot's parent, or None.
+
+        Builders use this to update an artifact from the rows appended to the parent
+        instead of rebuilding it.
+        """
+        if snapshot.parent_version is None:
+            return None
+        entry = self._entries.get((name, tuple(sorted(params.items()))))
+        if entry is None or entry[0] != snapshot.parent_version:
+            return None
+        return entry[1]
+
+    def version_of(self, name, **params):
+        """Return the base data version the cached artifact was built from, or None."""
+        entry = self._entries.get((name, tuple(sorted(params.items()))))
+        return entry[0] if entry else None
+
+    def invalidate(self, name=None):
+        """Drop cached artifacts named `name`, or all of them."""
+        with self._lock:
+            for key in list(self._entries):
+                if name is None or key[0] == name:
+                    del self._entries[key]
+                    self._key_locks.pop(key, None)
+
+
+def _weekly(datasets, snapshot):
+    # Resampled with pandas once per version; only its small output is kept
+    df = snapshot.series.to_frame()
+    previous = datasets.previous('weekly', snapshot)
+    if previous is not None:
+        return update_weekly(previous, df, snapshot.appended_rows or 0)
+    return resample_weekly(df)
+
+def _local_tops(datasets, snapshot):
+    df_weekly = datasets.get('weekly', snapshot)
+    return local_top_indices(df_weekly['ma_7'].to_numpy(dtype=np.float64))
+
+def _drawdowns(datasets, snapshot, drawdown_percentage=0.1):
+    df_weekly = datasets.get('weekly', snapshot)
+    top_indices = datasets.get('local_tops', snapshot)
+    return drawdowns_from_weekly(df_weekly, top_indices, drawdown_percentage)
+
+def _events(datasets, snapshot):
+    """
+    The Bitcoin events with 'terrain_index', the position of the nearest point of the
+    default ma_7 terrain, or None for events outside the terrain's date span.
+    """
+    df = get_bitcoin_events()
+    terrain = datasets.get('moving_average', snapshot, window=7, kind='sma')
+    indices = nearest_indices(terrain['date_unix'], df['date_unix'].to_numpy())
+    # Object dtype keeps whole numbers and None, which serialize as JSON integers and null
+    df['terrain_index'] = pd.Series([int(index) if index >= 0 else None for index in indices],
+                                    index=df.index, dtype=object)
+    return df
+
+def _moving_averages(datasets, snapshot, kind='sma'):
+    return snapshot.series.moving_averages('price', MA_PRESET_WINDOWS, kind)
+
+def _moving_average(datasets, snapshot, window=7, kind='sma'):
+    """
+    A PriceSeries with one column, 'value', for one window, without the points before it is full.
+
+    The 7-day SMA is the snapshot's own ma_7 column. Preset windows come from the
+    single pass in _moving_averages(), and any other window is computed on its own.
+    Either way the result shares its arrays with what it was taken from.
+    """
+    if kind == 'sma' and window == 7:
+        series = snapshot.series.select('ma_7').rename({'ma_7': 'value'})
+    elif window in MA_PRESET_WINDOWS:
+        series = datasets.get('moving_averages', snapshot, kind=kind).select(f'{kind}_{window}')
+        series = series.rename({f'{kind}_{window}': 'value'})
+    else:
+        series = snapshot.series.moving_averages('price', [window], kind).rename({f'{kind}_{window}': 'value'})
+    return series.dropna('value')
+
+def _terrain_lod(datasets, snapshot, window=7, kind='sma', points=TERRAIN_LOD_LEVELS[0]):
+    """The 'moving_average' artifact downsampled to `points` points with lttb_indices()."""
+    series = datasets.get('moving_average', snapshot, window=window, kind=kind)
+    return series.take(lttb_indices(series['date_unix'], series['value'], points))
+
+def lod_level(points, available):
+    """
+    Return the largest level in TERRAIN_LOD_LEVELS that fits a budget of `points`, or
+    None when all `available` points fit and no downsampling is needed.
+
+    Raises ValueError if the budget is below the smallest level.
+    """
+    if points >= available:
+        return None
+    levels = [level for level in TERRAIN_LOD_LEVELS if level <= points]
+    if not levels:
+        raise ValueError(f"A terrain point budget must be at least {TERRAIN_LOD_LEVELS[0]}")
+    return levels[-1]
+
+
+def create_datasets(snapshot_source, shared=None, shared_timeout=None):
+    """
+    Return a DerivedDatasets with the weekly, local_tops, drawdowns, events, moving
+    average and downsampled terrain artifacts registered.
+    """
+    datasets = DerivedDatasets(snapshot_source, shared=shared, shared_timeout=shared_timeout)
+    datasets.register('weekly', _weekly)
+    datasets.register('local_tops', _local_tops)
+    datasets.register('drawdowns', _drawdowns)
+    datasets.register('events', _events)
+    datasets.register('moving_averages', _moving_averages)
+    datasets.register('moving_average', _moving_average, max_entries=2 * len(MA_PRESET_WINDOWS) + 8)
+    datasets.register('terrain_lod', _terrain_lod, max_entries=len(TERRAIN_LOD_LEVELS) * 8)
+    return datasets
@@ -0,0 +1,27 @@
+# gunicorn.conf.py
+import gc
+
+# Import the app, build the price data and warm every payload once, in the master, before forking
+# workers; the workers then share those pages copy-on-write instead of each building its own copy
+preload_app = True
+
+# app.py reads this at import: load the data there, but leave the threads to post_fork
+raw_env = ['PRELOAD_DATA=true']
+
+
+def when_ready(server):
+    from app import metrics_flusher
+    # Report the master's load timings once, rather than from every worker that inherits them
+    metrics_flusher.flush()
+    # Move everything loaded so far out of the garbage collector's reach: collections in the
+    # workers would otherwise write to every object's header and copy the shared pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from app import app, db, start_background_tasks, set_worker_count
+    # Threads do not survive fork(), and pooled database connections must not be shared between processes
+    with app.app_context():
+        db.engine.dispose(close=False)
+    set_worker_count(server.cfg.workers)
+    start_background_tasks()
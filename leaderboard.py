@@ -0,0 +1,113 @@
+# leaderboard.py
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+from models import db, LeaderboardEntry
+
+# Columns /leaderboard can sort by, each paired with id as a tie-breaker
+LEADERBOARD_SORTS = {
+    'score': LeaderboardEntry.score,
+    'date': LeaderboardEntry.timestamp,
+}
+
+
+def serialize_entry(entry):
+    return {
+        'player_name': entry.player_name,
+        'score': entry.score,
+        'hodl': entry.hodl,
+        'timestamp': entry.timestamp.isoformat()
+    }
+
+def order_leaderboard(query, sort_by='score', order='desc'):
+    """Order query by the sort column and then id, in the same direction, matching the indexes."""
+    column = LEADERBOARD_SORTS.get(sort_by, LeaderboardEntry.score)
+    if order == 'desc':
+        return query.order_by(column.desc(), LeaderboardEntry.id.desc())
+    return query.order_by(column.asc(), LeaderboardEntry.id.asc())
+
+def encode_cursor(entry, sort_by='score'):
+    """Opaque cursor pointing just past entry in the given sort."""
+    value = entry.timestamp.isoformat() if sort_by == 'date' else entry.score
+    return encode_cursor_values(value, entry.id)
+
+def encode_cursor_values(value, entry_id):
+    return base64.urlsafe_b64encode(json.dumps([value, entry_id]).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor, sort_by='score'):
+    """Inverse of encode_cursor(). Raises ValueError for a malformed cursor."""
+    try:
+        value, entry_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if sort_by == 'date':
+            value = datetime.fromisoformat(value)
+        elif not isinstance(value, int):
+            raise ValueError
+        if not isinstance(entry_id, int):
+            raise ValueError
+    except (ValueError, TypeError, UnicodeError):
+        raise ValueError("Invalid cursor")
+    return value, entry_id
+
+def keyset_page(query, sort_by='score', order='desc', cursor=None, per_page=10):
+    """
+    Return (entries, next_cursor) for the page after cursor, or the first page if cursor is None.
+
+    Unlike query.paginate(), this issues no OFFSET and no COUNT(*): the page starts with
+    an index range scan from the cursor's (value, id), so every page costs the same no
+    matter how deep it is. next_cursor is None on the last page.
+
+    Parameters:
+    query: A LeaderboardEntry query, e.g. LeaderboardEntry.query.
+    sort_by (str): 'score' or 'date'.
+    order (str): 'desc' or 'asc'.
+    cursor (str): next_cursor of the previous page.
+    per_page (int): Entries per page.
+    """
+    column = LEADERBOARD_SORTS.get(sort_by, LeaderboardEntry.score)
+    if cursor is not None:
+        value, entry_id = decode_cursor(cursor, sort_by)
+        if order == 'desc':
+            query = query.filter(tuple_(column, LeaderboardEntry.id) < tuple_(value, entry_id))
+        else:
+            query = query.filter(tuple_(column, LeaderboardEntry.id) > tuple_(value, entry_id))
+
+    # Fetch one extra row to learn whether there is a next page without counting
+    entries = order_leaderboard(query, sort_by, order).limit(per_page + 1).all()
+    next_cursor = encode_cursor(entries[per_page - 1], sort_by) if len(entries) > per_page else None
+    return entries[:per_page], next_cursor
+
+def entry_rank(query, entry):
+    """1-based position of entry on the score leaderboard, counted in SQL (the cache's fallback)."""
+    return query.filter(tuple_(LeaderboardEntry.score, LeaderboardEntry.id) > tuple_(entry.score, entry.id)).count() + 1
+
+def score_rank(query, score):
+    """(1-based rank a score would have, number of entries), counted in SQL (the cache's fallback)."""
+    return query.filter(LeaderboardEntry.score > score).count() + 1, query.count()
+
+def rebuild_leaderboard_cache(cache, query):
+    """
+    Reload a leaderboard cache (see leaderboard_cache.py) from the database.
+
+    Every entry's (id, score) is streamed into the rank set and the top_n entries are
+    loaded with their display fields. Entries committed while the rebuild ran are added
+    afterwards, so a submit racing the rebuild is not lost from the cache.
+
+    Parameters:
+    cache: A LocalLeaderboardCache or RedisLeaderboardCache.
+    query: LeaderboardEntry.query.
+
+    Returns:
+    int: The number of entries loaded.
+    """
+    last_id = query.with_entities(db.func.max(LeaderboardEntry.id)).scalar() or 0
+    ranks = query.with_entities(LeaderboardEntry.id, LeaderboardEntry.score) \
+        .filter(LeaderboardEntry.id <= last_id).yield_per(10000)
+    top = order_leaderboard(query.filter(LeaderboardEntry.id <= last_id), 'score', 'desc').limit(cache.top_n).all()
+    cache.rebuild(((entry_id, score) for entry_id, score in ranks),
+                  [(entry.id, entry.score, serialize_entry(entry)) for entry in top])
+    for entry in query.filter(LeaderboardEntry.id > last_id).order_by(LeaderboardEntry.id):
+        cache.add(entry.id, entry.score, serialize_entry(entry))
+    return query.count()
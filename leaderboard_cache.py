@@ -0,0 +1,216 @@
+# leaderboard_cache.py
+import bisect
+import json
+import threading
+
+# Entries kept with their display fields, i.e. how many leaderboard positions are served without SQL
+LEADERBOARD_TOP_N = 1000
+
+
+class LocalLeaderboardCache:
+    """
+    In-process stand-in for RedisLeaderboardCache, used when REDIS_URL == 'local'.
+
+    Keeps every entry's (-score, -id) in a sorted list, so ranks are a binary search,
+    and the display fields of the top_n entries alongside.
+    """
+
+    def __init__(self, top_n=LEADERBOARD_TOP_N):
+        self.top_n = top_n
+        self._ranks = []
+        self._top = []
+        self._ready = False
+        self._guard = threading.Lock()
+
+    def ready(self):
+        return self._ready
+
+    def invalidate(self):
+        self._ready = False
+
+    def rebuild(self, ranks, top):
+        ranks = sorted((-score, -entry_id) for entry_id, score in ranks)
+        top = sorted((-score, -entry_id, entry) for entry_id, score, entry in top)[:self.top_n]
+        with self._guard:
+            self._ranks, self._top, self._ready = ranks, top, True
+
+    def add(self, entry_id, score, entry):
+        with self._guard:
+            # A rebuild racing the insert may already hold the entry
+            position = bisect.bisect_left(self._ranks, (-score, -entry_id))
+            if position < len(self._ranks) and self._ranks[position] == (-score, -entry_id):
+                return
+            bisect.insort(self._ranks, (-score, -entry_id))
+            bisect.insort(self._top, (-score, -entry_id, entry))
+            del self._top[self.top_n:]
+
+    def page(self, start, count):
+        with self._guard:
+            if not self._ready or (start + count > self.top_n and len(self._ranks) > self.top_n):
+                return None
+            return [(-negative_id, entry) for _, negative_id, entry in self._top[start:start + count]], len(self._ranks)
+
+    def rank(self, entry_id, score):
+        with self._guard:
+            if not self._ready:
+                return None
+            position = bisect.bisect_left(self._ranks, (-score, -entry_id))
+            if position == len(self._ranks) or self._ranks[position] != (-score, -entry_id):
+                return None
+            return position + 1
+
+    def score_rank(self, score):
+        with self._guard:
+            if not self._ready:
+                return None
+            return bisect.bisect_left(self._ranks, (-score, float('-inf'))) + 1, len(self._ranks)
+
+
+class DisabledLeaderboardCache:
+    """
+    A cache that never answers, for REDIS_URL == 'local' with several gunicorn workers.
+
+    Each worker's LocalLeaderboardCache would only see the scores submitted to that
+    worker, so the leaderboard is read from SQL instead.
+    """
+
+    top_n = 0
+
+    def ready(self):
+        return True
+
+    def invalidate(self):
+        pass
+
+    def rebuild(self, ranks, top):
+        pass
+
+    def add(self, entry_id, score, entry):
+        pass
+
+    def page(self, start, count):
+        return None
+
+    def rank(self, entry_id, score):
+        return None
+
+    def score_rank(self, score):
+        return None
+
+
+class RedisLeaderboardCache:
+    """
+    Leaderboard rankings in Redis sorted sets, shared by every gunicorn worker.
+
+    'ranks' holds every entry id scored by its score, so a rank is one ZREVRANK or
+    ZCOUNT (O(log n)). 'top' holds the best top_n entries with their display fields
+    in the member. Members start with the zero-padded id, so Redis orders equal scores
+    by id, as the SQL leaderboard does.
+
+    page() returns ([(id, entry), ...], total), rank() and score_rank() 1-based ranks.
+    Each returns None when it cannot answer from the cache (before rebuild() has run,
+    or for positions past top_n), and the caller falls back to SQL.
+
+    Parameters:
+    client: A redis.StrictRedis (or fakeredis.FakeStrictRedis) instance.
+    top_n (int): Number of entries kept with their display fields.
+    prefix (str): Namespace for every key this cache writes.
+    """
+
+    def __init__(self, client, top_n=LEADERBOARD_TOP_N, prefix='bpr:leaderboard:'):
+        self.client = client
+        self.top_n = top_n
+        self.prefix = prefix
+
+    @staticmethod
+    def _member(entry_id):
+        return f'{entry_id:012d}'
+
+    def ready(self):
+        return self.client.exists(self.prefix + 'ready') == 1
+
+    def invalidate(self):
+        self.client.delete(self.prefix + 'ready')
+
+    def rebuild(self, ranks, top, batch_size=10000):
+        pipe = self.client.pipeline(transaction=False)
+        pipe.delete(self.prefix + 'ranks:rebuild', self.prefix + 'top:rebuild')
+        batch = {}
+        for entry_id, score in ranks:
+            batch[self._member(entry_id)] = score
+            if len(batch) >= batch_size:
+                pipe.zadd(self.prefix + 'ranks:rebuild', batch)
+                pipe.execute()
+                batch = {}
+        if batch:
+            pipe.zadd(self.prefix + 'ranks:rebuild', batch)
+        top = {self._member(entry_id) + ':' + json.dumps(entry, sort_keys=True): score
+               for entry_id, score, entry in top}
+        if top:
+            pipe.zadd(self.prefix + 'top:rebuild', top)
+            pipe.zremrangebyrank(self.prefix + 'top:rebuild', 0, -self.top_n - 1)
+        pipe.execute()
+
+        # Swap the rebuilt sets in atomically; RENAME fails on a missing key, so an empty board deletes instead
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(self.prefix + 'ranks', self.prefix + 'top')
+        for name in ('ranks', 'top'):
+            if self.client.exists(self.prefix + name + ':rebuild'):
+                pipe.rename(self.prefix + name + ':rebuild', self.prefix + name)
+        pipe.set(self.prefix + 'ready', 1)
+        pipe.execute()
+
+    def add(self, entry_id, score, entry):
+        member = self._member(entry_id)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.zadd(self.prefix + 'ranks', {member: score})
+        pipe.zadd(self.prefix + 'top', {member + ':' + json.dumps(entry, sort_keys=True): score})
+        pipe.zremrangebyrank(self.prefix + 'top', 0, -self.top_n - 1)
+        pipe.execute()
+
+    def page(self, start, count):
+        pipe = self.client.pipeline(transaction=True)
+        pipe.exists(self.prefix + 'ready')
+        pipe.zcard(self.prefix + 'ranks')
+        pipe.zrevrange(self.prefix + 'top', start, start + count - 1)
+        ready, total, members = pipe.execute()
+        if not ready or (start + count > self.top_n and total > self.top_n):
+            return None
+        entries = []
+        for member in members:
+            entry_id, entry = member.decode('utf-8').split(':', 1)
+            entries.append((int(entry_id), json.loads(entry)))
+        return entries, total
+
+    def rank(self, entry_id, score):
+        pipe = self.client.pipeline(transaction=True)
+        pipe.exists(self.prefix + 'ready')
+        pipe.zscore(self.prefix + 'ranks', self._member(entry_id))
+        pipe.zrevrank(self.prefix + 'ranks', self._member(entry_id))
+        ready, stored_score, position = pipe.execute()
+        if not ready or stored_score is None or stored_score != score:
+            return None
+        return position + 1
+
+    def score_rank(self, score):
+        pipe = self.client.pipeline(transaction=True)
+        pipe.exists(self.prefix + 'ready')
+        pipe.zcount(self.prefix + 'ranks', f'({score}', '+inf')
+        pipe.zcard(self.prefix + 'ranks')
+        ready, better, total = pipe.execute()
+        if not ready:
+            return None
+        return better + 1, total
+
+
+def create_leaderboard_cache(redis_client, top_n=LEADERBOARD_TOP_N, workers=1):
+    """
+    Return a RedisLeaderboardCache for redis_client, or a LocalLeaderboardCache when it is None.
+
+    Without Redis and with more than one worker process, return a DisabledLeaderboardCache.
+    """
+    if redis_client is None:
+        if workers > 1:
+            return DisabledLeaderboardCache()
+        return LocalLeaderboardCache(top_n)
+    return RedisLeaderboardCache(redis_client, top_n)
@@ -0,0 +1,353 @@
+# metrics.py
+import atexit
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, request
+from redis.exceptions import RedisError
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket bounds in seconds, from a memoized lookup to a slow CoinGecko call
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# The stages timed in the current request when it asked for a profile, else None
+_profile = contextvars.ContextVar('metrics_profile', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _series(name, labels):
+    if not labels:
+        return name
+    return name + '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+class Metrics:
+    """
+    Counters and duration histograms recorded by one process.
+
+    Recording is a dict update under a lock, cheap enough for every request and every
+    memoized lookup. drain() hands over what was recorded since the previous drain as
+    Prometheus series -> increment, which a MetricsStore adds up across gunicorn workers,
+    and render() formats the totals in the Prometheus text format.
+
+    Parameters:
+    prefix (str): Prepended to every metric name.
+    buckets (tuple): Upper bounds in seconds of the histogram buckets.
+    """
+
+    def __init__(self, prefix='bpr_', buckets=DURATION_BUCKETS):
+        self.prefix = prefix
+        self.buckets = buckets
+        self._descriptions = {}
+        self._counters = {}
+        self._histograms = {}
+        self._restored = {}
+        self._lock = threading.Lock()
+
+    def describe(self, metric, kind, help_text):
+        """Declare metric as a 'counter' or 'histogram', with the help text /metrics shows."""
+        self._descriptions[self.prefix + metric] = (kind, help_text)
+
+    def inc(self, metric, amount=1, **labels):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, metric, seconds, **labels):
+        key = (metric, tuple(sorted(labels.items())))
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # One count per bucket plus +Inf, then the sum of the observations
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            histogram[index] += 1
+            histogram[-1] += seconds
+
+    def drain(self):
+        """Return {series: increment} for everything recorded since the last drain, and reset."""
+        with self._lock:
+            counters, self._counters = self._counters, {}
+            histograms, self._histograms = self._histograms, {}
+            deltas, self._restored = self._restored, {}
+
+        for (name, labels), value in counters.items():
+            series = _series(self.prefix + name, labels)
+            deltas[series] = deltas.get(series, 0) + value
+        for (name, labels), histogram in histograms.items():
+            name = self.prefix + name
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), histogram):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                series = _series(name + '_bucket', labels + (('le', le),))
+                deltas[series] = deltas.get(series, 0) + cumulative
+            for series, value in ((_series(name + '_sum', labels), histogram[-1]),
+                                  (_series(name + '_count', labels), cumulative)):
+                deltas[series] = deltas.get(series, 0) + value
+        return deltas
+
+    def restore(self, deltas):
+        """Put drained increments back, e.g. after the store could not take them, for the next drain."""
+        with self._lock:
+            for series, value in deltas.items():
+                self._restored[series] = self._restored.get(series, 0) + value
+
+    def render(self, totals, gauges=()):
+        """
+        Format totals (series -> value, e.g. from MetricsStore.totals()) for /metrics.
+
+        Parameters:
+        totals (dict): Series -> value.
+        gauges (iterable): (name, help_text, value) read from this process at request time.
+        """
+        families = {}
+        for series, value in totals.items():
+            name = series.split('{', 1)[0]
+            family = name
+            for suffix in ('_bucket', '_sum', '_count'):
+                if name.endswith(suffix) and self._descriptions.get(name[:-len(suffix)], ('',))[0] == 'histogram':
+                    family = name[:-len(suffix)]
+            families.setdefault(family, []).append((series, value))
+
+        def order(sample):
+            # Buckets of one series in ascending le, as Prometheus expects
+            series, _ = sample
+            head, _, le = series.rpartition('le="')
+            if not head:
+                return series, 0.0
+            return head, float('inf') if le.startswith('+Inf') else float(le[:-2])
+
+        lines = []
+        for family in sorted(families):
+            kind, help_text = self._descriptions.get(family, ('untyped', None))
+            if help_text:
+                lines.append(f'# HELP {family} {help_text}')
+            lines.append(f'# TYPE {family} {kind}')
+            for series, value in sorted(families[family], key=order):
+                lines.append(f'{series} {value!r}')
+        for name, help_text, value in gauges:
+            if value is None:
+                continue
+            lines.append(f'# HELP {self.prefix}{name} {help_text}')
+            lines.append(f'# TYPE {self.prefix}{name} gauge')
+            lines.append(f'{self.prefix}{name} {value!r}')
+        return '\n'.join(lines) + '\n'
+
+
+class LocalMetricsStore:
+    """In-process stand-in for RedisMetricsStore, used when REDIS_URL == 'local'; covers this process only."""
+
+    def __init__(self):
+        self._totals = {}
+        self._guard = threading.Lock()
+
+    def add(self, deltas):
+        with self._guard:
+            for series, value in deltas.items():
+                self._totals[series] = self._totals.get(series, 0) + value
+
+    def totals(self):
+        with self._guard:
+            return dict(self._totals)
+
+
+class RedisMetricsStore:
+    """
+    Running totals of every worker's metrics in one Redis hash, field = Prometheus series.
+
+    Workers add their increments with HINCRBYFLOAT, so the totals survive worker
+    restarts and stay monotonic, as Prometheus counters must.
+
+    Parameters:
+    client: A redis.StrictRedis (or fakeredis.FakeStrictRedis) instance.
+    key (str): The hash holding the totals.
+    """
+
+    def __init__(self, client, key='bpr:metrics'):
+        self.client = client
+        self.key = key
+
+    def add(self, deltas):
+        if not deltas:
+            return
+        pipe = self.client.pipeline(transaction=False)
+        for series, value in deltas.items():
+            pipe.hincrbyfloat(self.key, series, value)
+        pipe.execute()
+
+    def totals(self):
+        totals = {}
+        for series, value in self.client.hgetall(self.key).items():
+            value = float(value)
+            totals[series.decode('utf-8')] = int(value) if value.is_integer() else value
+        return totals
+
+
+def create_metrics_store(redis_client):
+    """Return a RedisMetricsStore for redis_client, or a LocalMetricsStore when it is None."""
+    if redis_client is None:
+        return LocalMetricsStore()
+    return RedisMetricsStore(redis_client)
+
+
+# The process-wide registry every module records into
+registry = Metrics()
+registry.describe('request_duration_seconds', 'histogram',
+                  'Time from the first request hook to the response, by endpoint, method and status.')
+registry.describe('stage_duration_seconds', 'histogram',
+                  'Time spent in each stage of the data pipeline and of request handling. Stages nest.')
+registry.describe('cache_requests_total', 'counter',
+                  'Lookups in the memoized, shared and leaderboard caches, by result.')
+
+
+@contextmanager
+def timed(stage):
+    """Time the with-block as `stage`, and add it to the request's profile if one was asked for."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        registry.observe('stage_duration_seconds', elapsed, stage=stage)
+        profile = _profile.get()
+        if profile is not None:
+            profile.append((stage, elapsed))
+
+
+def record_stage(stage, seconds):
+    """Record a stage timed elsewhere, like timed() does."""
+    registry.observe('stage_duration_seconds', seconds, stage=stage)
+    profile = _profile.get()
+    if profile is not None:
+        profile.append((stage, seconds))
+
+
+def count_cache(cache, name, result):
+    """Count one lookup in cache (e.g. 'derived') for entry name, with result 'hit' or 'miss'."""
+    registry.inc('cache_requests_total', cache=cache, name=name, result=result)
+
+
+def server_timing(profile, total):
+    """A Server-Timing header value: the request total, then each stage's summed time in ms."""
+    stages = {}
+    for stage, seconds in profile:
+        duration, count = stages.get(stage, (0.0, 0))
+        stages[stage] = (duration + seconds, count + 1)
+    entries = [f'total;dur={total * 1000:.3f}']
+    for stage, (duration, count) in sorted(stages.items(), key=lambda item: -item[1][0]):
+        entries.append(f'{stage};dur={duration * 1000:.3f};desc="x{count}"')
+    return ', '.join(entries)
+
+
+class MetricsFlusher:
+    """
+    Push this process's drained metrics to the shared store at most every `interval` seconds.
+
+    flush_if_due() is called at the end of requests rather than from a thread, so an
+    idle worker's latest increments wait for its next request (or for exit).
+    """
+
+    def __init__(self, store, interval=10.0):
+        self.store = store
+        self.interval = interval
+        self._next_flush = time.monotonic() + interval
+        self._lock = threading.Lock()
+
+    def flush(self):
+        with self._lock:
+            self._next_flush = time.monotonic() + self.interval
+            deltas = registry.drain()
+            try:
+                self.store.add(deltas)
+            except RedisError as e:
+                logger.error(f"Error flushing metrics, keeping them for the next flush: {e}")
+                registry.restore(deltas)
+
+    def flush_if_due(self):
+        if time.monotonic() >= self._next_flush:
+            self.flush()
+
+
+def instrument_app(app, flusher, profile_token=None):
+    """
+    Time every request and flush metrics periodically; answer profile requests with Server-Timing.
+
+    A request with the header `X-Profile: <profile_token>` gets a Server-Timing header
+    listing the stages it ran. Without a token, profiling is only available in debug mode.
+    """
+    def start_request():
+        g.metrics_started = time.perf_counter()
+        requested = request.headers.get('X-Profile')
+        if requested and (requested == profile_token if profile_token else app.debug):
+            g.metrics_profile = _profile.set([])
+
+    def finish_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            elapsed = time.perf_counter() - started
+            registry.observe('request_duration_seconds', elapsed, endpoint=request.endpoint or 'unmatched',
+                             method=request.method, status=response.status_code)
+            if 'metrics_profile' in g:
+                response.headers['Server-Timing'] = server_timing(_profile.get(), elapsed)
+        flusher.flush_if_due()
+        return response
+
+    def end_profile(exc):
+        token = g.pop('metrics_profile', None)
+        if token is not None:
+            _profile.reset(token)
+
+    # Start the clock before the CSRF and rate-limit checks that are already registered
+    app.before_request_funcs.setdefault(None, []).insert(0, start_request)
+    app.after_request(finish_request)
+    app.teardown_request(end_profile)
+    atexit.register(flusher.flush)
+
+
+def instrument_sqlalchemy():
+    """Time every SQL statement as stage 'db.<verb>', e.g. db.select or db.insert."""
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['metrics_started'].pop()
+        verb = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else 'other'
+        record_stage(f'db.{verb}', time.perf_counter() - started)
+
+    @event.listens_for(Engine, 'handle_error')
+    def handle_error(context):
+        # A failed statement never reaches after_cursor_execute; drop its start time, or the list
+        # keeps growing on the pooled connection
+        # Only statements that got as far as before_cursor_execute have an execution context
+        if context.connection is not None and context.execution_context is not None:
+            started = context.connection.info.get('metrics_started')
+            if started:
+                started.pop()
+
+
+def instrument_limiter(limiter):
+    """Time the rate limiter's storage round trips as stage 'limiter'."""
+    strategy = limiter.limiter
+    for method_name in ('hit', 'test'):
+        method = getattr(strategy, method_name)
+
+        def timed_method(*args, _method=method, **kwargs):
+            with timed('limiter'):
+                return _method(*args, **kwargs)
+
+        setattr(strategy, method_name, timed_method)
@@ -0,0 +1,29 @@
+"""Add leaderboard indexes
+
+Revision ID: 7c3e91d5b2a4
+Revises: 2a64a760f426
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3e91d5b2a4'
+down_revision = '2a64a760f426'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Composite with id, so ORDER BY score/timestamp, id and keyset comparisons are index range scans
+    with op.batch_alter_table('leaderboard_entry', schema=None) as batch_op:
+        batch_op.create_index('ix_leaderboard_entry_score_id', ['score', 'id'], unique=False)
+        batch_op.create_index('ix_leaderboard_entry_timestamp_id', ['timestamp', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('leaderboard_entry', schema=None) as batch_op:
+        batch_op.drop_index('ix_leaderboard_entry_timestamp_id')
+        batch_op.drop_index('ix_leaderboard_entry_score_id')
@@ -4,6 +4,12 @@ from datetime import datetime, timezone
 db = SQLAlchemy()
 
 class LeaderboardEntry(db.Model):
+    # The leaderboard is ordered by score or timestamp, with id as the tie-breaker for keyset pagination
+    __table_args__ = (
+        db.Index('ix_leaderboard_entry_score_id', 'score', 'id'),
+        db.Index('ix_leaderboard_entry_timestamp_id', 'timestamp', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     player_name = db.Column(db.String(80), nullable=False)
     score = db.Column(db.Integer, nullable=False)
@@ -0,0 +1,181 @@
+# payloads.py
+import gzip
+import hashlib
+import json
+import logging
+import struct
+
+import numpy as np
+
+from flask import Response, request
+
+from metrics import timed
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+
+def _dumps(data):
+    return json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+class Payload:
+    """
+    A response body serialized once, with its compressed variants and a strong ETag.
+
+    Built when the dataset is refreshed and then served straight from memory. Bodies
+    assembled per request should pass lower compression levels, since the maximum
+    levels cost tens of milliseconds.
+    """
+
+    __slots__ = ('body', 'gzip', 'br', 'etag', 'mimetype')
+
+    def __init__(self, body, mimetype='application/json', gzip_level=9, brotli_quality=11):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        with timed('payload.compress'):
+            self.gzip = gzip.compress(body, compresslevel=gzip_level, mtime=0)
+            self.br = brotli.compress(body, quality=brotli_quality) if brotli else None
+
+    @classmethod
+    def from_json(cls, data):
+        """Serialize data as compact JSON with sorted keys, leaving non-ASCII characters unescaped (UTF-8)."""
+        with timed('payload.serialize'):
+            body = _dumps(data)
+        return cls(body)
+
+    @classmethod
+    def from_records(cls, df, **compression):
+        """Serialize a DataFrame or PriceSeries as a list of row objects, like jsonify(df.to_dict(orient='records'))."""
+        with timed('payload.serialize'):
+            body = _dumps(df.to_dict(orient='records'))
+        return cls(body, **compression)
+
+    @classmethod
+    def from_columns(cls, df, **compression):
+        """Serialize a DataFrame or PriceSeries as one JSON array per column, e.g. {"date_unix": [...], "ma_7": [...]}."""
+        with timed('payload.serialize'):
+            body = _dumps(df.to_dict(orient='list'))
+        return cls(body, **compression)
+
+    @classmethod
+    def from_fragments(cls, fragments, indices=None):
+        """Join pre-serialized JSON values (see record_fragments()) into a JSON array, optionally picking indices."""
+        with timed('payload.serialize'):
+            if indices is not None:
+                fragments = [fragments[i] for i in indices]
+            body = ('[' + ','.join(fragments) + ']').encode('utf-8')
+        return cls(body)
+
+    def sizes(self):
+        return {'identity': len(self.body), 'gzip': len(self.gzip), 'br': len(self.br) if self.br else None}
+
+
+def join_json_object(members):
+    """
+    Build a JSON object from already serialized member values without parsing them again.
+
+    Parameters:
+    members (dict): Member name -> serialized JSON value (bytes). Names are sorted, like from_json().
+    """
+    return b'{' + b','.join(json.dumps(name).encode('utf-8') + b':' + members[name]
+                            for name in sorted(members)) + b'}'
+
+def record_fragments(df):
+    """
+    Serialize each row of df (a DataFrame or PriceSeries) to its own JSON object string, like from_records().
+
+    Joining a selection of them is much cheaper than serializing the selected rows.
+    """
+    return [json.dumps(record, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+            for record in df.to_dict(orient='records')]
+
+
+TERRAIN_BINARY_MAGIC = b'BPR2'
+TERRAIN_BINARY_MIMETYPE = 'application/octet-stream'
+
+def encode_terrain_binary(date_unix, values):
+    """
+    Pack terrain points into a little-endian columnar layout readable with JS typed arrays.
+
+    Layout (every section starts on a 4-byte boundary):
+        bytes 0-3    magic b'BPR2'
+        bytes 4-7    uint32 point count n
+        bytes 8-15   float64 first date_unix in ms
+        then         int32[n] date_unix deltas in seconds (the first delta is 0)
+        then         float32[n] values
+
+    Deltas are in seconds so that downsampled terrain, with gaps of weeks between
+    points, still fits in an int32. (The first layout, b'BPRT', used milliseconds.)
+
+    Parameters:
+    date_unix (array-like): Sorted epoch milliseconds.
+    values (array-like): The value for each timestamp, e.g. ma_7.
+    """
+    date_unix = np.asarray(date_unix, dtype=np.int64)
+    values = np.asarray(values, dtype='<f4')
+    if (date_unix % 1000).any():
+        raise ValueError("Terrain timestamps must be whole seconds")
+    deltas = np.diff(date_unix, prepend=date_unix[:1]) // 1000 if len(date_unix) else date_unix
+    if len(deltas) and (deltas.min() < np.iinfo(np.int32).min or deltas.max() > np.iinfo(np.int32).max):
+        raise ValueError("Timestamp gap does not fit in an int32 delta")
+    first = float(date_unix[0]) if len(date_unix) else 0.0
+    header = TERRAIN_BINARY_MAGIC + struct.pack('<Id', len(date_unix), first)
+    return header + deltas.astype('<i4').tobytes() + values.tobytes()
+
+def decode_terrain_binary(body):
+    """Inverse of encode_terrain_binary(); returns (date_unix int64 array, values float32 array)."""
+    if body[:4] != TERRAIN_BINARY_MAGIC:
+        raise ValueError("Not a terrain binary payload")
+    count, first = struct.unpack_from('<Id', body, 4)
+    deltas = np.frombuffer(body, dtype='<i4', count=count, offset=16)
+    values = np.frombuffer(body, dtype='<f4', count=count, offset=16 + 4 * count)
+    return np.int64(first) + 1000 * np.cumsum(deltas, dtype=np.int64), values
+
+
+def _choose_encoding(payload):
+    accept = request.accept_encodings
+    if payload.br is not None and accept['br']:
+        return 'br', payload.br
+    if accept['gzip']:
+        return 'gzip', payload.gzip
+    return None, payload.body
+
+
+def serve_payload(payload, max_age=None, vary=None):
+    """
+    Return a Response for payload, negotiating Content-Encoding and honouring If-None-Match.
+
+    Each encoding gets its own strong ETag derived from the identity body, and any of
+    them satisfies If-None-Match, so a client that switches encodings still gets a 304.
+    Tags weakened by a proxy (W/"...") and * match as well, as If-None-Match uses weak comparison.
+
+    Parameters:
+    payload (Payload): The precomputed payload.
+    max_age (int): Cache-Control max-age in seconds. If None, clients must revalidate.
+    vary (str): Extra request header the representation depends on, e.g. 'Accept'.
+    """
+    encoding, body = _choose_encoding(payload)
+    etag = f"{payload.etag}-{encoding}" if encoding else payload.etag
+
+    if_none_match = request.if_none_match
+    if if_none_match.star_tag or any(tag.split('-')[0] == payload.etag
+                                     for tag in if_none_match.as_set(include_weak=True)):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype=payload.mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+
+    response.set_etag(etag)
+    response.headers['Vary'] = f'Accept-Encoding, {vary}' if vary else 'Accept-Encoding'
+    if max_age is None:
+        response.headers['Cache-Control'] = 'no-cache'
+    else:
+        response.headers['Cache-Control'] = f'public, max-age={max_age}'
+    return response
@@ -0,0 +1,148 @@
+# price_series.py
+"""
+Immutable, NumPy-backed daily series for the serving path.
+
+pandas is used where the data is ingested (the price store, CoinGecko, weekly
+resampling). What snapshots and derived datasets keep, and what the routes slice
+and serialize, is a PriceSeries: one contiguous int64 array of epoch milliseconds
+and contiguous float64 value columns, all read-only. Slicing returns views of the
+same arrays, so serving a range copies nothing until it is serialized.
+"""
+import numpy as np
+import pandas as pd
+
+from utils import moving_averages, sample_indices
+
+
+def _frozen(values, dtype):
+    values = np.ascontiguousarray(values, dtype=dtype).view()
+    values.flags.writeable = False
+    return values
+
+
+class PriceSeries:
+    """
+    Dates and named float64 columns of equal length, e.g. 'price' and 'ma_7'.
+
+    Columns are read with series['ma_7'] (series['date_unix'] for the dates) as
+    read-only arrays. to_dict() mirrors DataFrame.to_dict() for 'records' and 'list',
+    so the serializers in payloads.py accept either.
+
+    Parameters:
+    date_unix (array-like): Increasing epoch milliseconds.
+    columns (dict): Column name -> values, each as long as date_unix.
+    """
+
+    __slots__ = ('date_unix', '_columns')
+
+    def __init__(self, date_unix, columns):
+        date_unix = _frozen(date_unix, np.int64)
+        columns = {name: _frozen(values, np.float64) for name, values in columns.items()}
+        for name, values in columns.items():
+            if len(values) != len(date_unix):
+                raise ValueError(f"Column {name!r} has {len(values)} values for {len(date_unix)} dates")
+        object.__setattr__(self, 'date_unix', date_unix)
+        object.__setattr__(self, '_columns', columns)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("PriceSeries is immutable")
+
+    def __reduce__(self):
+        return (PriceSeries, (np.asarray(self.date_unix), dict(self._columns)))
+
+    @classmethod
+    def from_frame(cls, df, columns):
+        """Copy df['date_unix'] and the given columns of an ingested DataFrame, e.g. complete_bitcoin_data()."""
+        return cls(df['date_unix'].to_numpy(), {name: df[name].to_numpy() for name in columns})
+
+    def to_frame(self):
+        """A DataFrame with a 'date' column added, for the pandas code that ingests and resamples data."""
+        df = pd.DataFrame({'date': pd.to_datetime(self.date_unix, unit='ms'), 'date_unix': self.date_unix})
+        for name, values in self._columns.items():
+            df[name] = values
+        return df
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    @property
+    def nbytes(self):
+        return self.date_unix.nbytes + sum(values.nbytes for values in self._columns.values())
+
+    def __len__(self):
+        return len(self.date_unix)
+
+    def __getitem__(self, name):
+        if name == 'date_unix':
+            return self.date_unix
+        return self._columns[name]
+
+    def select(self, *names):
+        """The same dates with only the named columns."""
+        return PriceSeries(self.date_unix, {name: self._columns[name] for name in names})
+
+    def rename(self, names):
+        """The same arrays with columns renamed by names, a dict of old name -> new name."""
+        return PriceSeries(self.date_unix, {names.get(name, name): values for name, values in self._columns.items()})
+
+    def window(self, start=None, stop=None):
+        """Points [start, stop) by position, as views of this series' arrays."""
+        return PriceSeries(self.date_unix[start:stop],
+                           {name: values[start:stop] for name, values in self._columns.items()})
+
+    def take(self, indices):
+        """The points at positions indices, e.g. from lttb_indices() or sample_indices()."""
+        return PriceSeries(self.date_unix[indices], {name: values[indices] for name, values in self._columns.items()})
+
+    def sample(self, n, seed=None):
+        """n distinct points in date order, picked with sample_indices()."""
+        return self.take(sample_indices(len(self), n, seed))
+
+    def dropna(self, name):
+        """The points where column name is not NaN; a view when the NaNs only lead, as in a moving average."""
+        valid = ~np.isnan(self._columns[name])
+        first = int(valid.argmax()) if valid.any() else len(valid)
+        if valid[first:].all():
+            return self.window(first)
+        return self.take(np.flatnonzero(valid))
+
+    def round(self, decimals):
+        """Every column rounded to decimals, like DataFrame.round()."""
+        return PriceSeries(self.date_unix, {name: np.round(values, decimals) for name, values in self._columns.items()})
+
+    def moving_averages(self, name, windows, kind='sma'):
+        """
+        Moving averages of column name for several windows at once (see utils.moving_averages()).
+
+        Returns:
+        PriceSeries: The same dates with a column per window, named e.g. 'sma_30',
+            NaN until the window is full.
+        """
+        averages = moving_averages(self._columns[name], windows, kind)
+        return PriceSeries(self.date_unix, {f'{kind}_{window}': values for window, values in averages.items()})
+
+    def searchsorted(self, date_unix, side='left'):
+        """The position date_unix would take among the dates, by binary search."""
+        return int(np.searchsorted(self.date_unix, date_unix, side=side))
+
+    def date_range(self, from_date=None, to_date=None):
+        """Return the [start, stop) positions of the points with from_date <= date_unix < to_date (None: unbounded)."""
+        start = 0 if from_date is None else self.searchsorted(from_date)
+        stop = len(self) if to_date is None else self.searchsorted(to_date)
+        return start, max(start, stop)
+
+    def to_dict(self, orient='records'):
+        """
+        The points as Python values, like DataFrame.to_dict() with orient 'records' or 'list'.
+
+        Dates become ints and values floats, so JSON output matches the DataFrame's.
+        """
+        lists = {'date_unix': self.date_unix.tolist(),
+                 **{name: values.tolist() for name, values in self._columns.items()}}
+        if orient == 'list':
+            return lists
+        if orient != 'records':
+            raise ValueError(f"Unsupported orient {orient!r}, expected 'records' or 'list'")
+        names = list(lists)
+        return [dict(zip(names, row)) for row in zip(*lists.values())]
@@ -0,0 +1,201 @@
+# price_store.py
+"""
+Compiled, memory-mappable store of the historical Bitcoin daily closes.
+
+The CSVs stay the source of truth. compile_price_store() merges them into one file of
+validated, sorted, deduplicated columns, and load_price_store() maps those columns
+read-only, so loading them takes no CSV parsing. If the store cannot be written (e.g. a
+read-only file system), the CSVs are parsed into memory instead.
+
+File layout:
+    bytes 0-7    magic b'BPRSTORE'
+    bytes 8-11   uint32 length of the JSON header
+    then         JSON header: row count, column names/dtypes/offsets, source hashes
+    then         each column as a contiguous little-endian array, 64-byte aligned
+
+Days fetched from CoinGecko after the CSVs end are appended with append_price_store().
+They survive restarts but not a recompile, after which they are simply fetched again.
+
+Regenerate by hand with:
+    python price_store.py
+"""
+import hashlib
+import json
+import logging
+import os
+import struct
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from metrics import timed
+
+logger = logging.getLogger(__name__)
+
+BASEDIR = os.path.abspath(os.path.dirname(__file__))
+STORE_PATH = os.environ.get('PRICE_STORE_PATH', os.path.join(BASEDIR, 'bitcoin_prices.bin'))
+STORE_MAGIC = b'BPRSTORE'
+STORE_FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+# (file name, delimiter), lowest precedence first: later files win on duplicate dates
+PRICE_SOURCES = [
+    ('bitcoin_historical.csv', ';'),
+    ('bitcoin_historical_new.csv', ','),
+    ('bitcoin_historical_merged.csv', ','),
+]
+
+COLUMNS = [('date_unix', '<i8'), ('price', '<f8')]
+
+
+def _source_hashes(sources, basedir):
+    hashes = {}
+    for name, _ in sources:
+        with open(os.path.join(basedir, name), 'rb') as f:
+            hashes[name] = hashlib.sha256(f.read()).hexdigest()
+    return hashes
+
+def read_price_sources(sources=PRICE_SOURCES, basedir=BASEDIR):
+    """
+    Read, validate and merge the source CSVs into a DataFrame with 'date_unix' and 'price'.
+
+    Rows with unparseable dates or non-positive/non-finite closes are dropped, duplicate
+    dates keep the value from the last source listed, and the result is sorted by date.
+    """
+    from utils import to_unix_ms
+
+    frames = []
+    for name, delimiter in sources:
+        df = pd.read_csv(os.path.join(basedir, name), delimiter=delimiter, usecols=['Start', 'Close'])
+        df['date'] = pd.to_datetime(df['Start'], errors='coerce')
+        df['price'] = pd.to_numeric(df['Close'], errors='coerce')
+        frames.append(df[['date', 'price']])
+
+    df = pd.concat(frames, ignore_index=True)
+    valid = df['date'].notna() & np.isfinite(df['price']) & (df['price'] > 0)
+    if not valid.all():
+        logger.warning(f"Dropping {(~valid).sum()} invalid rows from the price sources")
+    df = df[valid]
+
+    df = df.drop_duplicates(subset='date', keep='last').sort_values('date', kind='stable')
+    return pd.DataFrame({
+        'date_unix': to_unix_ms(df['date']).to_numpy(dtype=np.int64),
+        'price': df['price'].to_numpy(dtype=np.float64)
+    })
+
+def compile_price_store(path=STORE_PATH, sources=PRICE_SOURCES, basedir=BASEDIR):
+    """Compile the source CSVs into the binary store at path. Returns the number of rows."""
+    with timed('csv.parse'):
+        df = read_price_sources(sources, basedir)
+    _write_price_store(path, df, _source_hashes(sources, basedir))
+    logger.info(f"Compiled {len(df)} rows into {path}")
+    return len(df)
+
+def append_price_store(date_unix, price, path=STORE_PATH):
+    """
+    Append rows dated after the last stored row. Returns the new number of rows.
+
+    The store keeps the source hashes it was compiled with, so it stays current.
+    """
+    date_unix = np.asarray(date_unix, dtype=np.int64)
+    price = np.asarray(price, dtype=np.float64)
+    if not (np.isfinite(price).all() and (price > 0).all() and (np.diff(date_unix) > 0).all()):
+        raise ValueError("Appended prices must be positive and strictly increasing in date")
+
+    header, data_start = _read_header(path)
+    store = _map_columns(path, header, data_start)
+    if len(date_unix) and len(store['date_unix']) and date_unix[0] <= store['date_unix'][-1]:
+        raise ValueError("Appended prices must be dated after the last stored row")
+
+    df = pd.DataFrame({
+        'date_unix': np.concatenate([store['date_unix'], date_unix]),
+        'price': np.concatenate([store['price'], price])
+    })
+    _write_price_store(path, df, header['sources'])
+    return len(df)
+
+def _write_price_store(path, df, source_hashes):
+    rows = len(df)
+
+    columns = []
+    offset = 0
+    for name, dtype in COLUMNS:
+        columns.append({'name': name, 'dtype': dtype, 'offset': offset})
+        offset += rows * np.dtype(dtype).itemsize
+        offset += -offset % ALIGNMENT
+    header = {
+        'format': STORE_FORMAT_VERSION,
+        'rows': rows,
+        'columns': columns,
+        'sources': source_hashes,
+        'written_at': int(time.time())
+    }
+    header_bytes = json.dumps(header, sort_keys=True).encode('utf-8')
+    data_start = len(STORE_MAGIC) + 4 + len(header_bytes)
+    data_start += -data_start % ALIGNMENT
+    header_bytes = header_bytes.ljust(data_start - len(STORE_MAGIC) - 4)
+
+    # Write to a temporary file and rename, so concurrent workers never see a partial store
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.bitcoin_prices.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(STORE_MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes)
+            for column in columns:
+                f.seek(data_start + column['offset'])
+                f.write(df[column['name']].to_numpy(dtype=column['dtype']).tobytes())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+def _read_header(path):
+    with open(path, 'rb') as f:
+        if f.read(len(STORE_MAGIC)) != STORE_MAGIC:
+            raise ValueError(f"{path} is not a price store")
+        (header_length,) = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(header_length))
+    return header, len(STORE_MAGIC) + 4 + header_length
+
+def is_price_store_current(path=STORE_PATH, sources=PRICE_SOURCES, basedir=BASEDIR):
+    """Return True if path exists and was compiled from the current source CSVs."""
+    try:
+        header, _ = _read_header(path)
+    except (OSError, ValueError):
+        return False
+    return header.get('format') == STORE_FORMAT_VERSION and header.get('sources') == _source_hashes(sources, basedir)
+
+def load_price_store(path=STORE_PATH, sources=PRICE_SOURCES, basedir=BASEDIR):
+    """
+    Map the price store read-only and return {'date_unix': int64 array, 'price': float64 array}.
+
+    The store is (re)compiled first if it is missing or older than the source CSVs. The
+    arrays are np.memmap views of the file; anything built from them, such as a DataFrame,
+    holds its own copy. If the store cannot be compiled, the columns are read from the
+    CSVs into ordinary arrays, as read_price_sources() returns them.
+    """
+    if not is_price_store_current(path, sources, basedir):
+        with timed('csv.parse'):
+            df = read_price_sources(sources, basedir)
+        try:
+            _write_price_store(path, df, _source_hashes(sources, basedir))
+            logger.info(f"Compiled {len(df)} rows into {path}")
+        except OSError as e:
+            logger.error(f"Cannot write the price store at {path}, serving the CSVs from memory: {e}")
+            return {name: df[name].to_numpy(dtype=dtype) for name, dtype in COLUMNS}
+    header, data_start = _read_header(path)
+    return _map_columns(path, header, data_start)
+
+def _map_columns(path, header, data_start):
+    return {
+        column['name']: np.memmap(path, dtype=column['dtype'], mode='r',
+                                  offset=data_start + column['offset'], shape=(header['rows'],))
+        for column in header['columns']
+    }
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    compile_price_store()
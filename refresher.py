@@ -0,0 +1,342 @@
+# refresher.py
+import threading
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+
+from utils import complete_bitcoin_data, update_bitcoin_data, coingecko_client
+from price_series import PriceSeries
+from shared_cache import LocalSharedCache
+from metrics import timed
+
+logger = logging.getLogger(__name__)
+
+
+class DataSnapshot:
+    """
+    One successfully built version of the merged Bitcoin dataset.
+
+    `series` is a PriceSeries with the 'price' and 'ma_7' columns. When the snapshot
+    was made by appending rows to the snapshot `parent_version`, `appended_rows` says
+    how many, so derived data can be updated instead of rebuilt.
+    """
+
+    __slots__ = ('series', 'version', 'refreshed_at', 'duration', 'includes_recent', 'parent_version', 'appended_rows')
+
+    def __init__(self, series, version, refreshed_at, duration, includes_recent, parent_version=None,
+                 appended_rows=None):
+        self.series = series
+        self.version = version
+        self.refreshed_at = refreshed_at
+        self.duration = duration
+        self.includes_recent = includes_recent
+        self.parent_version = parent_version
+        self.appended_rows = appended_rows
+
+
+class DataRefresher:
+    """
+    Rebuild the merged Bitcoin dataset off the request path.
+
+    A daemon thread fetches the days added since the current snapshot every `interval`
+    seconds (see update_bitcoin_data()) and swaps the result in as a new DataSnapshot. Requests only ever read the current snapshot,
+    so they never wait on CoinGecko. When a rebuild fails the last good snapshot keeps
+    being served and the next attempt happens after `retry_interval` seconds.
+
+    Snapshots are published to the shared cache. A worker that finds a snapshot there
+    younger than `interval` adopts it instead of rebuilding, and rebuilds run under a
+    shared lock, so only one gunicorn worker calls CoinGecko per interval.
+
+    Every `full_interval` seconds the thread rebuilds from the price store instead of
+    appending. The time of the last full rebuild is shared too, so one worker does it.
+    Each rebuild gets a new version, which is all that invalidates derived data. An
+    append that finds no new days keeps the current version and only records the check.
+
+    Parameters:
+    interval (int): Seconds between successful refreshes.
+    retry_interval (int): Seconds to wait after a failed refresh.
+    ma (int): Moving average window passed to complete_bitcoin_data().
+    client_factory (callable): Returns a CoinGecko client. Defaults to CoinGeckoAPI, and
+        can be replaced with a local stub in tests.
+    shared (LocalSharedCache | RedisSharedCache): Where snapshots, the version counter
+        and the rebuild lock live. Defaults to an in-process cache.
+    lock_timeout (int): Seconds a rebuild may hold, or wait for, the shared lock.
+    full_interval (int): Seconds between full rebuilds. 0 disables them.
+    """
+
+    def __init__(self, interval=3600, retry_interval=60, ma=7, client_factory=None, shared=None, lock_timeout=120,
+                 full_interval=86400):
+        self.interval = interval
+        self.retry_interval = retry_interval
+        self.ma = ma
+        self.client_factory = client_factory
+        self.shared = shared if shared is not None else LocalSharedCache()
+        self.lock_timeout = lock_timeout
+        self.full_interval = full_interval
+        self._last_full = None
+        self.last_error = None
+        self.last_attempt = None
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._force = False
+        self._thread = None
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """Call callback(snapshot) in the refreshing thread after each new snapshot is swapped in."""
+        self._listeners.append(callback)
+
+    def _swap(self, snapshot):
+        with self._lock:
+            current = self._snapshot
+            if current is not None and current.version >= snapshot.version:
+                if current.version == snapshot.version and snapshot.refreshed_at > current.refreshed_at:
+                    # The same data, checked again: note the refresh, derived data stays valid
+                    self._snapshot = snapshot
+                return False
+            self._snapshot = snapshot
+
+        for callback in self._listeners:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                logger.error(f"Error in data refresh listener {callback.__name__}: {e}")
+        return True
+
+    def _build(self, include_recent, full=False, cg=None):
+        """
+        Build a new snapshot from the price store, plus CoinGecko days if include_recent.
+
+        Appends to the current snapshot unless full is set or there is none yet. cg
+        overrides the client from client_factory.
+        """
+        if cg is None and include_recent and self.client_factory:
+            cg = self.client_factory()
+        started = time.perf_counter()
+        parent = None if full else self._snapshot
+        with timed('snapshot.full_build' if parent is None else 'snapshot.append'):
+            # pandas only while ingesting; the snapshot keeps the result as read-only arrays
+            if parent is not None:
+                df = parent.series.to_frame()
+            else:
+                df = complete_bitcoin_data(ma=self.ma, include_recent=False)
+            appended_rows = None
+            if include_recent:
+                df, appended_rows = update_bitcoin_data(df, ma=self.ma, cg=cg)
+            if parent is not None and appended_rows == 0:
+                series = None
+            else:
+                series = PriceSeries.from_frame(df, ['price', f'ma_{self.ma}'])
+        duration = time.perf_counter() - started
+
+        if series is None:
+            # Nothing new: keep the version, so no derived dataset or payload is rebuilt
+            logger.info(f"Bitcoin data snapshot v{parent.version} is up to date, checked in {duration:.2f}s")
+            return DataSnapshot(
+                series=parent.series,
+                version=parent.version,
+                refreshed_at=datetime.now(timezone.utc),
+                duration=duration,
+                includes_recent=True,
+                parent_version=parent.parent_version,
+                appended_rows=parent.appended_rows
+            )
+
+        snapshot = DataSnapshot(
+            series=series,
+            version=self._next_version(),
+            refreshed_at=datetime.now(timezone.utc),
+            duration=duration,
+            includes_recent=include_recent,
+            parent_version=parent.version if parent is not None else None,
+            appended_rows=appended_rows if parent is not None else None
+        )
+        logger.info(f"Bitcoin data snapshot v{snapshot.version} ready in {duration:.2f}s")
+        return snapshot
+
+    def _next_version(self):
+        current = self._snapshot.version if self._snapshot else 0
+        try:
+            version = self.shared.incr('data_version')
+        except Exception as e:
+            # Keep serving from this worker even if the shared counter is unreachable
+            logger.error(f"Error incrementing shared data version: {e}")
+            return current + 1
+        if version <= current:
+            # The counter was lost (Redis flushed or the key evicted); continue above this worker's version,
+            # or _swap() would reject every new snapshot as older than the one being served
+            logger.warning(f"Shared data version went back to {version} below v{current}, re-seeding it")
+            version = current + 1
+            try:
+                self.shared.set_counter('data_version', version)
+            except Exception as e:
+                logger.error(f"Error re-seeding shared data version: {e}")
+        return version
+
+    def _adopt_shared(self, refreshed_after):
+        """Swap in the published snapshot if it was refreshed after refreshed_after."""
+        shared_snapshot = self.shared.get('snapshot')
+        if shared_snapshot is None or shared_snapshot.refreshed_at <= refreshed_after:
+            return False
+        current = self._snapshot
+        if (current is not None and shared_snapshot.version < current.version
+                and shared_snapshot.refreshed_at > current.refreshed_at):
+            # Newer data under an older version means the shared counter was reset; rebuild here instead,
+            # so _next_version() re-seeds it and the other workers adopt the result
+            logger.warning(f"Shared Bitcoin data snapshot v{shared_snapshot.version} is newer than "
+                           f"v{current.version} but numbered lower, rebuilding")
+            return False
+        if self._swap(shared_snapshot):
+            logger.info(f"Adopted Bitcoin data snapshot v{shared_snapshot.version} from the shared cache")
+        return True
+
+    def seed(self):
+        """
+        Install an initial snapshot without any network call.
+
+        Uses the published snapshot if another worker already built one, otherwise builds
+        from the CSV history only.
+        """
+        if self._snapshot is None:
+            try:
+                adopted = self._adopt_shared(datetime.min.replace(tzinfo=timezone.utc))
+            except Exception as e:
+                logger.error(f"Error reading shared Bitcoin data snapshot: {e}")
+                adopted = False
+            if not adopted:
+                self._swap(self._build(include_recent=False))
+        return self._snapshot
+
+    def preload(self, timeout=10):
+        """
+        Build the snapshot in the calling thread, without starting the background thread.
+
+        Meant for a gunicorn master with preload_app: workers forked afterwards share the
+        snapshot, and what listeners derived from it, copy-on-write, and their start()
+        waits out the interval instead of refreshing at once. CoinGecko requests give up
+        after `timeout` seconds without retries, so the master binds within the platform's
+        boot timeout; if the refresh fails, the snapshot is seeded from the price store and
+        every worker fetches the recent days itself.
+        """
+        cg = self.client_factory() if self.client_factory else coingecko_client(timeout=timeout)
+        if not self.refresh(force=self._full_refresh_due(), cg=cg):
+            logger.warning("Preloading Bitcoin data without CoinGecko, workers will fetch the recent days")
+        return self.seed()
+
+    def refresh(self, force=False, cg=None):
+        """
+        Rebuild the dataset including CoinGecko data and swap it in.
+
+        Unless force is set, a snapshot published by another worker within the last
+        `interval` seconds is adopted instead, and new days are appended to the current
+        snapshot. A forced refresh rebuilds from the price store. cg overrides the
+        CoinGecko client from client_factory. Returns True on success. On failure the
+        error is logged and recorded, and the previous snapshot stays in place.
+        Concurrent calls in one process are collapsed into one.
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            return False
+        try:
+            requested_at = datetime.now(timezone.utc)
+            self.last_attempt = requested_at
+            fresh_after = requested_at if force else requested_at - timedelta(seconds=self.interval)
+            if self._adopt_shared(fresh_after):
+                self.last_error = None
+                return True
+
+            with self.shared.lock('refresh', timeout=self.lock_timeout):
+                # Another worker may have finished a rebuild while we waited for the lock
+                if not self._adopt_shared(fresh_after):
+                    snapshot = self._build(include_recent=True, full=force, cg=cg)
+                    self.shared.set('snapshot', snapshot)
+                    if force:
+                        self._last_full = snapshot.refreshed_at
+                        self.shared.set('full_refreshed_at', snapshot.refreshed_at)
+                    self._swap(snapshot)
+            self.last_error = None
+            return True
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error(f"Error refreshing Bitcoin data, serving last good snapshot: {e}")
+            return False
+        finally:
+            self._refresh_lock.release()
+
+    def _full_refresh_due(self):
+        if not self.full_interval:
+            return False
+        try:
+            last_full = self.shared.get('full_refreshed_at')
+        except Exception as e:
+            logger.error(f"Error reading shared full refresh time: {e}")
+            last_full = self._last_full
+        return last_full is None or datetime.now(timezone.utc) - last_full >= timedelta(seconds=self.full_interval)
+
+    def _run(self, delay=0):
+        if delay:
+            self._wake.wait(delay)
+            self._wake.clear()
+        while not self._stop.is_set():
+            force, self._force = self._force or self._full_refresh_due(), False
+            ok = self.refresh(force=force)
+            self._wake.wait(self.interval if ok else self.retry_interval)
+            self._wake.clear()
+
+    def trigger(self):
+        """Ask the background thread to rebuild now instead of waiting for the next interval."""
+        self._force = True
+        self._wake.set()
+
+    def start(self):
+        """
+        Seed the dataset and start the background refresh thread.
+
+        The first refresh runs at once, unless the snapshot already includes CoinGecko
+        data (e.g. one adopted from the shared cache); then it waits until `interval`
+        after the snapshot was refreshed.
+        """
+        snapshot = self.seed()
+        delay = 0
+        if snapshot.includes_recent:
+            age = (datetime.now(timezone.utc) - snapshot.refreshed_at).total_seconds()
+            delay = max(0, self.interval - age)
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(delay,), name='bitcoin-data-refresher',
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def snapshot(self):
+        """Return the current DataSnapshot, seeding it from CSV if nothing has been built yet."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.seed()
+        return snapshot
+
+    def get_data(self):
+        """Return the current snapshot's data as a new DataFrame, with 'date', 'date_unix', 'price' and 'ma_7'."""
+        return self.snapshot().series.to_frame()
+
+    def status(self):
+        """Return refresh bookkeeping as a JSON-serializable dict."""
+        snapshot = self._snapshot
+        now = datetime.now(timezone.utc)
+        return {
+            'version': snapshot.version if snapshot else None,
+            'last_refresh': snapshot.refreshed_at.isoformat() if snapshot else None,
+            'age_seconds': round((now - snapshot.refreshed_at).total_seconds(), 3) if snapshot else None,
+            'duration_seconds': round(snapshot.duration, 3) if snapshot else None,
+            'includes_recent': snapshot.includes_recent if snapshot else False,
+            'last_attempt': self.last_attempt.isoformat() if self.last_attempt else None,
+            'last_error': self.last_error
+        }
@@ -0,0 +1,353 @@
+# score_writer.py
+import glob
+import json
+import os
+import socket
+import threading
+import logging
+import uuid
+from collections import deque
+
+from metrics import timed
+
+try:
+    import fcntl
+except ImportError:  # Windows; journals are then not locked
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class JournalScoreQueue:
+    """
+    In-process queue of pending scores, mirrored to an append-only journal file.
+
+    Every pushed entry is appended (and flushed) to the journal before push() returns, and
+    the journal is rewritten with whatever is still pending after each successful write,
+    so entries that were queued when the process died are loaded again on the next start.
+
+    Each process keeps its own journal, '<path>.<pid>', and holds an exclusive lock on it.
+    A process opens its journal on first use and takes over every other journal whose lock
+    is free, i.e. whose process died, so each recovered entry is loaded by exactly one
+    process. That takeover, in _open(), is all the recovery a journal needs, so unlike
+    RedisScoreQueue this queue has no recover(). (Without fcntl, as on Windows, journals
+    are not locked; use one process there.)
+
+    Parameters:
+    path (str): Base name of the journal files, one JSON entry per line.
+    fsync (bool): fsync after each append. Survives power loss, not just a crashed process.
+    """
+
+    def __init__(self, path, fsync=False):
+        self.path = path
+        self.fsync = fsync
+        self._pending = deque()
+        self._guard = threading.Lock()
+        self._journal = None
+        self._pid = None
+
+    def _journal_path(self):
+        return f'{self.path}.{self._pid}'
+
+    def _open(self):
+        # Called under _guard. Lazily, because the queue is created in the gunicorn master before forking
+        if self._pid == os.getpid():
+            return
+        own = f'{self.path}.{os.getpid()}'
+        journal = open(own, 'a+', encoding='utf-8')
+        if not _try_lock(journal):
+            journal.close()
+            raise OSError(f"Score journal {own} is locked by another queue in this process")
+        self._journal, self._pid = journal, os.getpid()
+        # A journal with this pid can only be left by a dead process that had the same pid
+        journal.seek(0)
+        self._pending = deque(_read_journal(journal, own))
+
+        # Journals of other processes whose lock is free, and an unsuffixed one from before per-process journals
+        candidates = [self.path] + sorted(glob.glob(glob.escape(self.path) + '.*'))
+        for path in candidates:
+            if path == own or (path != self.path and not path[len(self.path) + 1:].isdigit()):
+                continue
+            entries = self._take_over(path)
+            if entries:
+                self._pending.extend(entries)
+                logger.info(f"Recovered {len(entries)} queued scores from {path}")
+
+    def _take_over(self, path):
+        """Move the entries of an abandoned journal into this process's journal, then delete it."""
+        try:
+            f = open(path, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return []
+        with f:
+            if not _try_lock(f):
+                return []
+            try:
+                # Another process may have taken it over and deleted it while this one waited to open it
+                if os.stat(path).st_ino != os.fstat(f.fileno()).st_ino:
+                    return []
+            except FileNotFoundError:
+                return []
+            entries = _read_journal(f, path)
+            self._journal.writelines(json.dumps(entry, sort_keys=True) + '\n' for entry in entries)
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            os.unlink(path)
+        return entries
+
+    def push(self, entry):
+        line = json.dumps(entry, sort_keys=True) + '\n'
+        with self._guard:
+            self._open()
+            self._journal.write(line)
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            self._pending.append(entry)
+            return len(self._pending)
+
+    def take(self, n):
+        with self._guard:
+            self._open()
+            return [self._pending.popleft() for _ in range(min(n, len(self._pending)))]
+
+    def restore(self, batch):
+        with self._guard:
+            self._pending.extendleft(reversed(batch))
+
+    def ack(self):
+        # Rewrite the journal with what is still pending, then swap it in atomically. The new file
+        # is locked before the rename, so the journal is never unlocked while this process lives.
+        with self._guard:
+            self._open()
+            own = self._journal_path()
+            journal = open(own + '.tmp', 'w', encoding='utf-8')
+            _try_lock(journal)
+            journal.writelines(json.dumps(entry, sort_keys=True) + '\n' for entry in self._pending)
+            journal.flush()
+            os.fsync(journal.fileno())
+            os.replace(own + '.tmp', own)
+            self._journal.close()
+            self._journal = journal
+
+    def __len__(self):
+        with self._guard:
+            self._open()
+            return len(self._pending)
+
+
+def _try_lock(f):
+    """Take an exclusive lock on the open file f without waiting. Returns False if another holds it."""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def _read_journal(f, path):
+    entries = []
+    for line in f.read().splitlines():
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            # A torn last line from a crash mid-append
+            logger.error(f"Skipping unreadable line in score journal {path}")
+    return entries
+
+
+class RedisScoreQueue:
+    """
+    Pending scores in a Redis list shared by every gunicorn worker.
+
+    Entries survive worker restarts; any worker's flusher may write them. take() moves
+    a batch atomically (LMOVE) from the pending list to a processing list of its own
+    process, so two workers never write the same entry. ack() drops the processing list,
+    and restore() puts the batch back at the head of the pending list.
+
+    Each processing list has a lease, renewed by take(). recover() puts back the batches
+    of processes whose lease ran out, i.e. that died between take() and ack(), so a batch
+    is only lost if Redis is. A write that outlasts the lease may be repeated.
+
+    Parameters:
+    client: A redis.StrictRedis (or fakeredis.FakeStrictRedis) instance.
+    key (str): The list holding pending entries.
+    lease (int): Seconds a taken batch may stay unacknowledged before it is requeued.
+    """
+
+    def __init__(self, client, key='bpr:scores:pending', lease=60):
+        self.client = client
+        self.key = key
+        self.lease = lease
+        self._owner = None
+
+    def _processing_key(self):
+        # Per process, and created lazily: the queue is built in the gunicorn master before forking
+        pid = os.getpid()
+        if self._owner is None or self._owner[0] != pid:
+            self._owner = (pid, f'{self.key}:processing:{socket.gethostname()}:{pid}:{uuid.uuid4().hex[:8]}')
+        return self._owner[1]
+
+    def push(self, entry):
+        return int(self.client.rpush(self.key, json.dumps(entry, sort_keys=True)))
+
+    def take(self, n):
+        n = min(n, len(self))
+        if n <= 0:
+            return []
+        processing = self._processing_key()
+        pipe = self.client.pipeline(transaction=True)
+        pipe.sadd(self.key + ':processing', processing)
+        pipe.set(processing + ':lease', 1, ex=self.lease)
+        for _ in range(n):
+            pipe.lmove(self.key, processing, 'LEFT', 'RIGHT')
+        batch = [json.loads(item) for item in pipe.execute()[2:] if item is not None]
+        if not batch:
+            # Another worker took them first
+            self.ack()
+        return batch
+
+    def _release(self, pipe, processing):
+        pipe.delete(processing, processing + ':lease')
+        pipe.srem(self.key + ':processing', processing)
+
+    def restore(self, batch):
+        processing = self._processing_key()
+        pipe = self.client.pipeline(transaction=True)
+        if batch:
+            pipe.lpush(self.key, *[json.dumps(entry, sort_keys=True) for entry in reversed(batch)])
+        self._release(pipe, processing)
+        pipe.execute()
+
+    def ack(self):
+        pipe = self.client.pipeline(transaction=True)
+        self._release(pipe, self._processing_key())
+        pipe.execute()
+
+    def recover(self):
+        """Put back the batches of processes whose lease expired. Returns the number of entries requeued."""
+        owners = [owner.decode('utf-8') for owner in self.client.smembers(self.key + ':processing')]
+        pipe = self.client.pipeline(transaction=False)
+        for owner in owners:
+            pipe.exists(owner + ':lease')
+        requeued = 0
+        for owner, alive in zip(owners, pipe.execute()):
+            if alive:
+                continue
+            # One entry at a time from the tail to the head keeps their order, and LMOVE never hands
+            # an entry to two workers recovering the same list
+            while self.client.lmove(owner, self.key, 'RIGHT', 'LEFT') is not None:
+                requeued += 1
+            self.client.srem(self.key + ':processing', owner)
+        if requeued:
+            logger.info(f"Requeued {requeued} scores taken by workers that stopped before writing them")
+        return requeued
+
+    def __len__(self):
+        return int(self.client.llen(self.key))
+
+
+class ScoreWriter:
+    """
+    Write-behind buffer for leaderboard entries.
+
+    submit() queues an entry and returns at once. A daemon thread passes queued entries
+    to write(batch) in batches of up to batch_size, whenever batch_size entries are
+    waiting or every interval seconds, so a burst of submissions costs one transaction
+    per batch instead of one per score. If write() raises, the batch is put back and
+    retried on the next flush. stop() writes whatever is still queued. Delivery is at
+    least once: an entry written just before a crash, but not yet acknowledged to the
+    queue, is written again by the next flush that recovers it.
+
+    Parameters:
+    queue (JournalScoreQueue | RedisScoreQueue): Where pending entries are kept. Its
+        recover(), if it has one, runs before each flush.
+    write (callable): Inserts a list of entry dicts in one transaction.
+    batch_size (int): Entries per write, and the queue length that triggers an early flush.
+    interval (float): Maximum seconds an entry waits before being written.
+    """
+
+    def __init__(self, queue, write, batch_size=100, interval=1.0):
+        self.queue = queue
+        self.write = write
+        self.batch_size = batch_size
+        self.interval = interval
+        self.last_error = None
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def submit(self, entry):
+        """Queue entry, waking the flusher if a full batch is waiting. Returns the queue length."""
+        pending = self.queue.push(entry)
+        if pending >= self.batch_size:
+            self._wake.set()
+        return pending
+
+    def flush(self):
+        """Write everything queued, one batch at a time. Returns the number of entries written."""
+        written = 0
+        with self._flush_lock:
+            recover = getattr(self.queue, 'recover', None)
+            if recover is not None:
+                recover()
+            while True:
+                batch = self.queue.take(self.batch_size)
+                if not batch:
+                    break
+                try:
+                    with timed('scores.write_batch'):
+                        self.write(batch)
+                except Exception as e:
+                    self.queue.restore(batch)
+                    self.last_error = str(e)
+                    logger.error(f"Error writing {len(batch)} queued scores, will retry: {e}")
+                    break
+                self.queue.ack()
+                self.last_error = None
+                written += len(batch)
+        return written
+
+    def _flush_logged(self):
+        try:
+            self.flush()
+        except Exception as e:
+            # e.g. Redis unreachable while taking or putting back a batch; try again on the next flush
+            self.last_error = str(e)
+            logger.error(f"Error flushing queued scores, will retry: {e}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self._flush_logged()
+
+    def start(self):
+        """Write anything left from a previous run and start the flusher thread."""
+        self._flush_logged()
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='score-writer', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Stop the flusher thread and write whatever is still queued."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.flush()
+
+    def status(self):
+        return {'pending': len(self.queue), 'last_error': self.last_error}
+
+
+def create_score_queue(redis_client, journal_path):
+    """Return a RedisScoreQueue for redis_client, or a JournalScoreQueue at journal_path when it is None."""
+    if redis_client is None:
+        return JournalScoreQueue(journal_path)
+    return RedisScoreQueue(redis_client)
@@ -0,0 +1,116 @@
+# shared_cache.py
+import pickle
+import threading
+import time
+import logging
+
+from redis.exceptions import RedisError
+
+from metrics import count_cache
+
+logger = logging.getLogger(__name__)
+
+
+class LocalSharedCache:
+    """In-process stand-in for RedisSharedCache, used when REDIS_URL == 'local'."""
+
+    def __init__(self):
+        self._values = {}
+        self._counters = {}
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def get(self, key):
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            self._values.pop(key, None)
+            return None
+        return value
+
+    def set(self, key, value, timeout=None):
+        expires_at = time.monotonic() + timeout if timeout else None
+        self._values[key] = (value, expires_at)
+
+    def incr(self, key):
+        with self._guard:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def set_counter(self, key, value):
+        with self._guard:
+            self._counters[key] = value
+
+    def lock(self, key, timeout=60):
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+
+class RedisSharedCache:
+    """
+    Pickled values, counters and locks stored in Redis so every gunicorn worker sees them.
+
+    Parameters:
+    client: A redis.StrictRedis (or fakeredis.FakeStrictRedis) instance.
+    prefix (str): Namespace for every key this cache writes.
+    """
+
+    def __init__(self, client, prefix='bpr:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, timeout=None):
+        self.client.set(self.prefix + key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ex=timeout)
+
+    def incr(self, key):
+        return int(self.client.incr(self.prefix + key))
+
+    def set_counter(self, key, value):
+        # Stored as a plain integer, not pickled, so incr() keeps working on it
+        self.client.set(self.prefix + key, int(value))
+
+    def lock(self, key, timeout=60):
+        # blocking_timeout bounds how long a waiter sits behind another worker's build
+        return self.client.lock(self.prefix + 'lock:' + key, timeout=timeout, blocking_timeout=timeout)
+
+
+def get_or_build(cache, key, build, timeout=None, lock_timeout=60, name='value'):
+    """
+    Return cache[key], building and storing it under a lock if it is missing.
+
+    Only one caller across all workers runs build() for a given key. The others wait
+    for the lock and then read the stored value. If Redis is unavailable or the lock
+    cannot be acquired in time, the value is built locally rather than failing the caller.
+    name labels the hit/miss counts in the metrics, since keys are versioned.
+    """
+    try:
+        value = cache.get(key)
+        if value is not None:
+            count_cache('shared', name, 'hit')
+            return value
+        with cache.lock(key, timeout=lock_timeout):
+            value = cache.get(key)
+            if value is None:
+                count_cache('shared', name, 'miss')
+                value = build()
+                cache.set(key, value, timeout)
+            else:
+                count_cache('shared', name, 'hit')
+            return value
+    except RedisError as e:
+        count_cache('shared', name, 'error')
+        logger.error(f"Shared cache unavailable for {key}, building locally: {e}")
+        return build()
+
+
+def create_shared_cache(redis_client):
+    """Return a RedisSharedCache for redis_client, or a LocalSharedCache when it is None."""
+    if redis_client is None:
+        return LocalSharedCache()
+    return RedisSharedCache(redis_client)
@@ -30,27 +30,17 @@ export default class Events {
             this.scene.dataManager.terrainData.length - 1
         );
 
-        // Create a map of terrain data by date_unix for quick lookup
-        const terrainDataMap = {};
-        for (let i = startTerrainIndex; i <= endTerrainIndex; i++) { // Changed to <= to include endIndex
-            const dataPoint = this.scene.dataManager.terrainData[i];
-            if (dataPoint && dataPoint.date_unix) { // Added check for dataPoint existence
-                terrainDataMap[dataPoint.date_unix] = {
-                    dataPoint,
-                    index: i
-                };
-            }
-        }
-
-        // Filter events that are within the visible terrain data
+        // Events carry the index of their nearest terrain point (joined on the server), so an event
+        // dated between two terrain points still lands on the terrain
         const visibleEvents = this.eventsData.filter(eventData => {
-            return terrainDataMap.hasOwnProperty(eventData.date_unix);
+            return eventData.terrain_index != null &&
+                eventData.terrain_index >= startTerrainIndex &&
+                eventData.terrain_index <= endTerrainIndex;
         });
 
         visibleEvents.forEach(eventData => {
-            const terrainInfo = terrainDataMap[eventData.date_unix];
-            const dataPoint = terrainInfo.dataPoint;
-            const index = terrainInfo.index;
+            const index = eventData.terrain_index;
+            const dataPoint = this.scene.dataManager.terrainData[index];
 
             // Calculate X position similar to Terrain.js
             const x = this.scene.sys.game.config.width * (index - terrainOffset) / this.visibleDataPoints;
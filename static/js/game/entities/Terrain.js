@@ -61,9 +61,10 @@ export default class Terrain {
 
         // Determine if any event is approaching within the next 5 data points
         let highlightGlow = false;
+        // terrain_index is the nearest terrain point, joined on the server (null outside the terrain)
         this.eventsData.forEach(event => {
-            const eventIndex = this.terrainData.findIndex(d => d.date_unix === event.date_unix);
-            if (eventIndex !== -1) {
+            const eventIndex = event.terrain_index;
+            if (eventIndex != null) {
                 const distance = eventIndex - Math.floor(terrainOffset);
                 if (distance > 0 && distance <= 5) { // Event within next 5 data points
                     highlightGlow = true;
@@ -1,27 +1,130 @@
 // DataManager.js
 
+// Points per /terrain_data chunk, the same as TERRAIN_CHUNK_SIZE in datasets.py so chunks are served warm
+const TERRAIN_CHUNK_SIZE = 500;
+const TERRAIN_CHUNK_RETRIES = 3;
+// localStorage key for the parts of the last /game_bootstrap response
+const BOOTSTRAP_STORAGE_KEY = 'gameBootstrapParts';
+
 export default class DataManager {
     constructor(scene) {
         this.scene = scene;
         this.terrainData = [];
+        this.terrainComplete = false;
         this.obstaclesData = [];
         this.eventsData = []; // Add this line
         this.enemiesData = []; // Add this line
+        this.bootstrapParts = this.loadBootstrapParts(); // { name: { token, data } }
+    }
+
+    loadBootstrapParts() {
+        try {
+            return JSON.parse(localStorage.getItem(BOOTSTRAP_STORAGE_KEY)) || {};
+        } catch (error) {
+            return {};
+        }
+    }
+
+    saveBootstrapParts() {
+        try {
+            localStorage.setItem(BOOTSTRAP_STORAGE_KEY, JSON.stringify(this.bootstrapParts));
+        } catch (error) {
+            console.warn('Could not store game data for the next visit:', error);
+        }
     }
 
-    async fetchTerrainData() {
+    // Load terrain (first chunk, the rest is prefetched), obstacles, events and enemies in one
+    // request. Parts kept from an earlier response are sent as known tokens, and the server
+    // leaves out the ones that have not changed.
+    async fetchGameBootstrap(seed = null) {
+        console.log('Fetching game bootstrap');
+        const known = Object.values(this.bootstrapParts).map(part => part.token).join(',');
+        let url = `/game_bootstrap?known=${known}`;
+        if (seed) {
+            url += `&seed=${encodeURIComponent(seed)}`;
+        }
+        const response = await fetch(url);
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        const bundle = await response.json();
+        if (bundle.error) {
+            throw new Error(bundle.error);
+        }
+
+        const parts = {};
+        for (const [name, token] of Object.entries(bundle.tokens)) {
+            parts[name] = bundle.unchanged.includes(name) ? this.bootstrapParts[name] : { token, data: bundle[name] };
+        }
+        this.bootstrapParts = parts;
+        this.saveBootstrapParts();
+        console.log('Game bootstrap received for data version', bundle.version, '- unchanged:', bundle.unchanged);
+
+        const terrain = parts.terrain.data;
+        this.terrainData = terrain.date_unix
+            .map((dateUnix, i) => ({ date_unix: dateUnix, ma_7: terrain.ma_7[i] }))
+            .filter(d => d.ma_7 != null && !isNaN(d.ma_7));
+        this.terrainComplete = false;
+        this.prefetchTerrain(TERRAIN_CHUNK_SIZE, bundle.terrain_total);
+
+        this.obstaclesData = parts.obstacles.data;
+        this.eventsData = parts.events.data;
+        // Copy the enemies, since kept parts are reused and isAlive changes during a run
+        const enemies = bundle.enemies || parts.enemies.data;
+        this.enemiesData = enemies.map(enemyData => ({ ...enemyData, isAlive: true }));
+        return bundle.version;
+    }
+
+    // Decode the columnar terrain layout produced by payloads.encode_terrain_binary:
+    // 'BPR2' magic, uint32 count, float64 first date_unix in ms, int32[count] deltas in seconds, float32[count] ma_7
+    decodeTerrainBinary(buffer) {
+        const view = new DataView(buffer);
+        const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+        if (magic !== 'BPR2') {
+            throw new Error('Unexpected terrain data format');
+        }
+        const count = view.getUint32(4, true);
+        let dateUnix = view.getFloat64(8, true);
+        const deltas = new Int32Array(buffer, 16, count);
+        const prices = new Float32Array(buffer, 16 + 4 * count, count);
+
+        const data = new Array(count);
+        for (let i = 0; i < count; i++) {
+            dateUnix += deltas[i] * 1000;
+            data[i] = { date_unix: dateUnix, ma_7: prices[i] };
+        }
+        return data;
+    }
+
+    // Fetch points [start, stop) of the terrain. Returns the decoded points and the total number of points.
+    async fetchTerrainChunk(start, stop, points = null) {
+        let url = `/terrain_data?format=binary&from=${start}&to=${stop}`;
+        if (points) {
+            url += `&points=${points}`;
+        }
+        const response = await fetch(url);
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        const data = this.decodeTerrainBinary(await response.arrayBuffer());
+        const total = parseInt(response.headers.get('X-Terrain-Total'), 10);
+        return { data: data.filter(d => d.ma_7 != null && !isNaN(d.ma_7)), total };
+    }
+
+    // Resolves as soon as the first chunk has arrived, so the game can start. The remaining
+    // chunks are appended to this.terrainData in the background; terrainComplete turns true
+    // once everything is loaded. Entities read this.terrainData on every frame, so they see
+    // new points as they arrive.
+    // points asks for downsampled terrain (see /terrain_data?points=). The game itself needs every
+    // day, because obstacles, enemies and events are placed on terrain points by their exact date.
+    async fetchTerrainData(points = null) {
         console.log('Fetching terrain data');
         try {
-            const response = await fetch('/terrain_data');
-            if (!response.ok) {
-                throw new Error(`HTTP error! status: ${response.status}`);
-            }
-            const data = await response.json();
-            if (data.error) {
-                throw new Error(data.error);
-            }
-            this.terrainData = data.filter(d => d.ma_7 != null && !isNaN(d.ma_7));
-            console.log('Terrain data received:', this.terrainData.length, 'points');
+            this.terrainComplete = false;
+            const { data, total } = await this.fetchTerrainChunk(0, TERRAIN_CHUNK_SIZE, points);
+            this.terrainData = data;
+            console.log('Terrain data received:', this.terrainData.length, 'of', total, 'points');
+            this.prefetchTerrain(TERRAIN_CHUNK_SIZE, total, points);
             return this.terrainData;
         } catch (error) {
             console.error('Error fetching terrain data:', error);
@@ -29,6 +132,34 @@ export default class DataManager {
         }
     }
 
+    async prefetchTerrain(start, total, points = null) {
+        const terrainData = this.terrainData;
+        for (let chunkStart = start; chunkStart < total; chunkStart += TERRAIN_CHUNK_SIZE) {
+            const chunkStop = Math.min(chunkStart + TERRAIN_CHUNK_SIZE, total);
+            let chunk = null;
+            for (let attempt = 1; chunk === null; attempt++) {
+                try {
+                    chunk = (await this.fetchTerrainChunk(chunkStart, chunkStop, points)).data;
+                } catch (error) {
+                    if (attempt >= TERRAIN_CHUNK_RETRIES) {
+                        // Let the game finish on the terrain it has rather than waiting forever
+                        console.error('Error prefetching terrain data, stopping at', terrainData.length, 'points:', error);
+                        this.terrainComplete = true;
+                        return;
+                    }
+                    await new Promise(resolve => setTimeout(resolve, 1000 * attempt));
+                }
+            }
+            // A newer fetchTerrainData() call replaced the array; drop this stale prefetch
+            if (this.terrainData !== terrainData) {
+                return;
+            }
+            terrainData.push(...chunk);
+        }
+        this.terrainComplete = true;
+        console.log('Terrain data complete:', terrainData.length, 'points');
+    }
+
     async fetchObstaclesData() {
         console.log('Fetching obstacles data');
         try {
@@ -71,10 +202,12 @@ export default class DataManager {
         }
     }
 
-    async fetchEnemiesData() {
+    // seed (e.g. today's date for a daily challenge) gives every player the same enemies
+    async fetchEnemiesData(seed = null) {
         console.log('Fetching enemies data');
         try {
-            const response = await fetch('/enemies_data');
+            const url = seed ? `/enemies_data?seed=${encodeURIComponent(seed)}` : '/enemies_data';
+            const response = await fetch(url);
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
@@ -14,6 +14,9 @@ import PhysicsManager from '../managers/PhysicsManager.js';
 import { gameConfig } from '../config.js';
 import Enemies2 from '../entities/Enemies2.js';
 
+// Fingerprinted asset URLs from game.html when the static build is in use, plain static/ paths otherwise
+const assetUrl = (path) => (window.STATIC_ASSET_URLS && window.STATIC_ASSET_URLS[path]) || `static/${path}`;
+
 export default class GameScene extends Phaser.Scene {
     constructor() {
         super('GameScene');
@@ -76,26 +79,26 @@ export default class GameScene extends Phaser.Scene {
         console.log('GameScene preload started');
         try {
             // Load game assets
-            this.load.image('player', 'static/assets/images/player.png');
-            this.load.image('obstacle', 'static/assets/images/obstacle.png');
-            this.load.image('btc_event_positive', 'static/assets/images/btc_event_positive.png');
-            this.load.image('btc_event_negative', 'static/assets/images/btc_event_negative.png');
-            this.load.image('enemy', 'static/assets/images/enemy.png');
-            this.load.image('bitcoin_pill', 'static/assets/images/bitcoin_pill.png');
-            this.load.image('background', 'static/assets/images/background.png');
-            this.load.image('particle', 'static/assets/images/particle.png');
-            this.load.image('particle_pill', 'static/assets/images/particle_pill.png');
-            this.load.image('enemy_2', 'static/assets/images/enemy_2.png');
+            this.load.image('player', assetUrl('assets/images/player.png'));
+            this.load.image('obstacle', assetUrl('assets/images/obstacle.png'));
+            this.load.image('btc_event_positive', assetUrl('assets/images/btc_event_positive.png'));
+            this.load.image('btc_event_negative', assetUrl('assets/images/btc_event_negative.png'));
+            this.load.image('enemy', assetUrl('assets/images/enemy.png'));
+            this.load.image('bitcoin_pill', assetUrl('assets/images/bitcoin_pill.png'));
+            this.load.image('background', assetUrl('assets/images/background.png'));
+            this.load.image('particle', assetUrl('assets/images/particle.png'));
+            this.load.image('particle_pill', assetUrl('assets/images/particle_pill.png'));
+            this.load.image('enemy_2', assetUrl('assets/images/enemy_2.png'));
 
             // Load sound effects
-            this.load.audio('bullet_fire', 'static/assets/sounds/shoot.mp3');
-            this.load.audio('enemy1_impact', 'static/assets/sounds/enemy1_impact.mp3');
-            this.load.audio('enemy2_impact', 'static/assets/sounds/enemy2_impact.mp3');
-            this.load.audio('obstacle_impact', 'static/assets/sounds/obstacle_impact.mp3');
+            this.load.audio('bullet_fire', assetUrl('assets/sounds/shoot.mp3'));
+            this.load.audio('enemy1_impact', assetUrl('assets/sounds/enemy1_impact.mp3'));
+            this.load.audio('enemy2_impact', assetUrl('assets/sounds/enemy2_impact.mp3'));
+            this.load.audio('obstacle_impact', assetUrl('assets/sounds/obstacle_impact.mp3'));
 
             // Load sound effects for Bitcoin events
-            this.load.audio('btc_event_positive', 'static/assets/sounds/btc_event_positive.mp3');
-            this.load.audio('btc_event_negative', 'static/assets/sounds/btc_event_negative.mp3');
+            this.load.audio('btc_event_positive', assetUrl('assets/sounds/btc_event_positive.mp3'));
+            this.load.audio('btc_event_negative', assetUrl('assets/sounds/btc_event_negative.mp3'));
 
             console.log('Assets loaded');
         } catch (error) {
@@ -263,7 +266,8 @@ export default class GameScene extends Phaser.Scene {
                     this.dataManager.terrainData.length - 1
                 );
 
-                if (this.terrainOffset >= this.dataManager.terrainData.length - 1) {
+                // At the end of the loaded terrain before the rest has streamed in, the terrain waits
+                if (this.terrainOffset >= this.dataManager.terrainData.length - 1 && this.dataManager.terrainComplete) {
                     // Player has reached the end successfully
                     this.gameCompleted = true;
                     this.showGameCompleted();
@@ -394,29 +398,27 @@ export default class GameScene extends Phaser.Scene {
 
     async loadGameData() {
         try {
-            const terrainData = await this.dataManager.fetchTerrainData();
-            this.terrain = new Terrain(this, terrainData, this.visibleDataPoints, this.dataManager.eventsData);
+            // One round trip for all four datasets; the rest of the terrain streams in afterwards
+            await this.dataManager.fetchGameBootstrap();
+            this.terrain = new Terrain(this, this.dataManager.terrainData, this.visibleDataPoints, this.dataManager.eventsData);
 
-            const obstaclesData = await this.dataManager.fetchObstaclesData();
             this.obstacles = new Obstacles(
                 this,
-                obstaclesData,
+                this.dataManager.obstaclesData,
                 this.visibleDataPoints,
                 this.obstacleHeightOffsetFactor
             );
 
-            const eventsData = await this.dataManager.fetchBitcoinEventsData();
             this.gameEvents = new Events(
                 this,
-                eventsData,
+                this.dataManager.eventsData,
                 this.visibleDataPoints,
                 this.eventHeightOffsetFactor
             );
 
-            const enemiesData = await this.dataManager.fetchEnemiesData();
             this.enemies = new Enemies(
                 this,
-                enemiesData,
+                this.dataManager.enemiesData,
                 this.visibleDataPoints,
                 this.enemyHeightOffsetFactor
             );
@@ -5,7 +5,11 @@ document.addEventListener('DOMContentLoaded', () => {
     const pageInfo = document.getElementById('page-info');
     const sortSelect = document.getElementById('sort-select');
 
+    // Keyset pagination: each response carries the cursor of the next page, and the
+    // cursors of the pages already visited are kept so Previous can go back.
     let currentPage = 1;
+    let cursors = [''];
+    let nextCursor = null;
 
     function getCsrfToken() {
         return document.querySelector('meta[name="csrf-token"]').getAttribute('content');
@@ -14,15 +18,17 @@ document.addEventListener('DOMContentLoaded', () => {
     function fetchLeaderboard() {
         const sortBy = sortSelect.value;
         const csrfToken = getCsrfToken();
-        fetch(`${window.location.origin}/leaderboard?page=${currentPage}&sort_by=${sortBy}`, {
+        const cursor = encodeURIComponent(cursors[currentPage - 1]);
+        fetch(`${window.location.origin}/leaderboard?cursor=${cursor}&sort_by=${sortBy}`, {
             headers: {
                 'X-CSRFToken': csrfToken
             }
         })
             .then(response => response.json())
             .then(data => {
+                nextCursor = data.next_cursor;
                 updateLeaderboardTable(data.entries);
-                updatePagination(data.current_page, data.total_pages);
+                updatePagination();
             })
             .catch(error => console.error('Error fetching leaderboard:', error));
     }
@@ -48,10 +54,10 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
 
-    function updatePagination(currentPage, totalPages) {
-        pageInfo.textContent = `Page ${currentPage} of ${totalPages}`;
+    function updatePagination() {
+        pageInfo.textContent = `Page ${currentPage}`;
         prevButton.disabled = currentPage === 1;
-        nextButton.disabled = currentPage === totalPages;
+        nextButton.disabled = nextCursor === null;
     }
 
     prevButton.addEventListener('click', () => {
@@ -62,12 +68,16 @@ document.addEventListener('DOMContentLoaded', () => {
     });
 
     nextButton.addEventListener('click', () => {
-        currentPage++;
-        fetchLeaderboard();
+        if (nextCursor !== null) {
+            cursors[currentPage] = nextCursor;
+            currentPage++;
+            fetchLeaderboard();
+        }
     });
 
     sortSelect.addEventListener('change', () => {
         currentPage = 1;
+        cursors = [''];
         fetchLeaderboard();
     });
 
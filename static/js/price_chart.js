@@ -4,7 +4,10 @@
 document.addEventListener('DOMContentLoaded', () => {
     const ctx = document.getElementById('price-chart').getContext('2d');
 
-    fetch('/terrain_data')
+    // One point per device pixel is all the chart can show; the server picks the nearest level of detail
+    const points = Math.max(250, Math.ceil(ctx.canvas.clientWidth * (window.devicePixelRatio || 1)));
+
+    fetch(`/terrain_data?points=${points}`)
         .then(response => response.json())
         .then(data => {
             const dates = data.map(entry => {
@@ -0,0 +1,208 @@
+# static_assets.py
+"""
+Fingerprinted, precompressed copies of static/ for long-lived browser caching.
+
+build_static_assets() copies every file under static/ into the build directory twice:
+under its own name and under a name carrying a hash of its content, e.g.
+js/main.js -> js/main.3f1c2a9b0d4e.js, each with .gz and .br siblings when compressing
+pays off. manifest.json maps the original names to the hashed ones; the app emits the
+hashed URLs from url_for('static', ...), and since a hashed URL's content can never
+change, it is served with Cache-Control: immutable and a one-year max-age.
+
+Relative url(...) references in CSS are rewritten to the hashed names, so images a
+stylesheet pulls in are cached the same way. JavaScript modules keep their relative
+imports; the game page maps them to the hashed files with an import map instead (see
+import_map()), so changing one module does not change the hash of every module importing it.
+
+Hashed files from earlier builds are left in place, so pages rendered before a rebuild
+keep loading. Rebuild by hand with:
+    python static_assets.py
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import posixpath
+import re
+import tempfile
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+BASEDIR = os.path.abspath(os.path.dirname(__file__))
+STATIC_DIR = os.path.join(BASEDIR, 'static')
+BUILD_DIR = os.environ.get('STATIC_BUILD_DIR', os.path.join(BASEDIR, 'static_build'))
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_FORMAT_VERSION = 1
+HASH_LENGTH = 12
+
+# Far-future lifetime for hashed files: a year, the longest max-age caches are expected to honour
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Already-compressed formats, not worth a .gz or .br
+COMPRESSED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.mp3', '.ogg', '.woff', '.woff2', '.zip', '.gz', '.br'}
+# Keep a compressed variant only if it is at least this much smaller than the file
+MIN_COMPRESSION_SAVING = 0.05
+
+_HASHED_NAME = re.compile(r'\.[0-9a-f]{%d}\.[^./]+$' % HASH_LENGTH)
+_CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+?)\1\s*\)''')
+
+
+def is_fingerprinted(path):
+    """Return True if path (a file name or URL) names a hashed copy, whose content never changes."""
+    return bool(_HASHED_NAME.search(path))
+
+def _hashed_name(name, content):
+    stem, ext = posixpath.splitext(name)
+    return f"{stem}.{hashlib.sha256(content).hexdigest()[:HASH_LENGTH]}{ext}"
+
+def _source_files(source):
+    """Relative POSIX paths of the files under source, sorted, with stylesheets last."""
+    names = []
+    for root, _, files in os.walk(source):
+        for file_name in files:
+            names.append(posixpath.join(*os.path.relpath(os.path.join(root, file_name), source).split(os.sep)))
+    return sorted(names, key=lambda name: (name.endswith('.css'), name))
+
+def _source_hashes(source, names):
+    hashes = {}
+    for name in names:
+        with open(os.path.join(source, name), 'rb') as f:
+            hashes[name] = hashlib.sha256(f.read()).hexdigest()
+    return hashes
+
+def _rewrite_css_urls(name, content, files):
+    """Point the relative url(...) references of stylesheet name at the hashed files already in files."""
+    directory = posixpath.dirname(name)
+
+    def replace(match):
+        quote, url = match.groups()
+        path, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+        if not path or path.startswith(('/', 'data:')) or '://' in path:
+            return match.group(0)
+        target = posixpath.normpath(posixpath.join(directory, path))
+        if target not in files:
+            return match.group(0)
+        return f"url({quote}{posixpath.relpath(files[target], directory or '.')}{suffix}{quote})"
+
+    return _CSS_URL.sub(replace, content.decode('utf-8')).encode('utf-8')
+
+def _write_file(path, content):
+    """Write content to path through a temporary file, so a running server never reads a partial file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.static.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+def _compressed_variants(name, content):
+    """The .gz and .br encodings of content worth keeping, as {suffix: bytes}."""
+    if posixpath.splitext(name)[1].lower() in COMPRESSED_EXTENSIONS or not content:
+        return {}
+    variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli:
+        variants['.br'] = brotli.compress(content, quality=11)
+    return {suffix: data for suffix, data in variants.items()
+            if len(data) <= len(content) * (1 - MIN_COMPRESSION_SAVING)}
+
+def build_static_assets(source=STATIC_DIR, output=BUILD_DIR):
+    """
+    Copy the files under source into output with hashed copies, compressed variants and a manifest.
+
+    Parameters:
+    source (str): The static directory.
+    output (str): The build directory, created if missing.
+
+    Returns:
+    dict: The manifest's 'files', original name -> hashed name.
+    """
+    names = _source_files(source)
+    files = {}
+    totals = {'files': 0, 'bytes': 0, 'gzip': 0, 'br': 0}
+    for name in names:
+        with open(os.path.join(source, name), 'rb') as f:
+            content = f.read()
+        if name.endswith('.css'):
+            content = _rewrite_css_urls(name, content, files)
+        files[name] = _hashed_name(name, content)
+        variants = _compressed_variants(name, content)
+        for target in (name, files[name]):
+            _write_file(os.path.join(output, target), content)
+            for suffix, data in variants.items():
+                _write_file(os.path.join(output, target + suffix), data)
+        totals['files'] += 1
+        totals['bytes'] += len(content)
+        totals['gzip'] += len(variants.get('.gz', content))
+        totals['br'] += len(variants.get('.br', variants.get('.gz', content)))
+
+    # The manifest goes last: until it is replaced, the app keeps using the previous build
+    manifest = {'format': MANIFEST_FORMAT_VERSION, 'files': files, 'sources': _source_hashes(source, names)}
+    _write_file(os.path.join(output, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    logger.info(f"Built {totals['files']} static files into {output}: {totals['bytes']} bytes, "
+                f"{totals['gzip']} with gzip, {totals['br']} with brotli where smaller")
+    return files
+
+def read_static_manifest(output=BUILD_DIR):
+    """Return the manifest in output, or None if there is none or it cannot be read."""
+    try:
+        with open(os.path.join(output, MANIFEST_NAME), 'rb') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('format') == MANIFEST_FORMAT_VERSION else None
+
+def load_static_manifest(source=STATIC_DIR, output=BUILD_DIR):
+    """
+    Return the original name -> hashed name map, rebuilding output first if it is missing or out of date.
+
+    An empty map means the build failed (e.g. on a read-only filesystem); the app then
+    serves static/ under the original names.
+    """
+    manifest = read_static_manifest(output)
+    try:
+        if manifest is None or manifest['sources'] != _source_hashes(source, _source_files(source)):
+            return build_static_assets(source, output)
+    except OSError as e:
+        logger.error(f"Error building static assets: {str(e)}")
+        return {}
+    return manifest['files']
+
+def import_map(manifest, url_path, prefix='js/'):
+    """
+    An import map sending the JavaScript modules under prefix to their hashed URLs.
+
+    Modules import each other by relative path; the browser resolves those against the
+    importing module's URL, and the import map then swaps in the hashed file.
+    """
+    return {'imports': {f"{url_path}/{name}": f"{url_path}/{hashed}"
+                        for name, hashed in manifest.items() if name.startswith(prefix) and name.endswith('.js')}}
+
+def asset_urls(manifest, url_path, prefix='assets/'):
+    """Hashed URLs of the files under prefix, keyed by original name, for assets the game loads from script."""
+    return {name: f"{url_path}/{hashed}" for name, hashed in manifest.items() if name.startswith(prefix)}
+
+def static_files_app(wsgi_app, root, url_path='/static'):
+    """
+    Wrap wsgi_app in WhiteNoise, serving root at url_path.
+
+    WhiteNoise picks the .br or .gz sibling the client accepts, and marks hashed
+    files immutable with a far-future max-age.
+    """
+    from whitenoise import WhiteNoise
+    return WhiteNoise(wsgi_app, root=root, prefix=url_path.strip('/') + '/', max_age=60,
+                      immutable_file_test=lambda path, url: is_fingerprinted(url))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    build_static_assets()
@@ -0,0 +1,10 @@
+# tests/conftest.py
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+# Before anything imports app or utils: scratch price store, database and journals, and a stubbed CoinGecko
+from harness import isolate_services
+isolate_services()
@@ -0,0 +1,36 @@
+# tests/test_app.py
+import numpy as np
+import pytest
+
+from app import app, limiter
+
+
+@pytest.fixture
+def client():
+    limiter.reset()
+    yield app.test_client()
+    limiter.reset()
+
+
+def test_rate_limited_requests_get_429(client):
+    url = '/terrain_data?format=binary&from=0&to=500'
+    statuses = [client.get(url).status_code for _ in range(121)]
+    assert statuses[:120] == [200] * 120
+    assert statuses[120] == 429
+
+
+def test_unknown_route_is_404(client):
+    assert client.get('/no_such_page').status_code == 404
+
+
+def test_events_point_at_the_nearest_terrain_point(client):
+    terrain = np.array([point['date_unix'] for point in client.get('/terrain_data').get_json()])
+    events = client.get('/bitcoin_events').get_json()
+    assert events
+    for event in events:
+        index = event['terrain_index']
+        if index is None:
+            assert not terrain[0] <= event['date_unix'] <= terrain[-1]
+        else:
+            distances = np.abs(terrain - event['date_unix'])
+            assert index == int(np.argmin(distances))
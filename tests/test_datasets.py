@@ -0,0 +1,36 @@
+# tests/test_datasets.py
+from datasets import DerivedDatasets
+
+
+class Snapshot:
+    def __init__(self, version):
+        self.version = version
+        self.parent_version = None
+
+
+def pool_datasets(max_entries):
+    snapshot = Snapshot(1)
+    datasets = DerivedDatasets(lambda: snapshot)
+    datasets.register('pool', lambda datasets, snapshot, seed: seed * 2, max_entries=max_entries)
+    return datasets
+
+
+def test_bounded_artifacts_keep_the_most_recent_entries():
+    datasets = pool_datasets(max_entries=4)
+    for seed in range(3):
+        datasets.get('pool', seed=seed)
+    assert [key[1] for key in datasets._entries] == [(('seed', seed),) for seed in range(3)]
+
+    for seed in range(3, 10):
+        assert datasets.get('pool', seed=seed) == seed * 2
+    assert [key[1] for key in datasets._entries] == [(('seed', seed),) for seed in range(6, 10)]
+
+
+def test_evicted_entries_drop_their_build_locks():
+    datasets = pool_datasets(max_entries=4)
+    for seed in range(100):
+        datasets.get('pool', seed=seed)
+    assert set(datasets._key_locks) == set(datasets._entries)
+
+    datasets.invalidate('pool')
+    assert not datasets._key_locks
@@ -0,0 +1,71 @@
+# tests/test_leaderboard.py
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import app
+from models import db, LeaderboardEntry
+from leaderboard import keyset_page, order_leaderboard, encode_cursor, encode_cursor_values, decode_cursor
+
+
+@pytest.fixture
+def entries():
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        # Few distinct scores and timestamps, so most pages start and end inside a run of ties
+        started = datetime(2024, 1, 1)
+        db.session.add_all([
+            LeaderboardEntry(player_name=f'player{i}', score=(i * 7) % 4 * 100,
+                             timestamp=started + timedelta(hours=i % 3))
+            for i in range(23)
+        ])
+        db.session.commit()
+        yield LeaderboardEntry.query
+        db.session.remove()
+        db.drop_all()
+
+
+def walk(query, sort_by, order, per_page):
+    ids, cursor, pages = [], None, 0
+    while True:
+        page, cursor = keyset_page(query, sort_by, order, cursor, per_page)
+        ids.extend(entry.id for entry in page)
+        pages += 1
+        if cursor is None:
+            return ids, pages
+
+
+@pytest.mark.parametrize('sort_by', ['score', 'date'])
+@pytest.mark.parametrize('order', ['desc', 'asc'])
+@pytest.mark.parametrize('per_page', [1, 3, 10, 23, 50])
+def test_keyset_pages_cover_every_entry_once_across_ties(entries, sort_by, order, per_page):
+    ids, pages = walk(entries, sort_by, order, per_page)
+    assert ids == [entry.id for entry in order_leaderboard(entries, sort_by, order).all()]
+    assert pages == max(1, -(-23 // per_page))
+
+
+def test_keyset_page_on_an_empty_leaderboard(entries):
+    entries.delete()
+    assert keyset_page(entries) == ([], None)
+
+
+@pytest.mark.parametrize('sort_by', ['score', 'date'])
+def test_cursor_round_trip(entries, sort_by):
+    entry = entries.first()
+    value, entry_id = decode_cursor(encode_cursor(entry, sort_by), sort_by)
+    assert entry_id == entry.id
+    assert value == (entry.timestamp if sort_by == 'date' else entry.score)
+
+
+@pytest.mark.parametrize('cursor, sort_by', [
+    ('not a cursor', 'score'),
+    (encode_cursor_values('100', 1), 'score'),
+    (encode_cursor_values(100, '1'), 'score'),
+    (encode_cursor_values(1.5, 1), 'score'),
+    (encode_cursor_values('yesterday', 1), 'date'),
+    (encode_cursor_values(100, 1), 'date'),
+])
+def test_malformed_cursors_are_rejected(cursor, sort_by):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, sort_by)
@@ -0,0 +1,17 @@
+# tests/test_metrics.py
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+import app  # noqa: F401  (instruments every Engine, as the running app does)
+
+
+def test_failed_statement_raises_its_own_error():
+    engine = create_engine('sqlite://')
+    with engine.connect() as conn:
+        with pytest.raises(OperationalError, match='no such table: missing'):
+            conn.execute(text('SELECT * FROM missing'))
+        # The start time pushed for the failed statement was popped again
+        assert conn.info['metrics_started'] == []
+        assert conn.execute(text('SELECT 1')).scalar() == 1
+        assert conn.info['metrics_started'] == []
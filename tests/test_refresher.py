@@ -0,0 +1,25 @@
+# tests/test_refresher.py
+import refresher
+from harness import StubCoinGecko
+from refresher import DataRefresher
+from shared_cache import LocalSharedCache
+
+
+def test_preload_includes_the_recent_days():
+    data_refresher = DataRefresher(shared=LocalSharedCache(), client_factory=StubCoinGecko)
+    snapshot = data_refresher.preload()
+    assert snapshot.includes_recent
+    assert data_refresher.last_error is None
+    assert data_refresher._thread is None
+
+
+def test_preload_falls_back_to_the_price_store(monkeypatch):
+    # Earlier tests may have appended the stub's days to the price store already, so fail the fetch itself
+    def unreachable(*args, **kwargs):
+        raise TimeoutError('CoinGecko did not answer')
+
+    monkeypatch.setattr(refresher, 'update_bitcoin_data', unreachable)
+    data_refresher = DataRefresher(shared=LocalSharedCache(), client_factory=StubCoinGecko)
+    snapshot = data_refresher.preload()
+    assert not snapshot.includes_recent
+    assert data_refresher.last_error == 'CoinGecko did not answer'
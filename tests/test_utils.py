@@ -0,0 +1,164 @@
+# tests/test_utils.py
+import numpy as np
+import pandas as pd
+import pytest
+
+import utils
+from harness import StubCoinGecko
+from utils import (DAY_MS, COINGECKO_HISTORY_DAYS, complete_bitcoin_data, update_bitcoin_data, append_bitcoin_data,
+                   rolling_mean, local_top_indices, first_drawdown_indices, obstacles_drawdowns_weekly,
+                   nearest_indices)
+
+
+class RecordingCoinGecko(StubCoinGecko):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def get_coin_market_chart_range_by_id(self, id, vs_currency, from_timestamp, to_timestamp):
+        self.calls.append((from_timestamp, to_timestamp))
+        return super().get_coin_market_chart_range_by_id(id, vs_currency, from_timestamp, to_timestamp)
+
+
+@pytest.fixture
+def history(monkeypatch):
+    # Other tests append to the scratch price store, so start from a fixed prefix and leave the store alone
+    monkeypatch.setattr(utils, 'append_price_store', lambda date_unix, price: len(price))
+    return complete_bitcoin_data(include_recent=False).iloc[:2000]
+
+
+def test_update_fetches_only_the_days_after_the_last_row(history):
+    last = int(history['date_unix'].iloc[-1])
+    cg = RecordingCoinGecko()
+    df, appended = update_bitcoin_data(history, cg=cg, until_unix_ms=last + 31 * DAY_MS)
+
+    assert appended == 30
+    assert cg.calls == [(last // 1000 + 86400 + 1, last // 1000 + 31 * 86400)]
+    pd.testing.assert_frame_equal(df.iloc[:len(history)], history)
+    assert (df['date_unix'].iloc[len(history):] == last + DAY_MS * np.arange(1, 31)).all()
+    # The moving average runs on across the seam as if computed over the whole history
+    np.testing.assert_allclose(df['ma_7'].iloc[len(history):], rolling_mean(df['price'].to_numpy(), 7)[len(history):])
+
+
+def test_update_after_a_long_gap_is_clamped_to_coingecko_history(history):
+    last = int(history['date_unix'].iloc[-1])
+    until = last + 1000 * DAY_MS
+    cg = RecordingCoinGecko()
+    df, appended = update_bitcoin_data(history, cg=cg, until_unix_ms=until)
+
+    earliest = until - (COINGECKO_HISTORY_DAYS - 1) * DAY_MS
+    assert appended == COINGECKO_HISTORY_DAYS - 1
+    assert cg.calls == [(earliest // 1000 + 1, until // 1000)]
+    assert df['date_unix'].iloc[len(history)] == earliest
+    assert df['date_unix'].iloc[-1] == until - DAY_MS
+
+
+def test_update_with_no_new_days_skips_coingecko(history):
+    last = int(history['date_unix'].iloc[-1])
+    cg = RecordingCoinGecko()
+    df, appended = update_bitcoin_data(history, cg=cg, until_unix_ms=last + DAY_MS)
+    assert df is history and appended == 0
+    assert cg.calls == []
+
+
+def test_append_rejects_overlapping_days(history):
+    with pytest.raises(ValueError):
+        append_bitcoin_data(history, history.tail(1))
+
+
+def first_drawdown_indices_loop(values, top_indices, drawdown_percentage):
+    """The original forward scan from every top, kept as the reference."""
+    found = []
+    for top in top_indices:
+        position = len(values)
+        for j in range(top + 1, len(values)):
+            if (values[top] - values[j]) / values[top] >= drawdown_percentage:
+                position = j
+                break
+        found.append(position)
+    return np.array(found, dtype=np.int64)
+
+
+def obstacles_drawdowns_weekly_loop(drawdown_percentage, df):
+    """The original row-by-row obstacles_drawdowns_weekly(), as in benchmarks/bench_drawdowns.py."""
+    df_weekly = df.set_index('date').resample('W').last().reset_index()
+    df_weekly = df_weekly.dropna(subset=['ma_7'])
+    df_weekly['local_top'] = (df_weekly['ma_7'] > df_weekly['ma_7'].shift(1)) & (df_weekly['ma_7'] > df_weekly['ma_7'].shift(-1))
+
+    drawdowns = []
+    for i in range(len(df_weekly)):
+        if df_weekly.loc[i, 'local_top']:
+            local_top_price = df_weekly.loc[i, 'ma_7']
+            for j in range(i+1, len(df_weekly)):
+                drawdown = (local_top_price - df_weekly.loc[j, 'ma_7']) / local_top_price
+                if drawdown >= drawdown_percentage:
+                    drawdowns.append({
+                        'local_top_date': df_weekly.loc[i, 'date'],
+                        'local_top_price': local_top_price,
+                        'drawdown_date': df_weekly.loc[j, 'date'],
+                        'drawdown_date_unix': df_weekly.loc[j, 'date_unix'],
+                        'drawdown_price': df_weekly.loc[j, 'ma_7'],
+                        'drawdown': drawdown
+                    })
+                    break
+
+    return pd.DataFrame(drawdowns)
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('drawdown_percentage', [0.0, 0.05, 0.3, 0.9])
+def test_first_drawdown_indices_match_the_forward_scan(seed, drawdown_percentage):
+    rng = np.random.default_rng(seed)
+    values = 100 * np.exp(np.cumsum(rng.normal(0, 0.05, 1000)))
+    tops = local_top_indices(values)
+    np.testing.assert_array_equal(first_drawdown_indices(values, tops, drawdown_percentage),
+                                  first_drawdown_indices_loop(values, tops, drawdown_percentage))
+
+
+def test_first_drawdown_indices_edge_cases():
+    values = np.array([1.0, 3.0, 2.0, 2.5, 2.9, 1.0])
+    # A top with nothing after it, or one the values never drop far enough below, gives len(values)
+    np.testing.assert_array_equal(first_drawdown_indices(values, [1, 5], 0.5), [5, 6])
+    np.testing.assert_array_equal(first_drawdown_indices(values, [1], 0.9), [6])
+    assert len(first_drawdown_indices(values, [], 0.1)) == 0
+    np.testing.assert_array_equal(first_drawdown_indices([], [], 0.1), [])
+
+
+@pytest.mark.parametrize('drawdown_percentage', [0.05, 0.1, 0.3, 0.5])
+def test_obstacles_drawdowns_weekly_match_the_loop(history, drawdown_percentage):
+    pd.testing.assert_frame_equal(obstacles_drawdowns_weekly(drawdown_percentage, history),
+                                  obstacles_drawdowns_weekly_loop(drawdown_percentage, history))
+
+
+def nearest_indices_brute_force(sorted_values, values):
+    indices = []
+    for value in values:
+        if value < sorted_values[0] or value > sorted_values[-1]:
+            indices.append(-1)
+        else:
+            # argmin returns the first of equal distances, i.e. the earlier point
+            indices.append(int(np.argmin(np.abs(sorted_values - value))))
+    return np.array(indices, dtype=np.int64)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_nearest_indices_match_a_brute_force_search(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 50))
+    terrain = np.sort(rng.choice(np.arange(0, 200 * DAY_MS, DAY_MS // 2), size=n, replace=False))
+    events = np.concatenate([
+        terrain,                                          # on a point
+        (terrain[:-1] + terrain[1:]) // 2,                # exactly between two points
+        terrain + rng.integers(1, DAY_MS, size=n),        # somewhere after a point
+        [terrain[0] - 1, terrain[-1] + 1],                # just outside the terrain
+    ])
+    rng.shuffle(events)
+    np.testing.assert_array_equal(nearest_indices(terrain, events), nearest_indices_brute_force(terrain, events))
+
+
+def test_nearest_indices_edge_cases():
+    terrain = np.array([0, 10, 20], dtype=np.int64) * DAY_MS
+    events = np.array([-1, 0, 5 * DAY_MS, 5 * DAY_MS + 1, 20 * DAY_MS, 20 * DAY_MS + 1])
+    np.testing.assert_array_equal(nearest_indices(terrain, events), [-1, 0, 0, 1, 2, -1])
+    np.testing.assert_array_equal(nearest_indices(terrain[:1], [-1, 0, 1]), [-1, 0, -1])
+    np.testing.assert_array_equal(nearest_indices(terrain[:0], [0]), [-1])
@@ -2,33 +2,79 @@
 import pandas as pd
 import numpy as np
 from pycoingecko import CoinGeckoAPI
-import time
+from price_store import load_price_store, append_price_store
+from metrics import timed
 import logging
 import random
 
 logger = logging.getLogger(__name__)
 
+DAY_MS = 86_400_000
+
+# CoinGecko's public and demo plans reject ranges starting more than 365 days ago
+COINGECKO_HISTORY_DAYS = 365
+
+def to_unix_ms(dates):
+    """
+    Convert datetimes to UTC epoch milliseconds as int64, in one vectorized operation.
+
+    Naive datetimes are taken to be UTC, so the result does not depend on the server's
+    local timezone. Timezone-aware datetimes are converted to UTC first.
+
+    Parameters:
+    dates (pd.Series): Datetime-like values.
+
+    Returns:
+    pd.Series: int64 milliseconds since 1970-01-01T00:00:00Z, with the same index.
+    """
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates)
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_convert('UTC').dt.tz_localize(None)
+    nanoseconds = dates.to_numpy(dtype='datetime64[ns]').view(np.int64)
+    return pd.Series(nanoseconds // 1_000_000, index=dates.index, name=dates.name)
+
 def get_historical_bitcoin_data():
-    """Load historical Bitcoin price data from a CSV file."""
-    df = pd.read_csv('bitcoin_historical_merged.csv', delimiter=",")
+    """
+    Load historical Bitcoin price data from the compiled price store.
 
-    # Convert 'Start' column to datetime
-    df['Start'] = pd.to_datetime(df['Start'])
+    The store is built from the historical CSV files (see price_store.py) and is
+    recompiled automatically when they change (or read from the CSVs directly if it
+    cannot be written). Returns columns ['Start', 'price'], already validated,
+    deduplicated and sorted by date, copied out of the store into memory.
+    """
+    with timed('price_store.load'):
+        store = load_price_store()
+    return pd.DataFrame({
+        'Start': pd.to_datetime(store['date_unix'], unit='ms'),
+        'price': store['price']
+    })
 
-    # Ensure the data is sorted by date
-    df = df.sort_values('Start')
+def coingecko_client(timeout=None):
+    """
+    Return a new CoinGeckoAPI client.
 
-    # Rename the 'Close' column to 'price' for clarity
-    df.rename(columns={'Close': 'price'}, inplace=True)
+    With a timeout, each request fails after `timeout` seconds instead of being retried,
+    for callers that must not wait the client's default of minutes.
+    """
+    if timeout is None:
+        return CoinGeckoAPI()
+    cg = CoinGeckoAPI(retries=0)
+    cg.request_timeout = timeout
+    return cg
 
-    return df
+def get_last_year_bitcoin_data(cg=None):
+    """Fetch the last year's Bitcoin price data from CoinGecko and return it as a DataFrame.
 
-def get_last_year_bitcoin_data():
-    """Fetch the last year's Bitcoin price data from CoinGecko and return it as a DataFrame."""
-    cg = CoinGeckoAPI()
+    Parameters:
+    cg: Client exposing get_coin_market_chart_by_id. Defaults to a new CoinGeckoAPI().
+    """
+    if cg is None:
+        cg = CoinGeckoAPI()
     
     # Fetch the data (timestamps are in UNIX format, and prices are in USD)
-    bitcoin_data = cg.get_coin_market_chart_by_id(id='bitcoin', vs_currency='usd', days=365)
+    with timed('coingecko'):
+        bitcoin_data = cg.get_coin_market_chart_by_id(id='bitcoin', vs_currency='usd', days=365)
 
     # Prepare the data into a DataFrame
     prices = bitcoin_data['prices']
@@ -40,32 +86,42 @@ def get_last_year_bitcoin_data():
     
     return df_last_year
 
-def complete_bitcoin_data(ma=7):
-    """Merge historical data from CSV with the last year's data from CoinGecko and calculate a moving average."""
+def complete_bitcoin_data(ma=7, cg=None, include_recent=True):
+    """Merge historical data from CSV with the last year's data from CoinGecko and calculate a moving average.
+
+    Parameters:
+    ma (int): Moving average window in days. Default is 7.
+    cg: CoinGecko client passed on to get_last_year_bitcoin_data().
+    include_recent (bool): If False, skip CoinGecko and build from the CSV history only.
+    """
     try:
         logger.info("Starting to complete Bitcoin data")
         
         # Load historical data from CSV
         df_historical = get_historical_bitcoin_data()
 
-        # Get last year's data from CoinGecko
-        df_last_year = get_last_year_bitcoin_data()
-
         # Convert the 'Start' column to 'date' in historical data
         df_historical['date'] = df_historical['Start']
+        frames = [df_historical[['date', 'price']]]
+
+        # Get last year's data from CoinGecko, normalized to one close per UTC day
+        if include_recent:
+            df_last_year = daily_closes(get_last_year_bitcoin_data(cg))
+            frames.append(df_last_year[['date', 'price']])
 
         # Merge the data on the 'date' column
-        df_merged = pd.concat([df_historical[['date', 'price']], df_last_year[['date', 'price']]], ignore_index=True)
+        df_merged = pd.concat(frames, ignore_index=True)
 
-        # Ensure no duplicates (if there's overlap between historical and last year's data)
+        # Ensure no duplicates (both sources are daily, so overlapping days collide exactly)
         df_merged = df_merged.drop_duplicates(subset='date', keep='last').sort_values('date')
 
         # Add 'date_unix' column based on the 'date' column
-        df_merged['date_unix'] = df_merged['date'].apply(lambda x: int(time.mktime(x.timetuple()) * 1000))
+        df_merged['date_unix'] = to_unix_ms(df_merged['date'])
 
         # Calculate moving average and add it to the DataFrame
         ma_column = f"ma_{ma}"
-        df_merged[ma_column] = df_merged['price'].rolling(window=ma).mean()
+        with timed('rolling_mean'):
+            df_merged[ma_column] = rolling_mean(df_merged['price'], ma)
 
         # Remove rows where moving average is NaN
         df_merged = df_merged.dropna(subset=[ma_column])
@@ -76,43 +132,370 @@ def complete_bitcoin_data(ma=7):
         logger.error(f"Error in complete_bitcoin_data: {str(e)}")
         raise
 
+def rolling_mean(values, window):
+    """
+    Mean of each trailing window of `window` values, NaN where the window is not yet full.
+
+    Every window is averaged on its own rather than with a running sum, so the mean at
+    a position does not depend on where the series starts. That keeps an incrementally
+    computed tail bit-identical to a full recomputation.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(len(values), np.nan)
+    if len(values) >= window:
+        result[window - 1:] = np.lib.stride_tricks.sliding_window_view(values, window).mean(axis=1)
+    return result
+
+MA_KINDS = ('sma', 'ema')
+
+def moving_averages(values, windows, kind='sma'):
+    """
+    Trailing moving averages of one price series for several windows at once.
+
+    For 'sma' the cumulative sum of the series is taken once and every window is a
+    single vectorized difference of two offsets into it, so adding a window costs one
+    pass over the array. 'ema' is the recursive average with alpha = 2 / (window + 1).
+
+    Unlike rolling_mean(), a cumulative-sum mean depends on where the series starts in
+    its last few bits, so use it for derived views and keep rolling_mean() for ma_7.
+
+    Parameters:
+    values (array-like): Prices in date order.
+    windows (iterable of int): Window lengths in rows, each at least 1.
+    kind (str): 'sma' or 'ema'.
+
+    Returns:
+    dict: window -> float64 array as long as values, NaN until the window is full.
+    """
+    if kind not in MA_KINDS:
+        raise ValueError(f"Unknown moving average kind {kind!r}, expected one of {', '.join(MA_KINDS)}")
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    averages = {}
+    if kind == 'sma':
+        cumsum = np.concatenate([[0.0], np.cumsum(values)])
+    for window in windows:
+        if window < 1:
+            raise ValueError(f"Moving average window must be at least 1, got {window}")
+        result = np.full(n, np.nan)
+        if n >= window:
+            if kind == 'sma':
+                result[window - 1:] = (cumsum[window:] - cumsum[:-window]) / window
+            else:
+                ema = pd.Series(values).ewm(span=window, adjust=False).mean().to_numpy()
+                result[window - 1:] = ema[window - 1:]
+        averages[window] = result
+    return averages
+
+def lttb_indices(x, y, threshold):
+    """
+    Pick `threshold` points that preserve the visual shape of a line, with Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept. The points in between are split into
+    threshold - 2 equal buckets, and each bucket keeps the point that forms the largest
+    triangle with the point kept from the previous bucket and the average of the next
+    bucket, so peaks and troughs survive while flat stretches are thinned.
+
+    Parameters:
+    x (array-like): Increasing x values, e.g. date_unix.
+    y (array-like): The values to draw.
+    threshold (int): Number of points to keep, at least 3.
+
+    Returns:
+    np.ndarray: Sorted int64 indices into x and y. All indices if threshold >= len(x).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n, dtype=np.int64)
+    if threshold < 3:
+        raise ValueError(f"LTTB needs a threshold of at least 3, got {threshold}")
+
+    # Bucket i covers [edges[i], edges[i + 1]) of the points between the first and the last
+    edges = np.floor(np.arange(threshold - 1) * (n - 2) / (threshold - 2)).astype(np.int64) + 1
+    edges[-1] = n - 1
+    # Average point of each bucket, with the last point standing in as the bucket after the last
+    counts = np.diff(edges)
+    avg_x = np.append(np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts, x[-1])
+    avg_y = np.append(np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts, y[-1])
+
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Twice the triangle area; the constant factor does not change the argmax
+        areas = np.abs((x[a] - avg_x[i + 1]) * (y[start:end] - y[a])
+                       - (x[a] - x[start:end]) * (avg_y[i + 1] - y[a]))
+        a = start + int(np.argmax(areas))
+        indices[i + 1] = a
+    return indices
+
+def get_bitcoin_data_since(since_unix_ms, cg=None, until_unix_ms=None):
+    """
+    Fetch Bitcoin daily closes from CoinGecko for the completed UTC days after since_unix_ms.
+
+    CoinGecko returns hourly or finer points for short ranges; daily_closes() reduces
+    them to one point per UTC day. Only the last COINGECKO_HISTORY_DAYS can be fetched,
+    so after a longer gap the days before that stay missing.
+
+    Parameters:
+    since_unix_ms (int): Midnight of the last day already stored.
+    cg: Client exposing get_coin_market_chart_range_by_id. Defaults to a new CoinGeckoAPI().
+    until_unix_ms (int): Only days closing at or before this time are returned. Defaults to
+        the start of the current UTC day.
+
+    Returns:
+    pd.DataFrame: Columns ['date_unix', 'price', 'date'], possibly empty.
+    """
+    if until_unix_ms is None:
+        until_unix_ms = start_of_utc_day_ms()
+
+    # The first new day closes at since + 2 days
+    if since_unix_ms + 2 * DAY_MS > until_unix_ms:
+        return daily_closes(pd.DataFrame({'date_unix': [], 'price': []}), until_unix_ms)
+
+    # until_unix_ms is at most a day before now, so a day less than the limit stays inside it
+    from_unix_ms = since_unix_ms + DAY_MS
+    earliest_unix_ms = until_unix_ms - (COINGECKO_HISTORY_DAYS - 1) * DAY_MS
+    if from_unix_ms < earliest_unix_ms:
+        logger.warning(f"Bitcoin data is {(until_unix_ms - since_unix_ms) // DAY_MS} days behind, more than "
+                       f"CoinGecko serves; fetching only the last {COINGECKO_HISTORY_DAYS - 1} days")
+        from_unix_ms = earliest_unix_ms
+
+    if cg is None:
+        cg = CoinGeckoAPI()
+    with timed('coingecko'):
+        bitcoin_data = cg.get_coin_market_chart_range_by_id(
+            id='bitcoin', vs_currency='usd',
+            from_timestamp=from_unix_ms // 1000 + 1, to_timestamp=until_unix_ms // 1000
+        )
+    df = daily_closes(pd.DataFrame(bitcoin_data['prices'], columns=['date_unix', 'price']), until_unix_ms)
+    return df[df['date_unix'] > since_unix_ms].reset_index(drop=True)
+
+def start_of_utc_day_ms():
+    """Return midnight UTC of the current day in epoch milliseconds."""
+    return int(pd.Timestamp.now(tz='UTC').floor('D').value // 1_000_000)
+
+def daily_closes(df, until_unix_ms=None):
+    """
+    Normalize price points of any granularity to exactly one close per UTC day.
+
+    A point at time t closes the UTC day that ends at or after t, so a point exactly at
+    midnight closes the previous day. Each day keeps its last point and is stamped at
+    that day's midnight, matching the CSV 'Start' dates whose 'Close' is the day's close.
+
+    Parameters:
+    df (pd.DataFrame): Columns 'date_unix' (epoch ms) and 'price', in any order.
+    until_unix_ms (int): Days that have not closed by this time are dropped. Defaults to
+        the start of the current UTC day.
+
+    Returns:
+    pd.DataFrame: Columns ['date_unix', 'price', 'date'], sorted by date.
+    """
+    if until_unix_ms is None:
+        until_unix_ms = start_of_utc_day_ms()
+    date_unix = df['date_unix'].to_numpy(dtype=np.int64)
+    days = pd.DataFrame({
+        'date_unix': (date_unix - 1) // DAY_MS * DAY_MS,
+        'timestamp': date_unix,
+        'price': df['price'].to_numpy(dtype=np.float64)
+    })
+    days = days.sort_values('timestamp', kind='stable').drop_duplicates(subset='date_unix', keep='last')
+    days = days[days['date_unix'] + DAY_MS <= until_unix_ms]
+    days = days[['date_unix', 'price']].reset_index(drop=True)
+    days['date'] = pd.to_datetime(days['date_unix'], unit='ms')
+    return days
+
+def append_bitcoin_data(df_complete, df_new, ma=7):
+    """
+    Append rows later than everything in df_complete, computing the moving average only for the new tail.
 
-def obstacles_drawdowns_weekly(drawdown_percentage):
+    The result equals complete_bitcoin_data() run on the combined history.
+
+    Parameters:
+    df_complete (pd.DataFrame): Output of complete_bitcoin_data() or of a previous append.
+    df_new (pd.DataFrame): New rows with 'date' and 'price', all after df_complete's last date.
+    ma (int): Moving average window in days.
+    """
+    if df_new.empty:
+        return df_complete
+    if df_new['date'].iloc[0] <= df_complete['date'].iloc[-1]:
+        raise ValueError("New Bitcoin data overlaps the existing data")
+
+    ma_column = f"ma_{ma}"
+    context = df_complete['price'].to_numpy(dtype=np.float64)[len(df_complete) - (ma - 1):] if ma > 1 else np.empty(0)
+    prices = np.concatenate([context, df_new['price'].to_numpy(dtype=np.float64)])
+
+    start = df_complete.index[-1] + 1
+    df_tail = pd.DataFrame({
+        'date': df_new['date'].to_numpy(),
+        'price': df_new['price'].to_numpy(dtype=np.float64)
+    }, index=pd.RangeIndex(start, start + len(df_new)))
+    df_tail['date_unix'] = to_unix_ms(df_tail['date'])
+    with timed('rolling_mean'):
+        df_tail[ma_column] = rolling_mean(prices, ma)[len(context):]
+    return pd.concat([df_complete, df_tail[df_complete.columns]])
+
+def update_bitcoin_data(df_complete, ma=7, cg=None, until_unix_ms=None):
+    """
+    Bring df_complete up to date by fetching only the days after its last row.
+
+    New days are appended to the persisted price store, so the next full rebuild
+    includes them without calling CoinGecko again. until_unix_ms is passed on to
+    get_bitcoin_data_since().
+
+    Returns:
+    tuple: (updated DataFrame, number of rows appended)
+    """
+    last_unix_ms = int(df_complete['date_unix'].iloc[-1])
+    df_new = get_bitcoin_data_since(last_unix_ms, cg, until_unix_ms)
+    if df_new.empty:
+        logger.info("No new Bitcoin data since the last update")
+        return df_complete, 0
+
+    try:
+        with timed('price_store.append'):
+            append_price_store(df_new['date_unix'].to_numpy(), df_new['price'].to_numpy())
+    except Exception as e:
+        # The in-memory data is still correct, the next update will just fetch these days again
+        logger.error(f"Error persisting new Bitcoin data: {str(e)}")
+
+    logger.info(f"Appending {len(df_new)} new days of Bitcoin data")
+    return append_bitcoin_data(df_complete, df_new, ma), len(df_new)
+
+
+def obstacles_drawdowns_weekly(drawdown_percentage, df=None):
     """ 
     Returns dataframe with columns: ['local_top_price', 'local_top_date', 'drawdown_price',
         'drawdown_date_unix', 'drawdown_date', 'drawdown']
+
+    Parameters:
+    drawdown_percentage (float): Drop from a weekly local top that counts as a drawdown.
+    df (pd.DataFrame): The complete Bitcoin data. If None, it will be fetched using complete_bitcoin_data().
     """
-    df=complete_bitcoin_data()
-    # Resample to weekly data
-    df.set_index('date', inplace=True)
-    df_weekly = df.resample('W').last().reset_index()
+    if df is None:
+        df = complete_bitcoin_data()
+    df_weekly = resample_weekly(df)
+    top_indices = local_top_indices(df_weekly['ma_7'].to_numpy(dtype=np.float64))
+    return drawdowns_from_weekly(df_weekly, top_indices, drawdown_percentage)
+
+def resample_weekly(df):
+    """Resample the complete Bitcoin data to the last row of each week, dropping weeks without ma_7."""
+    df_weekly = df.set_index('date').resample('W').last().reset_index()
     
     # Ensure there are no NaN values in the 'ma_7' column
-    df_weekly = df_weekly.dropna(subset=['ma_7'])
-    
-    # Identify local tops using ma_7
-    df_weekly['local_top'] = (df_weekly['ma_7'] > df_weekly['ma_7'].shift(1)) & (df_weekly['ma_7'] > df_weekly['ma_7'].shift(-1))
-    df_weekly['local_top'] = df_weekly['local_top'].astype(bool)
+    return df_weekly.dropna(subset=['ma_7']).reset_index(drop=True)
+
+def update_weekly(df_weekly, df, appended_rows):
+    """
+    Update the output of resample_weekly() after rows were appended to df.
+
+    Only weeks that can contain the appended rows are resampled again; earlier weeks are reused.
+
+    Parameters:
+    df_weekly (pd.DataFrame): resample_weekly() of df before the append.
+    df (pd.DataFrame): The complete Bitcoin data after the append.
+    appended_rows (int): Number of rows appended at the end of df.
+    """
+    if appended_rows <= 0:
+        return df_weekly
+    first_new_date = df['date'].iloc[-appended_rows]
+
+    # A weekly row labelled L summarizes the dates in (L - 7 days, L]
+    df_kept = df_weekly[df_weekly['date'] < first_new_date]
+    if df_kept.empty:
+        return resample_weekly(df)
+    df_tail = resample_weekly(df[df['date'] > df_kept['date'].iloc[-1]])
+    return pd.concat([df_kept, df_tail], ignore_index=True)
+
+def drawdowns_from_weekly(df_weekly, top_indices, drawdown_percentage):
+    """
+    Build the drawdown frame returned by obstacles_drawdowns_weekly() from precomputed weekly data.
+
+    Parameters:
+    df_weekly (pd.DataFrame): Output of resample_weekly().
+    top_indices (np.ndarray): Output of local_top_indices() on df_weekly['ma_7'].
+    drawdown_percentage (float): Drop from a local top that counts as a drawdown.
+    """
+    ma_values = df_weekly['ma_7'].to_numpy(dtype=np.float64)
 
     # Calculate drawdowns
-    drawdowns = []
-    for i in range(len(df_weekly)):
-        if df_weekly.loc[i, 'local_top']:
-            local_top_price = df_weekly.loc[i, 'ma_7']
-            for j in range(i+1, len(df_weekly)):
-                drawdown = (local_top_price - df_weekly.loc[j, 'ma_7']) / local_top_price
-                if drawdown >= drawdown_percentage:
-                    drawdowns.append({
-                        'local_top_date': df_weekly.loc[i, 'date'],
-                        'local_top_price': local_top_price,
-                        'drawdown_date': df_weekly.loc[j, 'date'],
-                        'drawdown_date_unix': df_weekly.loc[j, 'date_unix'],
-                        'drawdown_price': df_weekly.loc[j, 'ma_7'],
-                        'drawdown': drawdown
-                    })
-                    break
-
-    return pd.DataFrame(drawdowns)
+    drawdown_indices = first_drawdown_indices(ma_values, top_indices, drawdown_percentage)
+    found = drawdown_indices < len(ma_values)
+    top_indices = top_indices[found]
+    drawdown_indices = drawdown_indices[found]
+
+    local_top_prices = ma_values[top_indices]
+    drawdown_prices = ma_values[drawdown_indices]
+
+    return pd.DataFrame({
+        'local_top_date': df_weekly['date'].to_numpy()[top_indices],
+        'local_top_price': local_top_prices,
+        'drawdown_date': df_weekly['date'].to_numpy()[drawdown_indices],
+        'drawdown_date_unix': df_weekly['date_unix'].to_numpy()[drawdown_indices],
+        'drawdown_price': drawdown_prices,
+        'drawdown': (local_top_prices - drawdown_prices) / local_top_prices
+    })
+
+def local_top_indices(values):
+    """Return the positions of values strictly greater than both neighbours (never the first or last)."""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 3:
+        return np.empty(0, dtype=np.int64)
+    middle = values[1:-1]
+    is_top = (middle > values[:-2]) & (middle > values[2:])
+    return np.flatnonzero(is_top) + 1
+
+def first_drawdown_indices(values, top_indices, drawdown_percentage):
+    """
+    For each top, find the first later position whose drawdown from the top reaches drawdown_percentage.
+
+    All tops are resolved together by binary lifting over a sparse table of range minima,
+    which takes O(n log n) instead of scanning forward from every top. The drawdown test
+    (top - x) / top >= drawdown_percentage is monotone in x, so checking it against the
+    minimum of a block tells whether any position in that block crosses.
+
+    Parameters:
+    values (np.ndarray): Price series, e.g. the weekly ma_7 values.
+    top_indices (np.ndarray): Positions of the local tops in values.
+    drawdown_percentage (float): Drawdown that counts as a crossing.
+
+    Returns:
+    np.ndarray: One position per top; len(values) where the drawdown never happens.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    top_indices = np.asarray(top_indices, dtype=np.int64)
+    n = len(values)
+    if n == 0 or len(top_indices) == 0:
+        return np.full(len(top_indices), n, dtype=np.int64)
+
+    # block_min[k][j] is the minimum of values[j:j + 2**k], padded with +inf past the end
+    block_min = [values]
+    while (1 << len(block_min)) <= n:
+        previous = block_min[-1]
+        half = 1 << (len(block_min) - 1)
+        shifted = np.full(n, np.inf)
+        shifted[:n - half] = previous[half:]
+        block_min.append(np.minimum(previous, shifted))
+
+    top_prices = values[top_indices]
+    position = top_indices + 1
+    with np.errstate(invalid='ignore'):
+        for k in range(len(block_min) - 1, -1, -1):
+            step = 1 << k
+            in_range = position + step <= n
+            window_min = block_min[k][np.minimum(position, n - 1)]
+            no_crossing = ~((top_prices - window_min) / top_prices >= drawdown_percentage)
+            position = np.where(in_range & no_crossing, position + step, position)
+
+    # position now points at the first crossing, or at the last index if none crossed
+    at_end = position >= n
+    last = np.minimum(position, n - 1)
+    crossed = ~at_end & ((top_prices - values[last]) / top_prices >= drawdown_percentage)
+    return np.where(crossed, position, n)
 
 def get_bitcoin_events():
     """Load Bitcoin events from a CSV file, convert date to datetime, and add date_unix.
@@ -125,36 +508,72 @@ def get_bitcoin_events():
     df['date'] = pd.to_datetime(df['date'])
     
     # Create 'date_unix' column by converting the 'date' column to UNIX timestamp
-    df['date_unix'] = df['date'].apply(lambda x: int(time.mktime(x.timetuple()) * 1000))
+    df['date_unix'] = to_unix_ms(df['date'])
 
     return df
 
-def get_random_bitcoin_data(df=None, n=60):
+def nearest_indices(sorted_values, values):
+    """
+    For each of values, the index of the nearest element of sorted_values, by binary search.
+
+    Ties go to the earlier element. Values before the first or after the last element
+    get -1, since they have no neighbour on one side to be nearest to.
+
+    Parameters:
+    sorted_values (np.ndarray): Increasing values, e.g. the terrain date_unix.
+    values (np.ndarray): Values to place, in any order, e.g. event date_unix.
+
+    Returns:
+    np.ndarray: int64 indices into sorted_values, or -1.
+    """
+    sorted_values = np.asarray(sorted_values)
+    values = np.asarray(values)
+    if len(sorted_values) == 0:
+        return np.full(len(values), -1, dtype=np.int64)
+    right = np.clip(np.searchsorted(sorted_values, values, side='left'), 1, len(sorted_values) - 1)
+    left = right - 1
+    # Compare distances as differences of the original values, so int64 timestamps stay exact
+    nearer_right = (sorted_values[right] - values) < (values - sorted_values[left])
+    indices = np.where(nearer_right, right, left).astype(np.int64)
+    if len(sorted_values) == 1:
+        indices[:] = 0
+    outside = (values < sorted_values[0]) | (values > sorted_values[-1])
+    indices[outside] = -1
+    return indices
+
+def sample_indices(n_rows, n, seed=None):
+    """
+    Pick n distinct row positions out of n_rows, in increasing order.
+
+    Parameters:
+    n_rows (int): Number of rows to pick from.
+    n (int): Number of positions, capped at n_rows.
+    seed (int): Makes the pick reproducible. None picks differently on every call.
+
+    Returns:
+    np.ndarray: Sorted int64 positions.
+    """
+    rng = np.random.default_rng(seed)
+    return np.sort(rng.choice(n_rows, size=min(n, n_rows), replace=False)).astype(np.int64)
+
+def get_random_bitcoin_data(df=None, n=60, seed=None):
     """
     Select n random rows from the complete Bitcoin data.
     
     Parameters:
     df (pd.DataFrame): The complete Bitcoin data. If None, it will be fetched using complete_bitcoin_data().
     n (int): Number of random rows to select. Default is 60.
+    seed (int): Passed to sample_indices() to make the selection reproducible.
     
     Returns:
-    pd.DataFrame: A DataFrame containing n randomly selected rows from the input data.
+    pd.DataFrame: A DataFrame containing n randomly selected rows from the input data, in date order.
     """
     try:
-        logger.info(f"Selecting {n} random rows from Bitcoin data")
-        
         # If df is not provided, fetch the complete Bitcoin data
         if df is None:
             df = complete_bitcoin_data()
         
-        # Ensure n is not larger than the number of rows in the DataFrame
-        n = min(n, len(df))
-        
-        # Randomly select n rows
-        random_rows = df.sample(n=n)
-        
-        logger.info(f"Successfully selected {n} random rows")
-        return random_rows  # Here is the return statement
+        return df.iloc[sample_indices(len(df), n, seed)]
     
     except Exception as e:
         logger.error(f"Error in get_random_bitcoin_data: {str(e)}")